@@ -4,7 +4,9 @@ import os
 import re
 from typing import Any, Dict, List, Optional, Tuple
 
+import regex_lite
 from regex_lite import matcher
+from regex_lite.compiler import F_BOL, F_EOL
 
 
 class EngineAdapter:
@@ -12,17 +14,35 @@ class EngineAdapter:
         raise NotImplementedError
 
     def replace(
-        self, pattern: str, flags: str, text: str, repl: str
+        self, pattern: str, flags: str, text: str, repl: str, count: int = 0
     ) -> Tuple[str, int]:
         raise NotImplementedError
 
-    def split(self, pattern: str, flags: str, text: str) -> List[str]:
+    def split(
+        self, pattern: str, flags: str, text: str, maxsplit: int = 0
+    ) -> List[Optional[str]]:
+        raise NotImplementedError
+
+    def is_match(self, pattern: str, flags: str, text: str) -> bool:
+        """Return whether the pattern matches anywhere in ``text``."""
+        raise NotImplementedError
+
+    def count(self, pattern: str, flags: str, text: str) -> int:
+        """Return the number of non-overlapping matches in ``text``."""
         raise NotImplementedError
 
     def compile(self, pattern: str, flags: str) -> Dict[str, Any]:
         """Compile pattern and return NFA structure information."""
         raise NotImplementedError
 
+    def compile_set(self, patterns: List[str], flags: str) -> Any:
+        """Compile patterns into an opaque set handle for ``match_set``."""
+        raise NotImplementedError
+
+    def match_set(self, compiled: Any, text: str, spans: bool) -> Dict[str, Any]:
+        """Return ``{"matches": [...], "spans": {...} | None}`` for a set."""
+        raise NotImplementedError
+
 
 def _translate_flags(flag_str: str) -> int:
     mapping = {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL}
@@ -45,15 +65,24 @@ class MockEngine(EngineAdapter):
         return matches
 
     def replace(
-        self, pattern: str, flags: str, text: str, repl: str
+        self, pattern: str, flags: str, text: str, repl: str, count: int = 0
     ) -> Tuple[str, int]:
         regex = re.compile(pattern, _translate_flags(flags))
-        result, count = regex.subn(repl, text)
-        return result, count
+        return regex.subn(repl, text, count=count)
 
-    def split(self, pattern: str, flags: str, text: str) -> List[str]:
+    def split(
+        self, pattern: str, flags: str, text: str, maxsplit: int = 0
+    ) -> List[Optional[str]]:
         regex = re.compile(pattern, _translate_flags(flags))
-        return regex.split(text)
+        return regex.split(text, maxsplit=maxsplit)
+
+    def is_match(self, pattern: str, flags: str, text: str) -> bool:
+        regex = re.compile(pattern, _translate_flags(flags))
+        return regex.search(text) is not None
+
+    def count(self, pattern: str, flags: str, text: str) -> int:
+        regex = re.compile(pattern, _translate_flags(flags))
+        return sum(1 for _ in regex.finditer(text))
 
     def compile(self, pattern: str, flags: str) -> Dict[str, Any]:
         """MockEngine doesn't expose NFA structure."""
@@ -61,21 +90,73 @@ class MockEngine(EngineAdapter):
             "Compile endpoint not available with mock engine - use real engine"
         )
 
+    def compile_set(self, patterns: List[str], flags: str) -> Any:
+        return [re.compile(p, _translate_flags(flags)) for p in patterns]
+
+    def match_set(self, compiled: Any, text: str, spans: bool) -> Dict[str, Any]:
+        matches = [i for i, regex in enumerate(compiled) if regex.search(text)]
+        return {
+            "matches": matches,
+            "spans": (
+                {i: [m.span() for m in compiled[i].finditer(text)] for i in matches}
+                if spans
+                else None
+            ),
+        }
+
 
 class RealEngine(EngineAdapter):
     def match(self, pattern: str, flags: str, text: str) -> List[dict]:
         return matcher.match_with_groups(pattern, text, flags)
 
     def replace(
-        self, pattern: str, flags: str, text: str, repl: str
+        self, pattern: str, flags: str, text: str, repl: str, count: int = 0
     ) -> Tuple[str, int]:
-        return matcher.replace(pattern, flags, text, repl)
+        return matcher.replace(pattern, flags, text, repl, count)
+
+    def split(
+        self, pattern: str, flags: str, text: str, maxsplit: int = 0
+    ) -> List[Optional[str]]:
+        return matcher.split(pattern, text, flags, maxsplit)
+
+    def is_match(self, pattern: str, flags: str, text: str) -> bool:
+        return matcher.is_match(pattern, text, flags)
 
-    def split(self, pattern: str, flags: str, text: str) -> List[str]:
-        return matcher.split(pattern, text, flags)
+    def count(self, pattern: str, flags: str, text: str) -> int:
+        return matcher.count(pattern, text, flags)
 
     def compile(self, pattern: str, flags: str) -> Dict[str, Any]:
-        raise NotImplementedError("Compile endpoint not yet implemented in RealEngine")
+        prog = regex_lite.compile(pattern, flags).prog
+        # Export the whole graph, including repeat copies not reached yet.
+        prog.expand_all()
+        states = []
+        for s in range(len(prog)):
+            edge = prog.describe_edge(s)
+            states.append(
+                {
+                    "index": s,
+                    "accept": prog.is_accept(s),
+                    "edges": [edge] if edge is not None else [],
+                    "epsilon_transitions": list(prog.eps_targets(s)),
+                    "require_bol": bool(prog.state_flags[s] & F_BOL),
+                    "require_eol": bool(prog.state_flags[s] & F_EOL),
+                }
+            )
+        return {
+            "start_state": prog.start,
+            "accept_states": [s for s in range(len(prog)) if prog.is_accept(s)],
+            "state_count": len(prog),
+            "states": states,
+        }
+
+    def compile_set(self, patterns: List[str], flags: str) -> Any:
+        return regex_lite.RegexSet(patterns, flags)
+
+    def match_set(self, compiled: Any, text: str, spans: bool) -> Dict[str, Any]:
+        if spans:
+            found = compiled.spans(text)
+            return {"matches": sorted(found), "spans": found}
+        return {"matches": compiled.matches(text), "spans": None}
 
 
 def get_engine() -> EngineAdapter:
@@ -1,5 +1,11 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from regex_lite.parser import RegexSyntaxError
@@ -8,14 +14,31 @@ from .adapters import get_engine
 from .schemas import (
     CompileRequest,
     CompileResponse,
+    CountRequest,
+    CountResponse,
+    IsMatchRequest,
+    IsMatchResponse,
     MatchRequest,
     MatchResponse,
+    RegexSetMatchRequest,
+    RegexSetMatchResponse,
+    RegexSetRequest,
+    RegexSetResponse,
     ReplaceRequest,
     ReplaceResponse,
     SplitRequest,
     SplitResponse,
 )
 
+# Compiled regex sets kept per app; the least recently used is evicted.
+MAX_REGEX_SETS = 128
+
+
+def _set_id(patterns: list[str], flags: str) -> str:
+    # Content-addressed, so resubmitting the same set returns the same ID.
+    payload = json.dumps([flags, patterns], ensure_ascii=False).encode()
+    return hashlib.sha256(payload).hexdigest()[:16]
+
 
 def create_app() -> FastAPI:
     app = FastAPI()
@@ -26,6 +49,8 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     engine = get_engine()
+    regex_sets: OrderedDict[str, Any] = OrderedDict()
+    regex_sets_lock = threading.Lock()
 
     @app.get("/healthz")
     def healthz() -> dict[str, bool]:
@@ -52,7 +77,9 @@ def create_app() -> FastAPI:
     @app.post("/regex/replace", response_model=ReplaceResponse)
     def regex_replace(req: ReplaceRequest) -> ReplaceResponse:
         try:
-            output, count = engine.replace(req.pattern, req.flags, req.text, req.repl)
+            output, count = engine.replace(
+                req.pattern, req.flags, req.text, req.repl, req.count
+            )
             return ReplaceResponse(output=output, count=count)
         except RegexSyntaxError as exc:
             raise HTTPException(
@@ -70,7 +97,7 @@ def create_app() -> FastAPI:
     @app.post("/regex/split", response_model=SplitResponse)
     def regex_split(req: SplitRequest) -> SplitResponse:
         try:
-            pieces = engine.split(req.pattern, req.flags, req.text)
+            pieces = engine.split(req.pattern, req.flags, req.text, req.maxsplit)
             return SplitResponse(pieces=pieces)
         except RegexSyntaxError as exc:
             raise HTTPException(
@@ -85,6 +112,42 @@ def create_app() -> FastAPI:
         except Exception as exc:
             raise HTTPException(status_code=500, detail=f"Internal error: {str(exc)}")
 
+    @app.post("/regex/test", response_model=IsMatchResponse)
+    def regex_test(req: IsMatchRequest) -> IsMatchResponse:
+        try:
+            matched = engine.is_match(req.pattern, req.flags, req.text)
+            return IsMatchResponse(matched=matched)
+        except RegexSyntaxError as exc:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "error": str(exc),
+                    "position": exc.position,
+                },
+            )
+        except NotImplementedError as exc:
+            raise HTTPException(status_code=501, detail=str(exc))
+        except Exception as exc:
+            raise HTTPException(status_code=500, detail=f"Internal error: {str(exc)}")
+
+    @app.post("/regex/count", response_model=CountResponse)
+    def regex_count(req: CountRequest) -> CountResponse:
+        try:
+            count = engine.count(req.pattern, req.flags, req.text)
+            return CountResponse(count=count)
+        except RegexSyntaxError as exc:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "error": str(exc),
+                    "position": exc.position,
+                },
+            )
+        except NotImplementedError as exc:
+            raise HTTPException(status_code=501, detail=str(exc))
+        except Exception as exc:
+            raise HTTPException(status_code=500, detail=f"Internal error: {str(exc)}")
+
     @app.post("/regex/compile", response_model=CompileResponse)
     def regex_compile(req: CompileRequest) -> CompileResponse:
         try:
@@ -103,4 +166,49 @@ def create_app() -> FastAPI:
         except Exception as exc:
             raise HTTPException(status_code=500, detail=f"Internal error: {str(exc)}")
 
+    @app.post("/regex/sets", response_model=RegexSetResponse)
+    def regex_set_create(req: RegexSetRequest) -> RegexSetResponse:
+        set_id = _set_id(req.patterns, req.flags)
+        with regex_sets_lock:
+            if set_id in regex_sets:
+                regex_sets.move_to_end(set_id)
+                return RegexSetResponse(set_id=set_id, size=len(req.patterns))
+        try:
+            compiled = engine.compile_set(req.patterns, req.flags)
+        except RegexSyntaxError as exc:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "error": str(exc),
+                    "position": exc.position,
+                    "pattern_index": getattr(exc, "pattern_index", None),
+                },
+            )
+        except NotImplementedError as exc:
+            raise HTTPException(status_code=501, detail=str(exc))
+        except Exception as exc:
+            raise HTTPException(status_code=500, detail=f"Internal error: {str(exc)}")
+        with regex_sets_lock:
+            regex_sets[set_id] = compiled
+            while len(regex_sets) > MAX_REGEX_SETS:
+                regex_sets.popitem(last=False)
+        return RegexSetResponse(set_id=set_id, size=len(req.patterns))
+
+    @app.post("/regex/sets/{set_id}/match", response_model=RegexSetMatchResponse)
+    def regex_set_match(
+        set_id: str, req: RegexSetMatchRequest
+    ) -> RegexSetMatchResponse:
+        with regex_sets_lock:
+            compiled = regex_sets.get(set_id)
+            if compiled is not None:
+                regex_sets.move_to_end(set_id)
+        if compiled is None:
+            raise HTTPException(status_code=404, detail=f"unknown regex set {set_id!r}")
+        try:
+            return RegexSetMatchResponse(
+                **engine.match_set(compiled, req.text, req.spans)
+            )
+        except Exception as exc:
+            raise HTTPException(status_code=500, detail=f"Internal error: {str(exc)}")
+
     return app
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from pydantic import BaseModel
 
@@ -13,9 +13,18 @@ class MatchRequest(BaseModel):
 
 class ReplaceRequest(MatchRequest):
     repl: str
+    count: int = 0  # replace at most this many matches; 0 means all
 
 
 class SplitRequest(MatchRequest):
+    maxsplit: int = 0  # split at most this many times; 0 means no limit
+
+
+class IsMatchRequest(MatchRequest):
+    pass
+
+
+class CountRequest(MatchRequest):
     pass
 
 
@@ -39,7 +48,15 @@ class ReplaceResponse(BaseModel):
 
 
 class SplitResponse(BaseModel):
-    pieces: List[str]
+    pieces: List[Optional[str]]  # captured groups that did not match are null
+
+
+class IsMatchResponse(BaseModel):
+    matched: bool
+
+
+class CountResponse(BaseModel):
+    count: int
 
 
 class StateInfo(BaseModel):
@@ -60,3 +77,25 @@ class CompileResponse(BaseModel):
     accept_states: List[int]
     state_count: int
     states: List[StateInfo]
+
+
+class RegexSetRequest(BaseModel):
+    """A list of patterns to compile into one reusable set."""
+
+    patterns: List[str]
+    flags: str = ""
+
+
+class RegexSetResponse(BaseModel):
+    set_id: str
+    size: int
+
+
+class RegexSetMatchRequest(BaseModel):
+    text: str
+    spans: bool = False  # also return the spans of every matching pattern
+
+
+class RegexSetMatchResponse(BaseModel):
+    matches: List[int]  # indices of the patterns that match
+    spans: Optional[Dict[int, List[Tuple[int, int]]]] = None
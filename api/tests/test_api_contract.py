@@ -53,6 +53,30 @@ def test_replace(client):
     assert data == {"output": "abc # xyz", "count": 1}
 
 
+@pytest.mark.parametrize(
+    "repl,count,expected",
+    [
+        ("#", -1, ("a1b22", 0)),
+        (r"x\0", 0, ("ax\u0000bx\u0000", 2)),
+        (r"<\g<0>>", 1, ("a<1>b22", 1)),
+    ],
+)
+def test_replace_count_and_escapes_follow_re(client, repl, count, expected):
+    cli, _ = client
+    resp = cli.post(
+        "/regex/replace",
+        json={
+            "pattern": r"\d+",
+            "text": "a1b22",
+            "flags": "",
+            "repl": repl,
+            "count": count,
+        },
+    )
+    assert resp.status_code == 200
+    assert resp.json() == {"output": expected[0], "count": expected[1]}
+
+
 def test_split(client):
     cli, use_mock = client
     resp = cli.post(
@@ -75,6 +99,16 @@ def test_split_multiple_spaces(client):
     assert data["pieces"] == ["a", "b", "c"]
 
 
+def test_split_maxsplit_and_groups(client):
+    cli, use_mock = client
+    resp = cli.post(
+        "/regex/split",
+        json={"pattern": r"(-)|;", "text": "a-b;c-d", "flags": "", "maxsplit": 2},
+    )
+    assert resp.status_code == 200
+    assert resp.json()["pieces"] == ["a", "-", "b", None, "c-d"]
+
+
 def test_invalid_pattern_error(client):
     """Test that invalid patterns return proper error responses."""
     cli, use_mock = client
@@ -128,3 +162,83 @@ def test_invalid_pattern_in_split(client):
     assert resp.status_code == 400
     data = resp.json()
     assert "error" in data["detail"]
+
+
+def test_compile(client):
+    cli, use_mock = client
+    resp = cli.post("/regex/compile", json={"pattern": "^a|b", "flags": "i"})
+    if use_mock:
+        assert resp.status_code == 501
+        return
+
+    assert resp.status_code == 200
+    data = resp.json()
+    states = data["states"]
+    assert data["start_state"] == 0
+    assert data["state_count"] == len(states)
+    assert data["accept_states"] == [s["index"] for s in states if s["accept"]]
+    assert any(s["require_bol"] for s in states)
+    edges = [e for s in states for e in s["edges"]]
+    assert {e["char"] for e in edges} == {"a", "b"}
+    assert all(0 <= e["to"] < len(states) for e in edges)
+
+
+def test_regex_set_submit_once_and_reuse(client):
+    cli, _ = client
+    body = {"patterns": [r"\d+", "^GET ", "error"], "flags": ""}
+    resp = cli.post("/regex/sets", json=body)
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["size"] == 3
+    set_id = data["set_id"]
+    # Resubmitting the same set returns the same ID.
+    assert cli.post("/regex/sets", json=body).json()["set_id"] == set_id
+
+    resp = cli.post(f"/regex/sets/{set_id}/match", json={"text": "GET /a 200"})
+    assert resp.status_code == 200
+    assert resp.json() == {"matches": [0, 1], "spans": None}
+
+    resp = cli.post(
+        f"/regex/sets/{set_id}/match", json={"text": "error 42", "spans": True}
+    )
+    assert resp.json() == {"matches": [0, 2], "spans": {"0": [[6, 8]], "2": [[0, 5]]}}
+
+
+def test_regex_set_unknown_id(client):
+    cli, _ = client
+    resp = cli.post("/regex/sets/doesnotexist/match", json={"text": "x"})
+    assert resp.status_code == 404
+
+
+def test_regex_set_invalid_pattern(client):
+    cli, use_mock = client
+    if use_mock:
+        return
+
+    resp = cli.post("/regex/sets", json={"patterns": ["ok", "(bad"]})
+    assert resp.status_code == 400
+    assert resp.json()["detail"]["pattern_index"] == 1
+
+
+def test_test_and_count(client):
+    cli, _ = client
+    body = {"pattern": r"\d+", "text": "a1 b22 c333", "flags": ""}
+    resp = cli.post("/regex/test", json=body)
+    assert resp.status_code == 200
+    assert resp.json() == {"matched": True}
+    resp = cli.post("/regex/test", json={**body, "text": "none"})
+    assert resp.json() == {"matched": False}
+    resp = cli.post("/regex/count", json=body)
+    assert resp.status_code == 200
+    assert resp.json() == {"count": 3}
+
+
+def test_invalid_pattern_in_test_and_count(client):
+    cli, use_mock = client
+    if use_mock:
+        return
+
+    for path in ("/regex/test", "/regex/count"):
+        resp = cli.post(path, json={"pattern": "(x", "text": "x", "flags": ""})
+        assert resp.status_code == 400
+        assert "error" in resp.json()["detail"]
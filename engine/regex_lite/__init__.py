@@ -1,15 +1,39 @@
 """regex_lite engine package."""
 
+from .binary import BytesPattern
 from .lexer import Lexer, tokenize
-from .matcher import match_spans, match_with_groups, replace, split
+from .matcher import (
+    count,
+    is_match,
+    match_spans,
+    match_with_groups,
+    replace,
+    split,
+    splititer,
+)
 from .parser import RegexSyntaxError
+from .pattern import Match, Pattern, PatternCache, compile, purge
+from .regexset import RegexSet
+from .serialize import DiskCache, loads
 
 __all__ = [
     "Lexer",
     "tokenize",
     "match_spans",
     "match_with_groups",
+    "is_match",
+    "count",
     "replace",
     "split",
+    "splititer",
     "RegexSyntaxError",
+    "Match",
+    "Pattern",
+    "PatternCache",
+    "compile",
+    "purge",
+    "RegexSet",
+    "BytesPattern",
+    "DiskCache",
+    "loads",
 ]
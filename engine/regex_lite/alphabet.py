@@ -0,0 +1,192 @@
+"""Character equivalence classes of a compiled program.
+
+Two characters are equivalent when every consuming edge of a
+:class:`~regex_lite.compiler.Program` accepts both or neither of them (and,
+under the ``m`` flag, both or neither is a newline, which decides ``^`` and
+``$``).  Automata built over the program then need one transition per class
+instead of one per character, and an NFA step looks up the states that
+consume a character's class (:meth:`Alphabet.consumers`) instead of testing
+each edge.
+
+The classes are computed from the exact code point ranges of the edges
+(:meth:`Program.edge_ranges`): the range boundaries cut the code space into
+intervals, and intervals that lie in the same set of edges share a class.
+
+Expanding a Unicode shorthand such as ``\\w`` over the whole code space takes
+a noticeable fraction of a second, so every program carries a *lazy*
+alphabet (``exact=False``, :attr:`Program.alphabet`): it partitions Latin-1
+up front and keys a higher code point by its signature (the set of edges
+accepting it), computed the first time the character is classified.  The
+ahead-of-time DFA builds an exact alphabet, whose classes cover all of
+Unicode and are known in advance.
+"""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import TYPE_CHECKING, Iterable
+
+from . import compiler
+from .charset import MAX_CODE_POINT
+
+if TYPE_CHECKING:
+    from .compiler import Program
+
+_TABLE_SIZE = 256
+# Code points above Latin-1 remembered by a lazy alphabet before it forgets
+# them all; each one costs a test of every edge to classify again.
+_MAX_REMEMBERED = 4096
+
+
+class Alphabet:
+    """Partition of the code space into the classes of one program.
+
+    ``count`` classes are numbered from 0 (the class of ``chr(0)``) in
+    code point order of their first member; ``representatives[k]`` is that
+    member.  :meth:`classify` maps a code point to its class, through a
+    256-entry ``table`` for Latin-1 and a search of the interval ``starts``
+    (with their class ``ids``) above it.
+
+    With ``exact=False`` only Latin-1 is partitioned in advance: ``count``
+    and ``representatives`` cover the classes met there, and a higher code
+    point whose edges match no such class gets a key of ``count`` or more
+    derived from its signature.  Keys of both kinds can be passed to
+    :meth:`consumers`.
+    """
+
+    __slots__ = (
+        "prog",
+        "exact",
+        "starts",
+        "ids",
+        "table",
+        "count",
+        "representatives",
+        "_edges",
+        "_edge_index",
+        "_edge_states",
+        "_signatures",
+        "_class_of",
+        "_above",
+        "_consumers",
+    )
+
+    def __init__(self, prog: "Program", exact: bool = True) -> None:
+        self.prog = prog
+        self.exact = exact
+        top = MAX_CODE_POINT if exact else _TABLE_SIZE - 1
+        # One range list per distinct edge, with the states that carry it.
+        edges: dict[tuple[int, int], list[int]] = {}
+        for s in range(len(prog)):
+            if prog.op[s] != compiler.OP_NONE:
+                edges.setdefault((prog.op[s], prog.arg[s]), []).append(s)
+        self._edges = tuple(states[0] for states in edges.values())
+        self._edge_index = {edge: i for i, edge in enumerate(edges)}
+        self._edge_states = tuple(set(states) for states in edges.values())
+        sets = [prog.edge_ranges(s, top) for s in self._edges]
+        if prog.multiline:
+            sets.append([(10, 10)])
+
+        bounds = {0}
+        for ranges in sets:
+            for lo, hi in ranges:
+                bounds.add(lo)
+                if hi < top:
+                    bounds.add(hi + 1)
+        starts = sorted(bounds)
+        # Bit i of signature[j] is set when interval j lies in set i.
+        signature = [0] * len(starts)
+        for i, ranges in enumerate(sets):
+            bit = 1 << i
+            for lo, hi in ranges:
+                for j in range(bisect_left(starts, lo), bisect_right(starts, hi)):
+                    signature[j] |= bit
+
+        self._class_of: dict[int, int] = {}
+        self._signatures: list[int] = []
+        self.starts = array("l")
+        self.ids = array("i")
+        self.representatives: list[str] = []
+        for start, sig in zip(starts, signature):
+            k = self._class_of.get(sig)
+            if k is None:
+                k = self._class_of[sig] = len(self._signatures)
+                self._signatures.append(sig)
+                self.representatives.append(chr(start))
+            if not self.ids or self.ids[-1] != k:
+                self.starts.append(start)
+                self.ids.append(k)
+        self.count = len(self._signatures)
+        self.table = array("i", (self._search(c) for c in range(_TABLE_SIZE)))
+        self._above: dict[int, int] = {}
+        self._consumers: dict[int, set[int]] = {}
+
+    def _search(self, c: int) -> int:
+        return self.ids[bisect_right(self.starts, c) - 1]
+
+    def _signature(self, ch: str) -> int:
+        matches = self.prog.matches
+        sig = 0
+        for i, s in enumerate(self._edges):
+            if matches(s, ch):
+                sig |= 1 << i
+        if ch == "\n" and self.prog.multiline:
+            sig |= 1 << len(self._edges)
+        return sig
+
+    def classify(self, c: int) -> int:
+        """Return the class (or, for a lazy alphabet, the key) of code point ``c``."""
+
+        if c < _TABLE_SIZE:
+            return self.table[c]
+        if self.exact:
+            return self._search(c)
+        k = self._above.get(c)
+        if k is None:
+            if len(self._above) >= _MAX_REMEMBERED:
+                self._above.clear()
+            sig = self._signature(chr(c))
+            k = self._above[c] = self._class_of.get(sig, self.count + sig)
+        return k
+
+    def consumers(self, k: int) -> set[int]:
+        """Return the states whose consuming edge accepts the characters of ``k``.
+
+        The set is shared and grows with the program (see
+        :meth:`add_states`); callers must not modify it.
+        """
+
+        states = self._consumers.get(k)
+        if states is None:
+            sig = self._signature_of(k)
+            states = set()
+            for i, edge_states in enumerate(self._edge_states):
+                if sig >> i & 1:
+                    states |= edge_states
+            self._consumers[k] = states
+        return states
+
+    def _signature_of(self, k: int) -> int:
+        return self._signatures[k] if k < self.count else k - self.count
+
+    def add_states(self, states: Iterable[int]) -> None:
+        """Add states appended to the program by a lazy repeat expansion.
+
+        Their edges are copies of edges the program already has, so the
+        classes do not change; the states join the sets returned by
+        :meth:`consumers`, in place, so a scan holding one sees them.
+        """
+
+        prog = self.prog
+        for s in states:
+            if prog.op[s] == compiler.OP_NONE:
+                continue
+            i = self._edge_index[prog.op[s], prog.arg[s]]
+            self._edge_states[i].add(s)
+            for k, found in self._consumers.items():
+                if self._signature_of(k) >> i & 1:
+                    found.add(s)
+
+    def __len__(self) -> int:
+        return self.count
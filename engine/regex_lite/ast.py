@@ -20,6 +20,13 @@ class Literal(Expr):
     char: str
 
 
+@dataclass
+class String(Expr):
+    """Run of literal characters, e.g. ``abc``; built by the optimizer."""
+
+    text: str
+
+
 @dataclass
 class Dot(Expr):
     """Wildcard ``.`` that matches any character."""
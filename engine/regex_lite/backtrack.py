@@ -0,0 +1,102 @@
+"""Bounded backtracking: capture extraction for short spans.
+
+Like the Pike VM (:mod:`regex_lite.pikevm`), :func:`captures` reports the
+groups of the preferred path that matches exactly a span the span engines
+found.  Instead of advancing every thread one position at a time, it
+follows one path depth-first, trying the alternatives of each state in
+priority order (the consuming edge, then the epsilon edges in compiler
+order), and stops at the first path that accepts at the span end.  That is
+the path the Pike VM keeps, so both report the same groups.
+
+Whether a state can still reach the span end from a position does not
+depend on the path that led there, so every ``(state, position)`` pair is
+tried at most once; a visited table with one flag per pair records them.
+The cost is therefore bounded by ``states x (len(span) + 1)`` steps, as for
+the Pike VM, but each step is cheaper: groups are written into one slot
+list and restored on backtracking rather than copied per thread.  The table
+is allocated per call (a byte per flag, which indexes faster than packed
+bits), so :func:`fits` limits the backtracker to spans whose table stays
+within :data:`BUDGET` entries.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from .compiler import F_ACCEPT, F_BOL, F_EOL, F_LAZY
+
+if TYPE_CHECKING:
+    from .compiler import Program
+
+#: Largest ``states x (len(span) + 1)`` visited table :func:`fits` accepts.
+BUDGET = 256 * 1024
+
+
+def fits(prog: "Program", start: int, end: int) -> bool:
+    """Return whether the visited bitset for ``[start, end]`` fits :data:`BUDGET`."""
+
+    return len(prog) * (end - start + 1) <= BUDGET
+
+
+def captures(
+    prog: "Program", text: str, start: int, end: int, ngroups: int
+) -> list[tuple[int, int] | None] | None:
+    """Return the group spans of the preferred path matching ``text[start:end]``.
+
+    The result has one entry per group (``None`` for groups that did not
+    participate), or is ``None`` if no path matches exactly that span.
+    """
+
+    state_flags, out = prog.state_flags, prog.out
+    eps, eps_lo, eps_hi = prog.eps, prog.eps_lo, prog.eps_hi
+    saves, save_lo, save_hi = prog.saves, prog.save_lo, prog.save_hi
+    classify, consumers = prog.alphabet.classify, prog.alphabet.consumers
+    multiline = prog.multiline
+    n = len(text)
+    width = end - start + 1
+    visited = bytearray(len(prog) * width)
+    # movers[i]: the states whose edge accepts text[start + i].
+    movers = [consumers(classify(ord(text[p]))) for p in range(start, end)]
+    slots = [-1] * (2 * ngroups)
+    # Entries are (state, position) to try, or (~slot, value) to restore a
+    # slot once everything tried after writing it has failed.
+    stack = [(prog.start, start)]
+    while stack:
+        u, p = stack.pop()
+        if u < 0:
+            slots[~u] = p
+            continue
+        i = u * width + p - start
+        if i >= len(visited):
+            # States appended by a lazy repeat expansion (Program.expand).
+            visited.extend(bytes(len(prog) * width - len(visited)))
+        if visited[i]:
+            continue
+        visited[i] = 1
+        flags = state_flags[u]
+        if flags & F_BOL and not (p == 0 or (multiline and text[p - 1] == "\n")):
+            continue
+        if flags & F_EOL and not (p == n or (multiline and text[p] == "\n")):
+            continue
+        for k in range(save_lo[u], save_hi[u]):
+            slot = saves[k]
+            stack.append((~slot, slots[slot]))
+            slots[slot] = p
+        if flags & F_ACCEPT and p == end:
+            return [
+                (
+                    (slots[j], slots[j + 1])
+                    if slots[j] >= 0 and slots[j + 1] >= 0
+                    else None
+                )
+                for j in range(0, len(slots), 2)
+            ]
+        if flags & F_LAZY:
+            prog.expand(u)
+        # Pushed in reverse so the consuming edge is tried first, then the
+        # epsilon edges in priority order.
+        for k in range(eps_hi[u] - 1, eps_lo[u] - 1, -1):
+            stack.append((eps[k], p))
+        if p < end and u in movers[p - start]:
+            stack.append((out[u], p + 1))
+    return None
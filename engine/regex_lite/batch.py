@@ -0,0 +1,187 @@
+"""Matching one compiled pattern against many short texts.
+
+:meth:`Pattern.match_many` and :meth:`Pattern.search_many` answer one
+question per record and return compact arrays instead of match dicts: a
+``bytearray`` mask (1 where the record matches at its start) and an
+``array('q')`` of first-match starts (``-1`` for no match).
+
+When NumPy is installed, a large batch of ``str`` records is padded into one
+``uint32`` code point matrix and the lazy DFA is advanced one column at a
+time for every record at once: each step computes the distinct
+``(state, character)`` pairs of the column with :func:`numpy.unique`, takes
+their transitions from the DFA cache (building missing ones as usual) and
+scatters the results back.  Python work per column is then proportional to
+the number of distinct pairs, not to the number of records.
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import TYPE_CHECKING, Sequence
+
+from . import binary, matcher
+from .dfa import _MISSING, DFAGaveUp
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised without NumPy installed
+    np = None
+
+if TYPE_CHECKING:
+    from .dfa import LazyDFA, _DState
+    from .pattern import Pattern
+
+#: Smallest batch for which ``use_numpy=None`` picks the NumPy path.
+NUMPY_MIN_BATCH = 512
+#: Largest padded matrix (records x longest record) built by the NumPy path.
+NUMPY_MAX_CELLS = 32 * 1024 * 1024
+
+_KEY_BASE = 0x110000  # one past the largest code point
+
+
+def _anchored_end(pattern: "Pattern", text: str) -> int | None:
+    if isinstance(pattern, binary.BytesPattern):
+        text = binary._view(text)
+    if pattern.dfa is not None:
+        try:
+            return pattern.dfa.longest_at(text, 0)
+        except DFAGaveUp:
+            pass
+    span = matcher._search(pattern.prog, text, 0, anchored=True)
+    return span[1] if span is not None else None
+
+
+def _first_start(pattern: "Pattern", text: str) -> int:
+    span = next(pattern._iter_spans(text), None)
+    return span[0] if span is not None else -1
+
+
+def _start_before(dfa: "LazyDFA", text: str, end: int) -> int:
+    return dfa.leftmost(text, 0, end)[0]
+
+
+def _use_numpy(
+    pattern: "Pattern", texts: Sequence, use_numpy: bool | None, anchored: bool
+) -> bool:
+    usable = (
+        pattern.dfa is not None
+        and not isinstance(pattern, binary.BytesPattern)
+        and all(isinstance(t, str) for t in texts)
+    )
+    if use_numpy:
+        if np is None:
+            raise ModuleNotFoundError("use_numpy=True requires NumPy")
+        if not usable:
+            raise ValueError("use_numpy=True requires str texts and the lazy DFA")
+        return True
+    if use_numpy is None and np is not None and usable:
+        if len(texts) < NUMPY_MIN_BATCH:
+            return False
+        # Unanchored searches with a literal scan are faster per record.
+        if not anchored and (pattern.literal or pattern.prefilter):
+            return False
+        return len(texts) * max(map(len, texts)) <= NUMPY_MAX_CELLS
+    return False
+
+
+def _dfa_ends(dfa: "LazyDFA", texts: Sequence[str], anchored: bool):
+    """Return, per record, the first position where ``dfa`` accepts, or -1.
+
+    Anchored runs look for a match starting at 0; unanchored ones find the
+    smallest end of any match (:meth:`LazyDFA.earliest_end` per record).
+    """
+
+    n = len(texts)
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=n)
+    width = int(lengths.max(initial=0))
+    if width:
+        chars = np.array(texts, dtype=f"<U{width}").view(np.uint32).reshape(n, width)
+    multiline = dfa.multiline
+
+    states: list[_DState] = []
+    index: dict[int, int] = {}
+    accept: list[bool] = []
+    accept_eol: list[bool] = []
+
+    def state_id(st: "_DState | None") -> int:
+        if st is None:
+            return -1
+        i = index.get(id(st))
+        if i is None:
+            i = index[id(st)] = len(states)
+            states.append(st)
+            accept.append(st.accept)
+            accept_eol.append(st.accept_eol)
+        return i
+
+    start = dfa._state(dfa._start_core, True, not anchored)
+    cur = np.full(n, state_id(start), dtype=np.int64)
+    rows = np.arange(n)
+    ends = np.full(n, -1, dtype=np.int64)
+    for j in range(width + 1):
+        acc = np.array(accept)
+        acc_eol = np.array(accept_eol)
+        # Records ending here accept if their state accepts at an end.
+        last = lengths[rows] == j
+        if last.any():
+            done = rows[last]
+            ends[done[acc_eol[cur[last]]]] = j
+            rows, cur = rows[~last], cur[~last]
+        if not len(rows):
+            break
+        col = chars[rows, j]
+        here = acc[cur]
+        if multiline:
+            nl = col == 10
+            here[nl] = acc_eol[cur[nl]]
+        if here.any():
+            ends[rows[here]] = j
+            rows, cur, col = rows[~here], cur[~here], col[~here]
+        dfa._scanned += len(rows)
+        keys, inverse = np.unique(cur * _KEY_BASE + col, return_inverse=True)
+        targets = np.empty(len(keys), dtype=np.int64)
+        for k, key in enumerate(keys.tolist()):
+            st = states[key // _KEY_BASE]
+            ch = chr(key % _KEY_BASE)
+            nxt = st.next.get(ch, _MISSING)
+            if nxt is _MISSING:
+                nxt = dfa._transition(st, ch)
+            targets[k] = state_id(nxt)
+        cur = targets[inverse.reshape(-1)]
+        alive = cur >= 0
+        rows, cur = rows[alive], cur[alive]
+    return ends
+
+
+def match_many(
+    pattern: "Pattern", texts: Sequence[str], use_numpy: bool | None = None
+) -> bytearray:
+    """Return a mask with 1 for every text that ``pattern`` matches at 0."""
+
+    if _use_numpy(pattern, texts, use_numpy, True):
+        try:
+            return bytearray((_dfa_ends(pattern.dfa, texts, True) >= 0).tobytes())
+        except DFAGaveUp:
+            pass
+    return bytearray(_anchored_end(pattern, t) is not None for t in texts)
+
+
+def search_many(
+    pattern: "Pattern", texts: Sequence[str], use_numpy: bool | None = None
+) -> array:
+    """Return the start of the first match in every text (``-1`` for none)."""
+
+    if _use_numpy(pattern, texts, use_numpy, False):
+        try:
+            ends = _dfa_ends(pattern.dfa, texts, False).tolist()
+            # The leftmost match starts at or before its earliest end.
+            return array(
+                "q",
+                (
+                    _start_before(pattern.dfa, t, e) if e >= 0 else -1
+                    for t, e in zip(texts, ends)
+                ),
+            )
+        except DFAGaveUp:
+            pass
+    return array("q", (_first_start(pattern, t) for t in texts))
@@ -0,0 +1,487 @@
+"""Matching over byte buffers: ``bytes``, ``bytearray``, ``memoryview``, ``mmap``.
+
+A :class:`BytesPattern` is compiled to byte-level transitions: before the
+usual NFA construction its tree is lowered (:func:`lower`) so that every
+literal, dot, shorthand and class consumes single bytes.
+
+* In the default byte mode each pattern character stands for one byte
+  (``\\xff`` is the byte 255); shorthands and the ``i`` flag follow ASCII
+  rules, as in :mod:`re` with bytes patterns.
+* With ``utf8=True`` the pattern describes Unicode text stored as UTF-8:
+  each character set is rewritten into the byte sequences that encode its
+  code points (split into ranges whose continuation bytes span whole
+  ``0x80-0xBF`` blocks, then merged on common leading bytes).  Shorthands
+  and ``i`` keep their Unicode meaning, and empty matches are not reported
+  inside a multi-byte character.
+
+The engines index the searched text one position at a time, so a buffer is
+wrapped in a :class:`ByteText` that presents each byte as the Latin-1
+character with the same value, without copying the buffer.  A memory-mapped
+file can therefore be searched in place; spans are byte offsets.
+"""
+
+from __future__ import annotations
+
+import functools
+from dataclasses import replace
+from typing import IO, Callable, Iterable, Iterator, Union
+
+from . import ast, literals, optimize, parser, template
+from . import pattern as _pattern
+from .charset import MAX_CODE_POINT, CharSet, _merge, complement, unicode_ranges
+from .compiler import Program
+from .compiler import compile as compile_nfa
+from .dfa import DEFAULT_CACHE_BYTES, LazyDFA
+
+_LATIN1 = tuple(chr(b) for b in range(256))
+_SURROGATES = (0xD800, 0xDFFF)
+# Largest code point encoded with 1, 2 and 3 UTF-8 bytes.
+_UTF8_LIMITS = (0x7F, 0x7FF, 0xFFFF)
+# Window read at a time when searching a buffer without a ``find`` method.
+_FIND_WINDOW = 1 << 20
+
+_ASCII_CLASSES = {
+    "d": [(0x30, 0x39)],
+    "w": [(0x30, 0x39), (0x41, 0x5A), (0x5F, 0x5F), (0x61, 0x7A)],
+    "s": [(0x09, 0x0D), (0x20, 0x20)],
+}
+
+Buffer = Union[bytes, bytearray, memoryview, "ByteText"]
+Ranges = list[tuple[int, int]]
+
+
+class ByteText:
+    """Read-only view of a byte buffer as a string of Latin-1 characters.
+
+    ``text[i]`` is ``chr(buf[i])``; the buffer itself is never copied.  The
+    :meth:`find` and :meth:`startswith` methods used by the literal scans
+    take strings of such characters.
+    """
+
+    __slots__ = ("buf",)
+
+    def __init__(self, buf) -> None:
+        if isinstance(buf, memoryview) and buf.format != "B":
+            buf = buf.cast("B")
+        self.buf = buf
+
+    def __len__(self) -> int:
+        return len(self.buf)
+
+    def __getitem__(self, i: int) -> str:
+        return _LATIN1[self.buf[i]]
+
+    def find(self, sub: str, start: int = 0) -> int:
+        needle = sub.encode("latin-1")
+        buf = self.buf
+        find = getattr(buf, "find", None)
+        if find is not None:
+            return find(needle, start)
+        # memoryview has no find(); scan it in bounded windows instead.
+        last = len(buf) - len(needle)
+        while start <= last:
+            window = bytes(buf[start : start + _FIND_WINDOW + len(needle) - 1])
+            i = window.find(needle)
+            if i >= 0:
+                return start + i
+            start += _FIND_WINDOW
+        return -1
+
+    def startswith(self, prefix: str, start: int = 0) -> bool:
+        return self.buf[start : start + len(prefix)] == prefix.encode("latin-1")
+
+
+def _view(buf: Buffer) -> ByteText:
+    if isinstance(buf, ByteText):
+        return buf
+    if isinstance(buf, str):
+        raise TypeError("BytesPattern searches bytes-like objects, not str")
+    return ByteText(buf)
+
+
+# ---------------------------------------------------------------------------
+# Character sets as code point ranges
+# ---------------------------------------------------------------------------
+def _class_ranges(kind: str, utf8: bool) -> Ranges:
+    if utf8:
+        return list(unicode_ranges(kind))
+    ranges = _ASCII_CLASSES[kind.lower()]
+    return complement(ranges, 0xFF) if kind.isupper() else list(ranges)
+
+
+def _ascii_fold(ranges: Ranges) -> Ranges:
+    extra = []
+    for lo, hi in ranges:
+        for c in range(max(lo, 0x41), min(hi, 0x7A) + 1):
+            if 0x41 <= c <= 0x5A or 0x61 <= c <= 0x7A:
+                extra.append((c ^ 0x20, c ^ 0x20))
+    return _merge(ranges + extra)
+
+
+def _byte(ch: str) -> int:
+    c = ord(ch)
+    if c > 0xFF:
+        raise parser.RegexSyntaxError(
+            f"character {ch!r} does not fit in a byte (compile with utf8=True)"
+        )
+    return c
+
+
+def _set_ranges(node: ast.Expr, fold: bool, utf8: bool) -> Ranges:
+    """Return the merged code point ranges matched by a one-character node."""
+
+    if isinstance(node, ast.Literal):
+        items: list = [node]
+        negated = False
+    elif isinstance(node, ast.Shorthand):
+        items, negated = [node], False
+    else:
+        items, negated = node.items, node.negated
+    ranges: Ranges = []
+    for it in items:
+        if isinstance(it, ast.Shorthand):
+            ranges.extend(_class_ranges(it.kind, utf8))
+        elif isinstance(it, ast.Range):
+            lo, hi = it.start, it.end
+            ranges.append((ord(lo), ord(hi)) if utf8 else (_byte(lo), _byte(hi)))
+        else:
+            c = ord(it.char) if utf8 else _byte(it.char)
+            ranges.append((c, c))
+    ranges = _merge(ranges)
+    if fold:
+        ranges = (
+            list(CharSet(ranges, fold=True).ranges) if utf8 else _ascii_fold(ranges)
+        )
+    if negated:
+        ranges = complement(ranges, MAX_CODE_POINT if utf8 else 0xFF)
+    return ranges
+
+
+# ---------------------------------------------------------------------------
+# Byte-level nodes
+# ---------------------------------------------------------------------------
+def _byte_node(lo: int, hi: int) -> ast.Expr:
+    if lo == hi:
+        return ast.Literal(_LATIN1[lo])
+    return ast.CharClass([ast.Range(_LATIN1[lo], _LATIN1[hi])])
+
+
+def _byte_set(ranges: Ranges) -> ast.Expr:
+    if len(ranges) == 1:
+        return _byte_node(*ranges[0])
+    # An empty class matches nothing, which is right for an empty set.
+    return ast.CharClass(
+        [
+            (
+                ast.Range(_LATIN1[lo], _LATIN1[hi])
+                if lo != hi
+                else ast.Literal(_LATIN1[lo])
+            )
+            for lo, hi in ranges
+        ]
+    )
+
+
+def utf8_sequences(lo: int, hi: int) -> list[list[tuple[int, int]]]:
+    """Split the code points ``lo..hi`` into UTF-8 byte range sequences.
+
+    Each sequence is a list of inclusive ``(first, last)`` byte ranges, one
+    per encoded byte; together they match exactly the UTF-8 encodings of the
+    range (surrogates excluded), each encoding by a single sequence.
+    """
+
+    out: list[list[tuple[int, int]]] = []
+    stack = [(lo, hi)]
+    while stack:
+        lo, hi = stack.pop()
+        while True:
+            if lo <= _SURROGATES[1] and hi >= _SURROGATES[0]:
+                if hi > _SURROGATES[1]:
+                    stack.append((_SURROGATES[1] + 1, hi))
+                hi = _SURROGATES[0] - 1
+            if lo > hi:
+                break
+            limit = next((m for m in _UTF8_LIMITS if lo <= m < hi), None)
+            if limit is not None:
+                stack.append((limit + 1, hi))
+                hi = limit
+                continue
+            if hi <= 0x7F:
+                out.append([(lo, hi)])
+                break
+            for i in (1, 2, 3):
+                m = (1 << (6 * i)) - 1
+                if lo & ~m == hi & ~m:
+                    continue
+                if lo & m:
+                    stack.append(((lo | m) + 1, hi))
+                    hi = lo | m
+                    break
+                if hi & m != m:
+                    stack.append((hi & ~m, hi))
+                    hi = (hi & ~m) - 1
+                    break
+            else:
+                first = chr(lo).encode("utf-8")
+                last = chr(hi).encode("utf-8")
+                out.append(list(zip(first, last)))
+                break
+    return sorted(out)
+
+
+def _merge_sequences(seqs: list[list[tuple[int, int]]]) -> ast.Expr:
+    # Share common leading byte ranges (a trie), so that a large class such
+    # as Unicode ``\w`` becomes a compact automaton.
+    heads: dict[tuple[int, int], list[list[tuple[int, int]]]] = {}
+    for seq in seqs:
+        heads.setdefault(seq[0], []).append(seq[1:])
+    options: list[ast.Expr] = []
+    for (lo, hi), tails in heads.items():
+        head = _byte_node(lo, hi)
+        # The lead byte fixes the length, so the tails are all empty or none.
+        if tails[0]:
+            options.append(ast.Concat([head, _merge_sequences(tails)]))
+        else:
+            options.append(head)
+    return options[0] if len(options) == 1 else ast.Alt(options)
+
+
+def _utf8_set(ranges: Ranges) -> ast.Expr:
+    seqs = [seq for lo, hi in ranges for seq in utf8_sequences(lo, hi)]
+    if not seqs:
+        return ast.CharClass([])
+    ascii_ = [seq[0] for seq in seqs if len(seq) == 1]
+    wide = [seq for seq in seqs if len(seq) > 1]
+    # Single-byte characters stay one class edge.
+    options = ([_byte_set(ascii_)] if ascii_ else []) + (
+        [_merge_sequences(wide)] if wide else []
+    )
+    return options[0] if len(options) == 1 else ast.Alt(options)
+
+
+def lower(node: ast.Expr, flags: str = "", utf8: bool = False) -> ast.Expr:
+    """Rewrite ``node`` so that every character-consuming node reads one byte.
+
+    ``i`` in ``flags`` is resolved here, and so is ``s`` in UTF-8 mode (the
+    dot becomes the set of all encodable characters); the result is meant to
+    be compiled with the remaining flags.
+    """
+
+    fold = "i" in flags
+    if isinstance(node, ast.Literal):
+        if not fold:
+            data = node.char.encode("utf-8") if utf8 else bytes((_byte(node.char),))
+            if len(data) == 1:
+                return _byte_node(data[0], data[0])
+            return ast.Concat([_byte_node(b, b) for b in data])
+    if isinstance(node, (ast.Literal, ast.Shorthand, ast.CharClass)):
+        ranges = _set_ranges(node, fold, utf8)
+        return _utf8_set(ranges) if utf8 else _byte_set(ranges)
+    if isinstance(node, ast.Dot):
+        if not utf8:
+            return node
+        ranges = [(0, MAX_CODE_POINT)] if "s" in flags else [(0, 9), (11, 0x10FFFF)]
+        return _utf8_set(ranges)
+    if isinstance(node, (ast.Group, ast.Repeat)):
+        return replace(node, expr=lower(node.expr, flags, utf8))
+    if isinstance(node, ast.Concat):
+        return ast.Concat([lower(p, flags, utf8) for p in node.parts])
+    if isinstance(node, ast.Alt):
+        return ast.Alt([lower(o, flags, utf8) for o in node.options])
+    return node
+
+
+# ---------------------------------------------------------------------------
+# Compiled byte patterns
+# ---------------------------------------------------------------------------
+class BytesPattern(_pattern.Pattern):
+    """A :class:`~regex_lite.pattern.Pattern` matched against byte buffers.
+
+    ``pattern`` may be ``str`` or ``bytes`` (decoded as Latin-1, or as UTF-8
+    when ``utf8`` is set).  Methods take any buffer supporting ``len`` and
+    integer indexing (``bytes``, ``bytearray``, ``memoryview``, ``mmap``)
+    and report byte offsets; :meth:`sub` and :meth:`split` return ``bytes``.
+    The other arguments are those of :class:`~regex_lite.pattern.Pattern`;
+    ``max_states`` counts the states of the byte-level program.
+    """
+
+    def __init__(
+        self,
+        pattern: str | bytes,
+        flags: str = "",
+        utf8: bool = False,
+        engine: str = "auto",
+        dfa_cache_bytes: int = DEFAULT_CACHE_BYTES,
+        max_states: int | None = None,
+        rewrites: Iterable[str] = optimize.REWRITES,
+    ) -> None:
+        if engine not in _pattern.ENGINES:
+            raise ValueError(
+                f"unknown engine {engine!r}; expected one of {_pattern.ENGINES}"
+            )
+        source = (
+            pattern.decode("utf-8" if utf8 else "latin-1")
+            if isinstance(pattern, bytes)
+            else pattern
+        )
+        self.pattern = pattern
+        self.flags = _pattern._normalize_flags(flags)
+        self.utf8 = utf8
+        self.engine = engine
+        tree = parser.parse(source)
+        self.groups = _pattern._count_groups(tree)
+        self.tree = lower(tree, self.flags, utf8)
+        # Case folding (and, for UTF-8, the dot) now lives in the tree.
+        byte_flags = self.flags.replace("i", "")
+        nfa = compile_nfa(optimize.optimize(self.tree, rewrites), max_states)
+        self.prog = Program(nfa, byte_flags)
+        self.prefilter = literals.prefilter(self.tree, byte_flags)
+        self.literal = (
+            literals.literal_searcher(self.tree, byte_flags)
+            if engine == "auto"
+            else None
+        )
+        self.dfa = LazyDFA(self.prog, dfa_cache_bytes) if engine != "nfa" else None
+        self.full_dfa = None
+
+    @functools.cached_property
+    def tree(self) -> ast.Expr:
+        """The lowered byte-level tree (rebuilt on first use after unpickling)."""
+
+        source = (
+            self.pattern.decode("utf-8" if self.utf8 else "latin-1")
+            if isinstance(self.pattern, bytes)
+            else self.pattern
+        )
+        return lower(parser.parse(source), self.flags, self.utf8)
+
+    def __repr__(self) -> str:
+        return (
+            f"BytesPattern({self.pattern!r}, flags={self.flags!r}, utf8={self.utf8!r})"
+        )
+
+    # ------------------------------------------------------------------
+    def _iter_spans(self, text: Buffer, pos: int = 0) -> Iterator[tuple[int, int]]:
+        view = _view(text)
+        spans = super()._iter_spans(view, pos)
+        if not self.utf8:
+            return spans
+        buf = view.buf
+        n = len(buf)
+        # An empty match between the bytes of one character is not a match.
+        return (
+            (s, e) for s, e in spans if s != e or s == n or not 0x80 <= buf[s] < 0xC0
+        )
+
+    def _iter_groups(
+        self, text: Buffer, pos: int = 0
+    ) -> Iterator[tuple[tuple[int, int], list]]:
+        return super()._iter_groups(_view(text), pos)
+
+    def _anchored_groups(
+        self, text: Buffer, pos: int
+    ) -> tuple[tuple[int, int], list] | None:
+        view = _view(text)
+        found = super()._anchored_groups(view, pos)
+        if found is not None and self.utf8:
+            buf = view.buf
+            if pos == found[0][1] < len(buf) and 0x80 <= buf[pos] < 0xC0:
+                return None
+        return found
+
+    def is_match(self, text: Buffer, pos: int = 0) -> bool:
+        if self.utf8:
+            # Empty matches inside a character are dropped by _iter_spans.
+            return next(self._iter_spans(text, pos), None) is not None
+        return super().is_match(_view(text), pos)
+
+    def count(self, text: Buffer) -> int:
+        return sum(1 for _ in self._iter_spans(text))
+
+    def finditer_stream(self, chunks: Iterable[Buffer]) -> Iterator[_pattern.Match]:
+        """Yield a :class:`Match` for every match of the byte ``chunks`` joined.
+
+        As :meth:`Pattern.finditer_stream
+        <regex_lite.pattern.Pattern.finditer_stream>`, with byte offsets and
+        the matched text as ``bytes``.  A UTF-8 character may be split
+        across chunks.
+        """
+
+        latin1 = (bytes(chunk).decode("latin-1") for chunk in chunks)
+        for m in _pattern.stream.finditer_stream(self, latin1):
+            m.string = m.string.encode("latin-1")
+            yield m
+
+    def scan_file(
+        self, fp: IO[bytes], chunk_size: int = _pattern.stream.DEFAULT_CHUNK_SIZE
+    ) -> Iterator[_pattern.Match]:
+        """Like :meth:`finditer_stream` over a binary file read in chunks."""
+
+        return self.finditer_stream(iter(lambda: fp.read(chunk_size), b""))
+
+    def subn(
+        self,
+        repl: bytes | Callable[[_pattern.Match], bytes],
+        text: Buffer,
+        count: int = 0,
+    ) -> tuple[bytes, int]:
+        """Replace matches with ``repl``; return ``(result, replacements)``.
+
+        ``repl`` is a bytes template or a function of the :class:`Match`, and
+        ``count`` limits the replacements, as for :meth:`Pattern.subn
+        <regex_lite.pattern.Pattern.subn>`.
+        """
+
+        if not callable(repl):
+            tpl = template.parse(bytes(repl), self.groups)
+            if count >= 0 and tpl.literal is not None:
+                return self._replace_spans(tpl.literal, text, count)
+            repl = tpl.expand
+        if count < 0:
+            return bytes(text), 0
+        buf = _view(text).buf
+        pieces: list[bytes] = []
+        last = n = 0
+        for m in self.finditer(text):
+            start, end = m.span()
+            pieces.append(bytes(buf[last:start]))
+            pieces.append(repl(m))
+            last = end
+            n += 1
+            if n == count:
+                break
+        pieces.append(bytes(buf[last:]))
+        return b"".join(pieces), n
+
+    def _replace_spans(
+        self, repl: bytes, text: Buffer, count: int
+    ) -> tuple[bytes, int]:
+        buf = _view(text).buf
+        pieces: list[bytes] = []
+        last = n = 0
+        for start, end in self._iter_spans(text):
+            pieces.append(bytes(buf[last:start]))
+            pieces.append(repl)
+            last = end
+            n += 1
+            if n == count:
+                break
+        pieces.append(bytes(buf[last:]))
+        return b"".join(pieces), n
+
+    def splititer(self, text: Buffer, maxsplit: int = 0) -> Iterator[bytes | None]:
+        """Yield the byte strings :meth:`split` returns, as the matches are found."""
+
+        buf = _view(text).buf
+        last = 0
+        for start, end, groups in self._split_points(text, maxsplit):
+            yield bytes(buf[last:start])
+            for g in groups:
+                yield bytes(g) if g is not None else None
+            last = end
+        yield bytes(buf[last:])
+
+    def split(self, text: Buffer, maxsplit: int = 0) -> list[bytes | None]:
+        """Split ``text`` by matches, as :meth:`Pattern.split` but as ``bytes``."""
+
+        return list(self.splititer(text, maxsplit))
@@ -0,0 +1,313 @@
+"""Precompiled character sets for class, shorthand and case-folded edges.
+
+A :class:`CharSet` is built once per edge when a pattern is compiled and
+answers membership without re-reading the class items:
+
+* code points below 256 are looked up in a 256-entry table that already
+  accounts for negation, shorthand predicates and case folding;
+* other code points are searched with :func:`bisect.bisect_right` in a
+  sorted table of merged ranges, then checked against the Unicode shorthand
+  predicates (``\\d``, ``\\w``, ``\\s`` and their negations) of the class.
+
+Case folding is applied when the set is built: every case-equivalence group
+(characters with the same :meth:`str.casefold`) that intersects the ranges is
+added to them, so ``[a-c]`` under the ``i`` flag is stored as
+``[A-Ca-c]``.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Callable, Iterable
+
+from . import ast
+
+MAX_CODE_POINT = 0x10FFFF
+_TABLE_SIZE = 256
+# Highest code point (exclusive) with a case-equivalent other than itself.
+_CASED_LIMIT = 0x1E944
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class _Not:
+    """Negation of the shorthand predicate ``PREDICATES[key]``.
+
+    A class rather than a closure so that compiled patterns stay picklable.
+    """
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+
+    def __call__(self, ch: str) -> bool:
+        return not PREDICATES[self.key](ch)
+
+    def __reduce__(self):
+        return _Not, (self.key,)
+
+
+#: Unicode predicates behind the shorthand classes (``\d``, ``\D``, ...).
+PREDICATES: dict[str, Callable[[str], bool]] = {
+    "d": str.isdigit,
+    "w": _is_word,
+    "s": str.isspace,
+}
+PREDICATES.update({k.upper(): _Not(k) for k in list(PREDICATES)})
+
+
+@lru_cache(maxsize=None)
+def _fold_groups() -> tuple[tuple[int, ...], ...]:
+    """Return the groups of two or more code points that fold together."""
+
+    groups: dict[str, list[int]] = {}
+    for c in range(_CASED_LIMIT):
+        ch = chr(c)
+        key = ch.casefold()
+        if len(key) != 1:
+            key = ch
+        groups.setdefault(key, []).append(c)
+    return tuple(tuple(g) for g in groups.values() if len(g) > 1)
+
+
+def _merge(ranges: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Sort ``ranges`` and merge the overlapping and adjacent ones."""
+
+    merged: list[tuple[int, int]] = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            if hi > merged[-1][1]:
+                merged[-1] = (merged[-1][0], hi)
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def complement(
+    ranges: Iterable[tuple[int, int]], top: int = MAX_CODE_POINT
+) -> list[tuple[int, int]]:
+    """Return the ranges of ``[0, top]`` not covered by sorted ``ranges``."""
+
+    out: list[tuple[int, int]] = []
+    nxt = 0
+    for lo, hi in ranges:
+        if lo > nxt:
+            out.append((nxt, lo - 1))
+        nxt = max(nxt, hi + 1)
+    if nxt <= top:
+        out.append((nxt, top))
+    return out
+
+
+@lru_cache(maxsize=None)
+def unicode_ranges(kind: str, top: int = MAX_CODE_POINT) -> tuple[tuple[int, int], ...]:
+    """Return the ranges of ``[0, top]`` in the shorthand ``kind`` (``\\w``, ...).
+
+    The predicate is evaluated over ``[0, top]`` once per process; the whole
+    code space takes a noticeable fraction of a second.
+    """
+
+    if kind.isupper():
+        return tuple(complement(unicode_ranges(kind.lower(), top), top))
+    flags = bytes(map(PREDICATES[kind], map(chr, range(top + 1))))
+    ranges = []
+    lo = flags.find(1)
+    while lo >= 0:
+        hi = flags.find(0, lo)
+        if hi < 0:
+            hi = len(flags)
+        ranges.append((lo, hi - 1))
+        lo = flags.find(1, hi)
+    return tuple(ranges)
+
+
+class CharSet:
+    """Membership test for one character class, shorthand or folded literal.
+
+    ``ranges`` are inclusive ``(first, last)`` code point pairs and
+    ``classes`` a string of shorthand kinds (``"dW"`` for ``[\\d\\W]``).
+    Instances are immutable; :meth:`folded` returns the case-insensitive
+    variant, built once and cached.
+    """
+
+    __slots__ = (
+        "negated",
+        "fold",
+        "ranges",
+        "classes",
+        "_starts",
+        "_ends",
+        "_preds",
+        "_table",
+        "_folded",
+    )
+
+    def __init__(
+        self,
+        ranges: Iterable[tuple[int, int]] = (),
+        classes: str = "",
+        negated: bool = False,
+        fold: bool = False,
+    ) -> None:
+        merged = _merge(ranges)
+        if fold:
+            merged = self._fold_ranges(merged)
+        self.negated = negated
+        self.fold = fold
+        self.ranges: tuple[tuple[int, int], ...] = tuple(merged)
+        self.classes = "".join(sorted(set(classes)))
+        self._starts = [lo for lo, _ in merged]
+        self._ends = [hi for _, hi in merged]
+        self._preds = tuple(PREDICATES[k] for k in self.classes)
+        table = [False] * _TABLE_SIZE
+        for lo, hi in merged:
+            if lo >= _TABLE_SIZE:
+                break
+            hi = min(hi, _TABLE_SIZE - 1)
+            table[lo : hi + 1] = [True] * (hi - lo + 1)
+        if self._preds:
+            for c in range(_TABLE_SIZE):
+                table[c] = table[c] or any(pred(chr(c)) for pred in self._preds)
+        self._table = tuple(t != negated for t in table)
+        self._folded: CharSet | None = self if fold else None
+
+    @classmethod
+    def from_items(cls, items: Iterable, negated: bool = False) -> "CharSet":
+        """Build the set of a ``[...]`` class from its AST items."""
+
+        ranges: list[tuple[int, int]] = []
+        classes = ""
+        for it in items:
+            if isinstance(it, ast.Range):
+                ranges.append((ord(it.start), ord(it.end)))
+            elif isinstance(it, ast.Literal):
+                ranges.append((ord(it.char), ord(it.char)))
+            elif isinstance(it, ast.Shorthand):
+                if it.kind not in PREDICATES:
+                    raise ValueError(f"unknown shorthand class \\{it.kind}")
+                classes += it.kind
+            else:
+                raise TypeError(
+                    f"Unexpected character class item type {type(it).__name__}: {it!r}"
+                )
+        return cls(ranges, classes, negated)
+
+    @staticmethod
+    def _fold_ranges(merged: list[tuple[int, int]]) -> list[tuple[int, int]]:
+        starts = [lo for lo, _ in merged]
+        extra: list[tuple[int, int]] = []
+        for group in _fold_groups():
+            for c in group:
+                i = bisect_right(starts, c) - 1
+                if i >= 0 and c <= merged[i][1]:
+                    extra.extend((m, m) for m in group)
+                    break
+        return _merge(merged + extra) if extra else merged
+
+    def folded(self) -> "CharSet":
+        """Return the case-insensitive variant of this set."""
+
+        if self._folded is None:
+            self._folded = CharSet(self.ranges, self.classes, self.negated, True)
+        return self._folded
+
+    # ------------------------------------------------------------------
+    def _hit(self, ch: str) -> bool:
+        # Membership before negation, for any code point.
+        c = ord(ch)
+        i = bisect_right(self._starts, c) - 1
+        if i >= 0 and c <= self._ends[i]:
+            return True
+        return any(pred(ch) for pred in self._preds)
+
+    def matches(self, ch: str) -> bool:
+        """Return whether ``ch`` is in the set."""
+
+        c = ord(ch)
+        if c < _TABLE_SIZE:
+            return self._table[c]
+        return self._hit(ch) != self.negated
+
+    __contains__ = matches
+
+    def single(self) -> int | None:
+        """Return the only code point in the set, if it holds exactly one."""
+
+        if self.negated or self.classes or len(self.ranges) != 1:
+            return None
+        lo, hi = self.ranges[0]
+        return lo if lo == hi else None
+
+    def code_ranges(self, top: int = MAX_CODE_POINT) -> list[tuple[int, int]]:
+        """Return the merged code point ranges of the set within ``[0, top]``.
+
+        Shorthand classes are expanded with :func:`unicode_ranges`.
+        """
+
+        ranges = _merge(
+            [
+                *((lo, min(hi, top)) for lo, hi in self.ranges if lo <= top),
+                *(r for k in self.classes for r in unicode_ranges(k, top)),
+            ]
+        )
+        return complement(ranges, top) if self.negated else ranges
+
+    def describe(self) -> dict:
+        """Return a JSON-friendly description (used by the compile export)."""
+
+        return {
+            "negated": self.negated,
+            "chars": [chr(lo) for lo, hi in self.ranges if lo == hi],
+            "ranges": [[chr(lo), chr(hi)] for lo, hi in self.ranges if lo != hi],
+            "classes": list(self.classes),
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CharSet):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def _key(self) -> tuple:
+        return (self.ranges, self.classes, self.negated, self.fold)
+
+    def __repr__(self) -> str:
+        return (
+            f"CharSet({list(self.ranges)!r}, classes={self.classes!r}, "
+            f"negated={self.negated!r}, fold={self.fold!r})"
+        )
+
+
+@lru_cache(maxsize=None)
+def shorthand(kind: str) -> CharSet:
+    """Return the shared set for a top-level shorthand such as ``\\d``."""
+
+    if kind not in PREDICATES:
+        raise ValueError(f"unknown shorthand class \\{kind}")
+    return CharSet(classes=kind)
+
+
+@lru_cache(maxsize=1024)
+def folded_literal(ch: str) -> CharSet:
+    """Return the case-insensitive set of the literal ``ch``."""
+
+    return CharSet([(ord(ch), ord(ch))], fold=True)
+
+
+@lru_cache(maxsize=None)
+def fold_table() -> dict[int, int]:
+    """Return a :meth:`str.translate` table folding every cased character.
+
+    Each member of a fold group maps to the group's first code point, so two
+    strings are equal under the ``i`` flag exactly when their translations
+    are equal.  Translation is one character for one character, which keeps
+    offsets into the original text valid.
+    """
+
+    return {c: g[0] for g in _fold_groups() for c in g[1:]}
@@ -1,10 +1,24 @@
 # regex_lite/compiler.py
 from __future__ import annotations
 
+import threading
+from array import array
 from dataclasses import dataclass, field
-from typing import Any, Iterable, List, Optional, Set, Tuple
+from typing import Any, Callable, Iterable, List, Optional, Tuple
 
+from . import alphabet as _alphabet
 from . import ast  # Adapt to your current ast.py (relative import within the package)
+from .charset import MAX_CODE_POINT, CharSet, folded_literal, shorthand
+from .parser import RegexSyntaxError
+
+#: Default ceiling on the NFA states of one pattern (see :func:`state_count`);
+#: larger patterns raise :class:`RegexSyntaxError` instead of compiling.
+MAX_STATES = 100_000
+
+#: Largest number of states the copies of one counted repeat may take before
+#: they are built lazily, as matching first reaches them (see
+#: :meth:`Program.expand`), instead of up front.
+EAGER_REPEAT_STATES = 256
 
 # ---------- NFA structure ----------
 
@@ -28,14 +42,44 @@ class State:
     # Group enter/exit hooks (can be used in matcher if capture is needed)
     enter_groups: List[int] = field(default_factory=list)
     exit_groups: List[int] = field(default_factory=list)
+    # (repeat, copy, exit) on the accept state of copy ``copy`` of a lazily
+    # expanded repeat: its epsilon exits are added by Program.expand.
+    repeat: Optional[Tuple[int, int, int]] = None
 
 
 class NFA:
     """NFA (Non-deterministic Finite Automaton) compiled from regex AST."""
 
-    def __init__(self, tree: ast.Node):
+    def __init__(
+        self, tree: Optional[ast.Node] = None, max_states: Optional[int] = None
+    ):
         self.states: List[State] = []
-        self.start, _ = self._build(tree)
+        self.start = 0
+        # Lazily expanded repeats: (lo, hi, entry, accept, min, max, lazy),
+        # the body being states[lo:hi] with its entry and accept state.
+        self.repeats: List[Tuple[int, int, int, int, int, Optional[int], bool]] = []
+        if tree is not None:
+            check_budget(tree, max_states)
+            self.start, _ = self._build(tree)
+
+    @classmethod
+    def union(
+        cls, trees: Iterable[ast.Node], max_states: Optional[int] = None
+    ) -> Tuple["NFA", List[int]]:
+        """Compile ``trees`` side by side under one start state.
+
+        Returns the NFA and, for each tree, its accept state, so callers can
+        tell which alternative matched.  ``max_states`` applies to each tree.
+        """
+        nfa = cls()
+        nfa.start = nfa._new_state()
+        accepts: List[int] = []
+        for tree in trees:
+            check_budget(tree, max_states)
+            s, a = nfa._build(tree)
+            nfa._add_eps(nfa.start, s)
+            accepts.append(a)
+        return nfa, accepts
 
     # === Low-level state operations ===
 
@@ -60,6 +104,17 @@ class NFA:
         self._add_edge(s, "char", ch, a)
         return s, a
 
+    def _frag_string(self, text: str) -> Tuple[int, int]:
+        # One chain of character edges, without epsilon links between them.
+        s = self._new_state()
+        a = s
+        for ch in text:
+            nxt = self._new_state()
+            self._add_edge(a, "char", ch, nxt)
+            a = nxt
+        self._mark_accept(a, True)
+        return s, a
+
     def _frag_dot(self) -> Tuple[int, int]:
         s = self._new_state()
         a = self._new_state(True)
@@ -67,27 +122,17 @@ class NFA:
         return s, a
 
     def _frag_shorthand(self, kind: str) -> Tuple[int, int]:
-        # kind in {'d','w','s'} — interpreted in matcher
+        # kind in {'d','D','w','W','s','S'} — resolved by Program
         s = self._new_state()
         a = self._new_state(True)
         self._add_edge(s, "pred", kind, a)
         return s, a
 
     def _frag_charclass(self, negated: bool, items: Iterable) -> Tuple[int, int]:
-        lits: Set[str] = set()
-        ranges: List[Tuple[str, str]] = []
-        for it in items:
-            if isinstance(it, ast.Range):
-                ranges.append((str(it.start), str(it.end)))
-            elif isinstance(it, ast.Literal):
-                lits.add(str(it.char))
-            else:
-                raise TypeError(
-                    f"Unexpected character class item type {type(it).__name__}: {it!r}"
-                )
+        charset = CharSet.from_items(items, negated)
         s = self._new_state()
         a = self._new_state(True)
-        self._add_edge(s, "class", (negated, frozenset(lits), tuple(ranges)), a)
+        self._add_edge(s, "class", charset, a)
         return s, a
 
     def _frag_concat(self, frags: List[Tuple[int, int]]) -> Tuple[int, int]:
@@ -120,128 +165,126 @@ class NFA:
         self._add_eps(ra, a)
         return s, a
 
-    def _clone_fragment(self, base: Tuple[int, int]) -> Tuple[int, int]:
-        """
-        Creates a fresh copy of a fragment by cloning all states reachable from base.
-        Returns a new (start, accept) pair with completely new state indices.
-        """
-        start_old, accept_old = base
-
-        # Map old state indices to new state indices
-        state_map = {}
+    def _copy_fragment(
+        self, base: Tuple[int, int], span: Tuple[int, int]
+    ) -> Tuple[int, int]:
+        """Append a copy of the fragment ``base`` built in ``states[lo:hi]``.
 
-        # Collect all reachable states from the fragment via DFS
-        reachable = set()
-        stack = [start_old]
-        while stack:
-            state_idx = stack.pop()
-            if state_idx in reachable:
-                continue
-            reachable.add(state_idx)
-
-            state = self.states[state_idx]
-            # Add epsilon transitions
-            for eps_target in state.eps:
-                if eps_target not in reachable:
-                    stack.append(eps_target)
-            # Add edge transitions
-            for edge in state.edges:
-                if edge.to not in reachable:
-                    stack.append(edge.to)
-
-        # Create new states for all reachable states
-        for old_idx in reachable:
-            old_state = self.states[old_idx]
-            new_idx = self._new_state(old_state.accept)
-            state_map[old_idx] = new_idx
-
-            # Copy other state properties
-            new_state = self.states[new_idx]
-            new_state.require_bol = old_state.require_bol
-            new_state.require_eol = old_state.require_eol
-            new_state.enter_groups = old_state.enter_groups.copy()
-            new_state.exit_groups = old_state.exit_groups.copy()
-
-        # Clone all edges and epsilon transitions
-        for old_idx in reachable:
-            old_state = self.states[old_idx]
-            new_idx = state_map[old_idx]
-            new_state = self.states[new_idx]
-
-            # Clone epsilon transitions
-            for eps_target in old_state.eps:
-                if eps_target in state_map:
-                    new_state.eps.append(state_map[eps_target])
-
-            # Clone edges
-            for edge in old_state.edges:
-                if edge.to in state_map:
-                    new_state.edges.append(
-                        Edge(edge.kind, edge.data, state_map[edge.to])
-                    )
-
-        return state_map[start_old], state_map[accept_old]
+        A fragment's states are allocated contiguously and its edges stay
+        inside that range, so a copy is the same range shifted by a fixed
+        offset; no traversal or index map is needed.
+        """
+        lo, hi = span
+        off = len(self.states) - lo
+        for st in self.states[lo:hi]:
+            self.states.append(
+                State(
+                    edges=[Edge(e.kind, e.data, e.to + off) for e in st.edges],
+                    eps=[v + off for v in st.eps],
+                    accept=st.accept,
+                    require_bol=st.require_bol,
+                    require_eol=st.require_eol,
+                    enter_groups=st.enter_groups.copy(),
+                    exit_groups=st.exit_groups.copy(),
+                    repeat=(
+                        st.repeat
+                        if st.repeat is None
+                        else (st.repeat[0], st.repeat[1], st.repeat[2] + off)
+                    ),
+                )
+            )
+        return base[0] + off, base[1] + off
 
     def _repeat_range(
-        self, base: Tuple[int, int], min_: int, max_: Optional[int]
+        self,
+        base: Tuple[int, int],
+        span: Tuple[int, int],
+        min_: int,
+        max_: Optional[int],
+        lazy: bool = False,
     ) -> Tuple[int, int]:
         """
-        Thompson expansion: repeat at least `min_` times + optionally (max_-min_) times;
-        max_=None means no upper limit.
+        Thompson expansion of ``base{min_,max_}`` (``max_=None``: unbounded);
+        ``span`` is the range of states holding ``base``, which serves as the
+        first copy.
+
+        The ``min_`` required copies are chained.  Each optional copy is
+        entered by a choice between taking it and leaving the repeat; the
+        exits all go straight to the final state (``x(x(x)?)?`` rather than
+        ``x?x?x?``), so epsilon closures stay constant-size however large
+        ``max_`` is.  Epsilon edges are ordered by priority: greedy repeats
+        prefer another iteration, lazy ones prefer to stop (see
+        `_add_choice`).
+
+        When the copies would take more than :data:`EAGER_REPEAT_STATES`
+        states, only the first one is built; see `_repeat_lazily`.
         """
         if max_ is not None and max_ < min_:
             raise ValueError(f"Invalid repeat range: {{{min_},{max_}}} (max < min)")
-        # Start with an empty entry state
-        s_all = self._new_state()
-        cur_a = s_all  # initially empty
-        # Required min_ repetitions: concatenate sequentially
-        for _ in range(min_):
-            s, a = self._clone_fragment(base)
+        copies = min_ + (1 if max_ is None else max_ - min_)
+        if copies > 1 and (copies - 1) * (span[1] - span[0]) > EAGER_REPEAT_STATES:
+            return self._repeat_lazily(base, span, min_, max_, lazy)
+        frags = [base] + [self._copy_fragment(base, span) for _ in range(copies - 1)]
+        for _, a in frags[:copies]:
             self._mark_accept(a, False)
-            self._add_eps(cur_a, s)
-            cur_a = a
-
-        if min_ == 0:
-            # Allow empty: jump from start directly to current a
-            cur_a = s_all
-
-        # Finite upper bound: add (max_-min_) optional repetitions
-        if max_ is not None:
-            reps = max(0, max_ - min_)
-            for _ in range(reps):
-                s, a = self._clone_fragment(base)
-                self._mark_accept(a, False)
-
-                # Create new accept for this optional iteration
-                new_a = self._new_state()
 
-                # Option: skip to new_a
-                self._add_eps(cur_a, new_a)
-                # Or: take base once
-                self._add_eps(cur_a, s)
-                self._add_eps(a, new_a)
-
-                cur_a = new_a
-
-            # End
-            self._mark_accept(cur_a, True)
-            return s_all, cur_a
+        s_all = self._new_state()
+        out = self._new_state(True)
+        cur = s_all
+        for s, a in frags[:min_]:
+            self._add_eps(cur, s)
+            cur = a
+
+        if max_ is None:
+            # Loop on one more copy: take it again or exit.
+            s, a = frags[min_]
+            loop_state = self._new_state()
+            self._add_eps(cur, loop_state)
+            self._add_choice(loop_state, s, out, lazy)
+            self._add_eps(a, loop_state)
+            return s_all, out
+
+        for s, a in frags[min_:copies]:
+            self._add_choice(cur, s, out, lazy)
+            cur = a
+        self._add_eps(cur, out)
+        return s_all, out
+
+    def _repeat_lazily(
+        self,
+        base: Tuple[int, int],
+        span: Tuple[int, int],
+        min_: int,
+        max_: Optional[int],
+        lazy: bool,
+    ) -> Tuple[int, int]:
+        """Build the first copy of ``base{min_,max_}`` and record the repeat.
 
-        # No upper bound: add loop at the tail
-        s, a = self._clone_fragment(base)
+        The accept state of the copy is left without exits and marked with
+        ``(repeat, 1, out)``; :meth:`Program.expand` links it as
+        `_repeat_range` would, appending the next copy from ``span`` (kept
+        unmodified as the template) when one is needed.
+        """
+        s, a = base
         self._mark_accept(a, False)
-
-        loop_state = self._new_state()
-
-        # From current position to loop entry
-        self._add_eps(cur_a, loop_state)
-
-        # From loop: either exit (will mark true later) or take base once more
-        self._add_eps(loop_state, s)
-        self._add_eps(a, loop_state)
-
-        self._mark_accept(loop_state, True)
-        return s_all, loop_state
+        s_all = self._new_state()
+        out = self._new_state(True)
+        if min_ == 0:
+            self._add_choice(s_all, s, out, lazy)
+        else:
+            self._add_eps(s_all, s)
+        self.states[a].repeat = (len(self.repeats), 1, out)
+        self.repeats.append((span[0], span[1], s, a, min_, max_, lazy))
+        return s_all, out
+
+    def _add_choice(self, u: int, take: int, skip: int, lazy: bool) -> None:
+        """Add the two epsilon exits of a quantifier in priority order."""
+        if lazy:
+            self._add_eps(u, skip)
+            self._add_eps(u, take)
+        else:
+            self._add_eps(u, take)
+            self._add_eps(u, skip)
 
     # === AST traversal ===
 
@@ -250,6 +293,9 @@ class NFA:
         if isinstance(node, ast.Literal):
             return self._frag_literal(node.char)
 
+        if isinstance(node, ast.String):
+            return self._frag_string(node.text)
+
         # Dot
         if isinstance(node, ast.Dot):
             return self._frag_dot()
@@ -277,34 +323,12 @@ class NFA:
 
         # Quantifiers: node.kind is '*', '+', '?', or like '{m}', '{m,}', '{m,n}'
         if isinstance(node, ast.Repeat):
+            lo = len(self.states)
             inner = self._build(node.expr)
+            span = (lo, len(self.states))
 
-            k = node.kind
-            if k == "*":
-                return self._repeat_range(inner, 0, None)
-            if k == "+":
-                return self._repeat_range(inner, 1, None)
-            if k == "?":
-                return self._repeat_range(inner, 0, 1)
-
-            # Template with m/n fields
-            if k in ("{m}", "{m,}", "{m,n}"):
-                m = node.m if node.m is not None else 0
-                n = node.n  # None means no upper bound
-                return self._repeat_range(inner, m, n)
-
-            # Fallback: parse literal "{2,3}" kind string
-            if k.startswith("{") and k.endswith("}"):
-                body = k[1:-1]
-                if "," not in body:
-                    m = int(body)
-                    return self._repeat_range(inner, m, m)
-                left, right = body.split(",", 1)
-                m = int(left) if left.strip() else 0
-                n = None if right.strip() == "" else int(right)
-                return self._repeat_range(inner, m, n)
-
-            raise ValueError(f"unknown repeat kind: {k}")
+            m, n = repeat_bounds(node)
+            return self._repeat_range(inner, span, m, n, node.lazy)
 
         # Group
         if isinstance(node, ast.Group):
@@ -338,5 +362,528 @@ class NFA:
         raise NotImplementedError(f"compile: unsupported node {type(node).__name__}")
 
 
-def compile(tree: ast.Node) -> NFA:
-    return NFA(tree)
+def repeat_bounds(node: ast.Repeat) -> Tuple[int, Optional[int]]:
+    """Return ``(min, max)`` of a quantifier; ``max`` is ``None`` if unbounded."""
+
+    k = node.kind
+    if k == "*":
+        return 0, None
+    if k == "+":
+        return 1, None
+    if k == "?":
+        return 0, 1
+    # Template with m/n fields
+    if k in ("{m}", "{m,}", "{m,n}"):
+        return (node.m if node.m is not None else 0), node.n
+    # Fallback: parse literal "{2,3}" kind string
+    if k.startswith("{") and k.endswith("}"):
+        body = k[1:-1]
+        if "," not in body:
+            return int(body), int(body)
+        left, right = body.split(",", 1)
+        m = int(left) if left.strip() else 0
+        return m, (None if right.strip() == "" else int(right))
+    raise ValueError(f"unknown repeat kind: {k}")
+
+
+def state_count(node: ast.Node) -> int:
+    """Return the number of NFA states :class:`NFA` allocates for ``node``.
+
+    Lazily expanded repeats count with all their copies, as once fully
+    expanded by :meth:`Program.expand`.  Computed from the tree alone, so
+    oversized patterns are rejected before any state is built.
+    """
+
+    if isinstance(node, ast.Group):
+        return state_count(node.expr)
+    if isinstance(node, ast.String):
+        return len(node.text) + 1
+    if isinstance(node, ast.Concat):
+        return sum(state_count(p) for p in node.parts) if node.parts else 2
+    if isinstance(node, ast.Alt):
+        return sum(state_count(o) for o in node.options) + 2 * (len(node.options) - 1)
+    if isinstance(node, ast.Repeat):
+        m, n = repeat_bounds(node)
+        copies = m + (1 if n is None else n - m)
+        return state_count(node.expr) * max(copies, 1) + (3 if n is None else 2)
+    return 2
+
+
+def check_budget(tree: ast.Node, max_states: Optional[int] = None) -> None:
+    """Raise :class:`RegexSyntaxError` if ``tree`` needs more than ``max_states``
+    NFA states (default :data:`MAX_STATES`)."""
+
+    limit = MAX_STATES if max_states is None else max_states
+    needed = state_count(tree)
+    if needed > limit:
+        raise RegexSyntaxError(
+            f"pattern too large: needs {needed} NFA states, limit is {limit}"
+        )
+
+
+def compile(tree: ast.Node, max_states: Optional[int] = None) -> NFA:
+    return NFA(tree, max_states)
+
+
+# ---------- Flat program ----------
+
+# Consuming-edge opcodes (one consuming edge per state at most)
+OP_NONE = 0  # epsilon-only or accepting state
+OP_CHAR = 1  # ord(ch) == arg
+OP_ANY = 2  # any character ('.' under the 's' flag)
+OP_NOTNL = 3  # any character except '\n'
+OP_TEST = 4  # tests[arg](ch) is true
+
+# Per-state flag bits
+F_ACCEPT = 1
+F_BOL = 2  # state requires beginning of line/string
+F_EOL = 4  # state requires end of line/string
+F_ANCHORS = F_BOL | F_EOL
+F_LAZY = 8  # exits not built yet: call Program.expand before following eps
+
+# Serializes Program.expand between threads sharing a compiled pattern.
+_EXPAND_LOCK = threading.RLock()
+
+#: Closure entries a :class:`Program` precomputes when it is built; closures
+#: of the remaining states are computed on first use.
+CLOSURE_BUDGET = 1_000_000
+
+#: ``(states, masks)``: see :meth:`Program.closure`.
+Closure = Tuple[Tuple[int, ...], Optional[Tuple[int, ...]]]
+
+
+_TABLES = (
+    "op",
+    "arg",
+    "out",
+    "state_flags",
+    "eps_lo",
+    "eps_hi",
+    "eps",
+    "save_lo",
+    "save_hi",
+    "saves",
+)
+
+
+def _init_tables(prog: Program | _Body) -> None:
+    for name in _TABLES:
+        setattr(prog, name, array("b" if name == "state_flags" else "i"))
+
+
+def _add_row(
+    prog: Program | _Body,
+    st: State,
+    index: dict[int, int],
+    encode: Callable[[Edge], Tuple[int, int]],
+) -> None:
+    # Append the row of ``st``, numbering its targets through ``index``.
+    if len(st.edges) > 1:
+        raise ValueError("Program supports one consuming edge per state")
+    if st.edges:
+        e = st.edges[0]
+        op, arg = encode(e)
+        prog.op.append(op)
+        prog.arg.append(arg)
+        prog.out.append(index[e.to])
+    else:
+        prog.op.append(OP_NONE)
+        prog.arg.append(0)
+        prog.out.append(-1)
+    prog.state_flags.append(
+        (F_ACCEPT if st.accept else 0)
+        | (F_BOL if st.require_bol else 0)
+        | (F_EOL if st.require_eol else 0)
+        | (F_LAZY if st.repeat is not None else 0)
+    )
+    prog.eps_lo.append(len(prog.eps))
+    prog.eps.extend(index[v] for v in st.eps)
+    prog.eps_hi.append(len(prog.eps))
+    prog.save_lo.append(len(prog.saves))
+    prog.saves.extend(2 * g - 2 for g in st.enter_groups)
+    prog.saves.extend(2 * g - 1 for g in st.exit_groups)
+    prog.save_hi.append(len(prog.saves))
+
+
+class _Body:
+    """The body of a lazily expanded repeat, as :class:`Program` rows.
+
+    Rows are numbered from 0 in NFA order (``states[lo:hi]``), so a copy is
+    appended to a program by shifting every target by its first row.
+    ``entry``/``accept`` are the body's first and last state, ``stubs`` the
+    ``(repeat, copy, exit)`` marks of repeats nested in it.
+    """
+
+    __slots__ = _TABLES + ("entry", "accept", "min", "max", "lazy", "stubs")
+
+    def __init__(
+        self,
+        nfa: NFA,
+        lo: int,
+        hi: int,
+        entry: int,
+        accept: int,
+        min_: int,
+        max_: Optional[int],
+        lazy: bool,
+        encode: Callable[[Edge], Tuple[int, int]],
+    ) -> None:
+        _init_tables(self)
+        local = {u: u - lo for u in range(lo, hi)}
+        self.stubs: List[Tuple[int, int, int, int]] = []
+        for u in range(lo, hi):
+            st = nfa.states[u]
+            _add_row(self, st, local, encode)
+            if st.repeat is not None and u != accept:
+                r, k, exit_ = st.repeat
+                self.stubs.append((u - lo, r, k, exit_ - lo))
+        self.entry = entry - lo
+        self.accept = accept - lo
+        self.min = min_
+        self.max = max_
+        self.lazy = lazy
+
+
+class Program:
+    """Flat, flag-specialized form of an :class:`NFA` used by the matchers.
+
+    States are renumbered in depth-first order from the start state (states
+    left unreachable by fragment cloning are dropped) and stored in parallel
+    ``array('i')`` tables instead of ``State``/``Edge`` objects:
+
+    * ``op[s]``/``arg[s]``/``out[s]``: the state's consuming edge as an integer
+      opcode (``OP_*``), its operand and its target;
+    * ``state_flags[s]``: ``F_ACCEPT``/``F_BOL``/``F_EOL`` bits;
+    * ``eps[eps_lo[s]:eps_hi[s]]``: epsilon targets in priority order;
+    * ``saves[save_lo[s]:save_hi[s]]``: capture slots written on entering
+      ``s`` (``2*g-2`` for the start of group ``g``, ``2*g-1`` for its end);
+    * ``origin[s]``: the index of ``s`` in ``nfa.states`` (``None`` once
+      unpickled);
+    * ``closures[s]``: the epsilon closure of ``s`` (:meth:`closure`), or
+      ``None`` until it is first needed;
+    * ``alphabet``: the character classes of the edges, as a lazy
+      :class:`~regex_lite.alphabet.Alphabet`;
+    * ``repeats``/``stubs``: the bodies of lazily expanded counted repeats
+      and their unexpanded copies (see :meth:`expand`).
+
+    The ``i`` and ``s`` flags are resolved here, so matchers only need to
+    check ``multiline`` for anchors.  Edges that are not a plain character
+    or dot call ``tests[arg]`` (``charsets[arg].matches``); ``labels[arg]``
+    describes them for export.
+    """
+
+    __slots__ = (
+        "start",
+        "flags",
+        "multiline",
+        "op",
+        "arg",
+        "out",
+        "state_flags",
+        "eps_lo",
+        "eps_hi",
+        "eps",
+        "save_lo",
+        "save_hi",
+        "saves",
+        "tests",
+        "charsets",
+        "labels",
+        "origin",
+        "closures",
+        "alphabet",
+        "repeats",
+        "stubs",
+    )
+
+    def __init__(self, nfa: NFA, flags: str = "") -> None:
+        fold = "i" in flags
+        dotall = "s" in flags
+        self.flags = flags
+        self.multiline = "m" in flags
+
+        # Number reachable states depth-first from the start state.
+        index: dict[int, int] = {}
+        order: List[int] = []
+        stack = [nfa.start]
+        while stack:
+            u = stack.pop()
+            if u in index:
+                continue
+            index[u] = len(order)
+            order.append(u)
+            st = nfa.states[u]
+            stack.extend(e.to for e in reversed(st.edges))
+            stack.extend(reversed(st.eps))
+            if st.repeat is not None:
+                stack.append(st.repeat[2])
+        self.start = 0
+        self.origin = array("i", order)
+
+        self.tests: List[Callable[[str], bool]] = []
+        self.charsets: List[CharSet] = []
+        self.labels: List[dict] = []
+
+        # Copies of a repeated fragment carry the same edge data; encode it
+        # once so they share one test (and one alphabet entry).
+        encoded: dict[tuple[str, int], Tuple[int, int]] = {}
+
+        def encode(e: Edge) -> Tuple[int, int]:
+            key = (e.kind, id(e.data))
+            code = encoded.get(key)
+            if code is None:
+                code = encoded[key] = self._encode_edge(e, fold, dotall)
+            return code
+
+        _init_tables(self)
+        self.stubs: dict[int, Tuple[int, int, int]] = {}
+        for u in order:
+            st = nfa.states[u]
+            _add_row(self, st, index, encode)
+            if st.repeat is not None:
+                r, k, exit_ = st.repeat
+                self.stubs[index[u]] = (r, k, index[exit_])
+        self.repeats = [_Body(nfa, *r, encode) for r in nfa.repeats]
+
+        # Precompute closures up to a total size; nested nullable repeats
+        # can make the full table quadratic in the number of states.
+        self.closures: List[Optional[Closure]] = [None] * len(order)
+        budget = CLOSURE_BUDGET
+        for s in range(len(order)):
+            if budget <= 0:
+                break
+            c = self.closures[s] = self._compute_closure(s)
+            budget -= len(c[0])
+        self.alphabet = _alphabet.Alphabet(self, exact=False)
+
+    def _add_test(self, charset: CharSet, label: dict) -> int:
+        self.charsets.append(charset)
+        self.tests.append(charset.matches)
+        self.labels.append(label)
+        return len(self.tests) - 1
+
+    def _encode_edge(self, e: Edge, fold: bool, dotall: bool) -> Tuple[int, int]:
+        if e.kind == "char":
+            charset = folded_literal(e.data) if fold else None
+            if charset is None or charset.single() is not None:
+                # Uncased characters fold to themselves.
+                return OP_CHAR, ord(e.data)
+            label = {"kind": "char", "char": e.data}
+            return OP_TEST, self._add_test(charset, label)
+        if e.kind == "dot":
+            return (OP_ANY if dotall else OP_NOTNL), 0
+        if e.kind == "pred":
+            label = {"kind": "pred", "class": e.data}
+            return OP_TEST, self._add_test(shorthand(e.data), label)
+        if e.kind == "class":
+            charset = e.data.folded() if fold else e.data
+            label = {"kind": "class", **e.data.describe()}
+            return OP_TEST, self._add_test(charset, label)
+        raise ValueError(f"unknown edge kind: {e.kind}")
+
+    # ------------------------------------------------------------------
+    def __getstate__(self) -> tuple:
+        # ``origin`` only relates the tables to the NFA they were built from,
+        # which is gone by the time a pattern is pickled.
+        slots = {name: getattr(self, name) for name in self.__slots__}
+        slots["origin"] = None
+        return None, slots
+
+    def __len__(self) -> int:
+        return len(self.op)
+
+    def expand(self, s: int) -> None:
+        """Add the epsilon exits of ``s``, a state flagged ``F_LAZY``.
+
+        ``s`` ends copy ``k`` of a lazily expanded counted repeat (see
+        ``stubs``).  Like the exits built by ``NFA._repeat_range``, they
+        lead to copy ``k + 1`` (required or optional) or out of the repeat;
+        copy ``k + 1`` is appended to the tables first, its own last state
+        flagged in turn.  Matchers call this before following the epsilon
+        edges of a flagged state, so a repeat costs states only for the
+        copies a text actually reaches.  Appended states are unreachable
+        until ``F_LAZY`` is cleared, so scans on other threads see either
+        the old or the new exits.
+        """
+
+        with _EXPAND_LOCK:
+            if not self.state_flags[s] & F_LAZY:
+                return
+            r, k, exit_ = self.stubs.pop(s)
+            body = self.repeats[r]
+            if body.max is not None and k == body.max:
+                targets = [exit_]
+            else:
+                base = self._append_copy(body)
+                entry = base + body.entry
+                accept = base + body.accept
+                if k < body.min:
+                    targets = [entry]
+                    self.stubs[accept] = (r, k + 1, exit_)
+                elif body.max is not None:
+                    targets = [exit_, entry] if body.lazy else [entry, exit_]
+                    self.stubs[accept] = (r, k + 1, exit_)
+                else:
+                    # The last copy of x{m,}: loop on it (take it again or
+                    # exit) through one more state.
+                    loop = len(self.op)
+                    self._append_state([exit_, entry] if body.lazy else [entry, exit_])
+                    self.state_flags[accept] &= ~F_LAZY
+                    self.eps_lo[accept] = len(self.eps)
+                    self.eps.append(loop)
+                    self.eps_hi[accept] = len(self.eps)
+                    targets = [loop]
+                self._register(base)
+            self.eps_lo[s] = len(self.eps)
+            self.eps.extend(targets)
+            self.eps_hi[s] = len(self.eps)
+            self.state_flags[s] &= ~F_LAZY
+
+    def expand_all(self) -> None:
+        """Expand every lazy repeat completely (see :meth:`expand`)."""
+
+        with _EXPAND_LOCK:
+            while self.stubs:
+                self.expand(min(self.stubs))
+
+    def _append_copy(self, body: _Body) -> int:
+        # Append the rows of ``body`` shifted to the end of the tables and
+        # return the first one; nested repeats start from their first copy.
+        base = len(self.op)
+        self.op.extend(body.op)
+        self.arg.extend(body.arg)
+        self.out.extend(t + base if t >= 0 else -1 for t in body.out)
+        self.state_flags.extend(body.state_flags)
+        shift = len(self.eps)
+        self.eps_lo.extend(i + shift for i in body.eps_lo)
+        self.eps_hi.extend(i + shift for i in body.eps_hi)
+        self.eps.extend(v + base for v in body.eps)
+        shift = len(self.saves)
+        self.save_lo.extend(i + shift for i in body.save_lo)
+        self.save_hi.extend(i + shift for i in body.save_hi)
+        self.saves.extend(body.saves)
+        for u, r, k, exit_ in body.stubs:
+            self.stubs[base + u] = (r, k, base + exit_)
+        return base
+
+    def _append_state(self, eps: List[int]) -> None:
+        self.op.append(OP_NONE)
+        self.arg.append(0)
+        self.out.append(-1)
+        self.state_flags.append(0)
+        self.eps_lo.append(len(self.eps))
+        self.eps.extend(eps)
+        self.eps_hi.append(len(self.eps))
+        self.save_lo.append(len(self.saves))
+        self.save_hi.append(len(self.saves))
+
+    def _register(self, base: int) -> None:
+        # Make the states from ``base`` on known to the per-state tables
+        # that are not indexed by the matchers directly.
+        added = len(self.op) - base
+        self.closures.extend([None] * added)
+        if self.origin is not None:
+            self.origin.extend([-1] * added)
+        alphabet = getattr(self, "alphabet", None)
+        if alphabet is not None:
+            alphabet.add_states(range(base, len(self.op)))
+
+    def is_accept(self, s: int) -> bool:
+        return bool(self.state_flags[s] & F_ACCEPT)
+
+    def eps_targets(self, s: int) -> array:
+        return self.eps[self.eps_lo[s] : self.eps_hi[s]]
+
+    def closure(self, s: int) -> Closure:
+        """Return the epsilon closure of ``s`` as ``(states, masks)``.
+
+        ``states`` lists, in priority order, the states reachable from ``s``
+        over epsilon edges that either consume a character or accept;
+        states that only forward epsilon edges are left out.  ``masks[i]``
+        is the assertion guarding ``states[i]``: the ``F_BOL``/``F_EOL``
+        bits required along the path (``s`` and ``states[i]`` included), so
+        a matcher keeps the entries whose mask has no bit that fails at the
+        current position.  A state reachable under incomparable assertions
+        is listed once per mask.  ``masks`` is ``None`` when no path needs
+        an anchor.
+        """
+
+        c = self.closures[s]
+        if c is None:
+            c = self.closures[s] = self._compute_closure(s)
+        return c
+
+    def _compute_closure(self, s: int) -> Closure:
+        op, state_flags, eps, eps_lo, eps_hi = (
+            self.op,
+            self.state_flags,
+            self.eps,
+            self.eps_lo,
+            self.eps_hi,
+        )
+        # state -> masks it was reached with; a path is redundant when an
+        # earlier one needed a subset of its assertions.
+        seen: dict[int, list[int]] = {}
+        states: List[int] = []
+        masks: List[int] = []
+        stack = [(s, 0)]
+        while stack:
+            v, m = stack.pop()
+            if state_flags[v] & F_LAZY:
+                self.expand(v)
+            m |= state_flags[v] & F_ANCHORS
+            known = seen.setdefault(v, [])
+            if any(k & ~m == 0 for k in known):
+                continue
+            known.append(m)
+            if op[v] != OP_NONE or state_flags[v] & F_ACCEPT:
+                states.append(v)
+                masks.append(m)
+            stack.extend((eps[i], m) for i in range(eps_hi[v] - 1, eps_lo[v] - 1, -1))
+        return tuple(states), (tuple(masks) if any(masks) else None)
+
+    def matches(self, s: int, ch: str) -> bool:
+        """Return whether the consuming edge of state ``s`` accepts ``ch``."""
+
+        op = self.op[s]
+        if op == OP_CHAR:
+            return self.arg[s] == ord(ch)
+        if op == OP_NOTNL:
+            return ch != "\n"
+        if op == OP_ANY:
+            return True
+        if op == OP_TEST:
+            return self.tests[self.arg[s]](ch)
+        return False
+
+    def edge_ranges(self, s: int, top: int = MAX_CODE_POINT) -> List[Tuple[int, int]]:
+        """Return the ranges of ``[0, top]`` accepted by the consuming edge of ``s``."""
+
+        op = self.op[s]
+        if op == OP_CHAR:
+            c = self.arg[s]
+            return [(c, c)] if c <= top else []
+        if op == OP_NOTNL:
+            return [(0, 9), (11, top)]
+        if op == OP_ANY:
+            return [(0, top)]
+        if op == OP_TEST:
+            return self.charsets[self.arg[s]].code_ranges(top)
+        return []
+
+    def describe_edge(self, s: int) -> dict | None:
+        """Return a JSON-friendly description of the consuming edge of ``s``."""
+
+        op = self.op[s]
+        if op == OP_NONE:
+            return None
+        if op == OP_CHAR:
+            info = {"kind": "char", "char": chr(self.arg[s])}
+        elif op == OP_ANY:
+            info = {"kind": "dot", "newline": True}
+        elif op == OP_NOTNL:
+            info = {"kind": "dot", "newline": False}
+        else:
+            info = dict(self.labels[self.arg[s]])
+        info["to"] = self.out[s]
+        return info
@@ -0,0 +1,549 @@
+"""Lazy DFA for span-only matching.
+
+DFA states are built on demand by subset construction over a compiled
+:class:`~regex_lite.compiler.Program`.  A transition is built once per
+``(state, character class)`` (:attr:`Program.alphabet`), so every character
+of a class reuses it; scans look transitions up per character in a memo
+that points at the class transitions.
+Because ``^``/``$`` depend on the surrounding text, a DFA state is keyed by
+its NFA core set plus a "at beginning of line" bit, and carries two accept
+flags: one for positions that are not an end of line and one for positions
+that are.
+
+Leftmost searches first run an unanchored variant of the DFA (the NFA
+start state is re-added after every step, an implicit ``.*?`` prefix) to
+find where the earliest match ends.  Text without a match is rejected in a
+single pass; otherwise only the start positions before that end are tried
+with the anchored DFA, within a budget proportional to the distance to that
+end, after which one NFA pass finds the start (:meth:`LazyDFA.leftmost`).
+
+A DFA built with ``tags`` (the pattern ID of each tagged program state)
+also records which IDs accept in each state; :meth:`LazyDFA.which`
+uses them to report every pattern of a merged set that matches somewhere
+in a text, in one unanchored pass.
+
+The cache is bounded by an approximate memory budget.  When it fills up it
+is flushed and rebuilt from the current state; if it keeps filling up
+without making progress the search gives up and the caller falls back to
+NFA simulation.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, Iterable, Iterator, Mapping
+
+from . import matcher
+from .compiler import F_ACCEPT, F_BOL, F_EOL
+
+if TYPE_CHECKING:
+    from .compiler import Program
+
+DEFAULT_CACHE_BYTES = 2 * 1024 * 1024
+
+# Rough per-object costs used to keep the cache under its budget.
+_STATE_COST = 320
+_STATE_ITEM_COST = 16
+_TRANS_COST = 100
+_CHAR_COST = 40
+# After a flush, the search must scan at least this many characters per
+# cached state before the next flush or it is considered to be thrashing.
+_MIN_CHARS_PER_STATE = 10
+#: Characters the anchored runs of :meth:`LazyDFA.leftmost` may read per
+#: character between the search position and the earliest match end.
+PROBE_FACTOR = 4
+
+_MISSING = object()
+_EMPTY: frozenset[int] = frozenset()
+
+
+class DFAGaveUp(Exception):
+    """Raised when the DFA cache thrashes and NFA simulation should be used."""
+
+
+class _StartClosure:
+    """Closure of the program's start state for one ``(bol, eol)`` context.
+
+    Every unanchored DFA state contains it, so it is computed once instead
+    of being re-walked for each new state.
+    """
+
+    __slots__ = ("closure", "accept", "ids")
+
+    def __init__(
+        self,
+        prog: "Program",
+        closure: frozenset[int],
+        tags: Mapping[int, int] | None,
+    ) -> None:
+        self.closure = closure
+        self.accept = any(prog.state_flags[s] & F_ACCEPT for s in closure)
+        self.ids = (
+            frozenset(tags[s] for s in closure if s in tags)
+            if tags is not None
+            else _EMPTY
+        )
+
+
+class _DState:
+    # ``closure``/``closure_eol`` exclude the states of ``start``/``start_eol``
+    # (the start closure, when the core contains the start state).
+    __slots__ = (
+        "core",
+        "bol",
+        "seeded",
+        "start",
+        "start_eol",
+        "closure",
+        "closure_eol",
+        "accept",
+        "accept_eol",
+        "idle",
+        "ids",
+        "ids_eol",
+        "next",
+        "by_class",
+    )
+
+    def __init__(
+        self,
+        core: frozenset[int],
+        bol: bool,
+        seeded: bool,
+        start: _StartClosure | None,
+        start_eol: _StartClosure | None,
+        closure: frozenset[int],
+        closure_eol: frozenset[int],
+        accept: bool,
+        accept_eol: bool,
+    ) -> None:
+        self.core = core
+        self.bol = bol
+        self.seeded = seeded
+        self.start = start
+        self.start_eol = start_eol
+        self.closure = closure
+        self.closure_eol = closure_eol
+        self.accept = accept
+        self.accept_eol = accept_eol
+        self.idle = False
+        self.ids = _EMPTY
+        self.ids_eol = _EMPTY
+        self.next: dict[str, _DState | None] = {}
+        self.by_class: dict[int, _DState | None] = {}
+
+
+class LazyDFA:
+    """DFA over ``prog`` whose states and transitions are built while matching."""
+
+    def __init__(
+        self,
+        prog: "Program",
+        cache_bytes: int = DEFAULT_CACHE_BYTES,
+        tags: Mapping[int, int] | None = None,
+    ) -> None:
+        self.prog = prog
+        self.tags = tags
+        self.multiline = prog.multiline
+        self.cache_bytes = cache_bytes
+        self.flushes = 0
+        self._states: dict[tuple[frozenset[int], bool, bool], _DState] = {}
+        self._used = 0
+        self._scanned = 0
+        self._start_core = frozenset((prog.start,))
+        self._start_closures: dict[tuple[bool, bool], _StartClosure] = {}
+        # A seeded state whose core is only the start state has no thread
+        # left from an earlier start, unless edges lead back into the start.
+        self._start_reentrant = prog.start in prog.eps or prog.start in prog.out
+        # Compiled patterns are shared between threads: building states and
+        # transitions, and flushing them, happen under this lock.  Scans
+        # read the built transitions without it.
+        self._lock = threading.RLock()
+
+    def __reduce__(self) -> tuple:
+        # Pickle the configuration only; the copy starts with an empty cache.
+        return (type(self), (self.prog, self.cache_bytes, self.tags))
+
+    # ------------------------------------------------------------------
+    @property
+    def state_count(self) -> int:
+        return len(self._states)
+
+    @property
+    def cache_used(self) -> int:
+        """Approximate number of bytes held by cached states and transitions."""
+
+        return self._used
+
+    def _walk(
+        self, core: Iterable[int], bol: bool, eol: bool, skip: frozenset[int]
+    ) -> frozenset[int]:
+        # Epsilon closure of ``core`` minus the (already closed) ``skip`` set,
+        # from the program's precomputed closures.
+        prog = self.prog
+        closures, closure_of = prog.closures, prog.closure
+        blocked = (0 if bol else F_BOL) | (0 if eol else F_EOL)
+        seen: set[int] = set()
+        for u in core:
+            states, masks = closures[u] or closure_of(u)
+            if masks is None:
+                seen.update(states)
+            else:
+                seen.update(v for v, m in zip(states, masks) if not m & blocked)
+        return frozenset(seen - skip)
+
+    def _start_closure(self, bol: bool, eol: bool) -> _StartClosure:
+        sc = self._start_closures.get((bol, eol))
+        if sc is None:
+            closure = self._walk(self._start_core, bol, eol, _EMPTY)
+            sc = _StartClosure(self.prog, closure, self.tags)
+            self._start_closures[(bol, eol)] = sc
+        return sc
+
+    def _closure(
+        self, core: frozenset[int], bol: bool, eol: bool
+    ) -> tuple[_StartClosure | None, frozenset[int], bool, frozenset[int]]:
+        """Return ``(start, rest, accept, ids)`` for the closure of ``core``."""
+
+        state_flags, tags = self.prog.state_flags, self.tags
+        start = None
+        skip = _EMPTY
+        if self.prog.start in core:
+            start = self._start_closure(bol, eol)
+            skip = start.closure
+        rest = self._walk(core, bol, eol, skip)
+        accept = any(state_flags[s] & F_ACCEPT for s in rest)
+        ids = (
+            frozenset(tags[s] for s in rest if s in tags)
+            if tags is not None
+            else _EMPTY
+        )
+        if start is not None:
+            accept = accept or start.accept
+            ids = ids | start.ids
+        return start, rest, accept, ids
+
+    def _state(self, core: frozenset[int], bol: bool, seeded: bool) -> _DState:
+        key = (core, bol, seeded)
+        st = self._states.get(key)
+        if st is not None:
+            return st
+        with self._lock:
+            st = self._states.get(key)
+            if st is not None:
+                return st
+            start, closure, accept, ids = self._closure(core, bol, False)
+            start_eol, closure_eol, accept_eol, ids_eol = self._closure(core, bol, True)
+            st = _DState(
+                core,
+                bol,
+                seeded,
+                start,
+                start_eol,
+                closure,
+                closure_eol,
+                accept,
+                accept_eol,
+            )
+            st.ids = ids
+            st.ids_eol = ids_eol
+            st.idle = seeded and core == self._start_core and not self._start_reentrant
+            self._reserve(self._state_cost(st))
+            self._states[key] = st
+            return st
+
+    @staticmethod
+    def _state_cost(st: _DState) -> int:
+        items = len(st.core) + len(st.closure) + len(st.closure_eol)
+        return _STATE_COST + _STATE_ITEM_COST * items
+
+    def _reserve(self, cost: int) -> None:
+        if self._used + cost > self.cache_bytes and self._states:
+            if self.flushes and self._scanned < _MIN_CHARS_PER_STATE * len(
+                self._states
+            ):
+                raise DFAGaveUp(f"DFA cache thrashing ({len(self._states)} states)")
+            self.flush()
+        self._used += cost
+
+    def flush(self) -> None:
+        """Drop every cached state and transition."""
+
+        with self._lock:
+            for st in self._states.values():
+                st.next.clear()
+                st.by_class.clear()
+            self._states.clear()
+            self._used = 0
+            self._scanned = 0
+            self.flushes += 1
+
+    def _transition(self, st: _DState, ch: str) -> _DState | None:
+        with self._lock:
+            prog = self.prog
+            k = prog.alphabet.classify(ord(ch))
+            self._reserve(_CHAR_COST if k in st.by_class else _CHAR_COST + _TRANS_COST)
+            key = (st.core, st.bol, st.seeded)
+            if key not in self._states:
+                # ``st`` was dropped by a flush; re-register it so the budget
+                # accounts for the transitions it is about to grow.
+                self._reserve(self._state_cost(st))
+                self._states[key] = st
+            nxt = st.by_class.get(k, _MISSING)
+            if nxt is _MISSING:
+                eol = self.multiline and ch == "\n"
+                targets, movers = prog.out, prog.alphabet.consumers(k)
+                if eol:
+                    start, closure = st.start_eol, st.closure_eol
+                else:
+                    start, closure = st.start, st.closure
+                out = {targets[u] for u in closure & movers}
+                if start is not None:
+                    out.update(targets[u] for u in start.closure & movers)
+                if st.seeded:
+                    out.add(prog.start)
+                nxt = self._state(frozenset(out), eol, st.seeded) if out else None
+                st.by_class[k] = nxt
+            st.next[ch] = nxt
+            return nxt
+
+    # ------------------------------------------------------------------
+    def longest_at(
+        self,
+        text: str,
+        start: int,
+        final: bool = True,
+        state: _DState | None = None,
+    ) -> int | None:
+        """Return the end of the longest match starting at ``start``, if any.
+
+        With ``final=False``, reaching the end of ``text`` while the match
+        may still grow raises :class:`~regex_lite.matcher.NeedMoreInput`
+        whose ``state`` is ``(dfa_state, best)``: the state there and the
+        longest end found so far.  Passing that ``dfa_state`` back continues
+        the run over ``text[start:]``, read as the text that follows; only
+        ends found in that text are then reported.
+        """
+
+        if state is None:
+            bol = start == 0 or (self.multiline and text[start - 1] == "\n")
+            state = self._state(self._start_core, bol, False)
+        return self._longest(state, text, start, final, len(text))[0]
+
+    def _longest(
+        self, st: _DState, text: str, start: int, final: bool, stop: int
+    ) -> tuple[int | None, int]:
+        # ``(best, p)``: the longest match end found from the anchored start
+        # state ``st`` and where the run stopped.  A run still alive at
+        # ``stop < len(text)`` without having matched is cut there, so
+        # ``p == stop`` then means it is unknown whether it matches; once it
+        # has matched, it runs on to its longest end.
+        n = len(text)
+        multiline = self.multiline
+        best: int | None = None
+        p = mark = start
+        while True:
+            if p == stop:
+                if p < n:
+                    if best is None:
+                        break
+                    stop = n
+                    continue
+                if not final:
+                    self._scanned += p - mark
+                    raise matcher.NeedMoreInput(start, (st, best))
+                if st.accept_eol:
+                    best = p
+                break
+            ch = text[p]
+            if st.accept_eol if (multiline and ch == "\n") else st.accept:
+                best = p
+            nxt = st.next.get(ch, _MISSING)
+            if nxt is _MISSING:
+                # Slow path: account for progress before the cache may flush.
+                self._scanned += p - mark
+                mark = p
+                nxt = self._transition(st, ch)
+            if nxt is None:
+                break
+            st = nxt
+            p += 1
+        self._scanned += p - mark
+        return best, p
+
+    def leftmost(
+        self, text: str, pos: int, end: int, final: bool = True
+    ) -> tuple[int, int]:
+        """Return the leftmost-longest match, given the earliest match ``end``.
+
+        ``end`` is the result of :meth:`earliest_end` (or :meth:`stream_end`)
+        from ``pos``: some match ends there, so the leftmost one starts at or
+        before it.  The start positions are tried in order with the anchored
+        DFA, which is cheap when runs die quickly.  The first run that
+        matches fixes the start and reads on to the longest end; once the
+        runs have read :data:`PROBE_FACTOR` times ``end - pos`` characters
+        without a match, the rest is left to one pass of
+        :func:`regex_lite.matcher._search`, so the cost stays linear in the
+        text read.
+        """
+
+        n = len(text)
+        multiline = self.multiline
+        budget = PROBE_FACTOR * (end - pos + 1)
+        # Anchored start states outside / at a beginning of line.
+        heads = (
+            self._state(self._start_core, False, False),
+            self._state(self._start_core, True, False),
+        )
+        for i in range(pos, end + 1):
+            st = heads[i == 0 or (multiline and text[i - 1] == "\n")]
+            if i < n:
+                # Skip, without a run, a start whose first character is known
+                # to kill the anchored DFA before it accepts anything.
+                ch = text[i]
+                if st.next.get(ch, _MISSING) is None and not (
+                    st.accept_eol if (multiline and ch == "\n") else st.accept
+                ):
+                    continue
+            stop = i + budget
+            j, p = self._longest(st, text, i, final, stop if stop < n else n)
+            if j is not None:
+                return (i, j)
+            if p == stop and stop < n:
+                span = matcher._search(self.prog, text, i, final=final)
+                if span is not None:
+                    return span
+                break
+            budget -= p - i
+        raise AssertionError("unanchored and anchored DFA disagree")
+
+    def earliest_end(self, text: str, pos: int = 0) -> int | None:
+        """Return the smallest end of any match starting at or after ``pos``.
+
+        This is a single unanchored pass that stops at the first accepting
+        position; ``None`` means the rest of ``text`` contains no match.
+        """
+
+        n = len(text)
+        multiline = self.multiline
+        bol = pos == 0 or (multiline and text[pos - 1] == "\n")
+        st = self._state(self._start_core, bol, True)
+        p = mark = pos
+        try:
+            while p < n:
+                ch = text[p]
+                if st.accept_eol if (multiline and ch == "\n") else st.accept:
+                    return p
+                nxt = st.next.get(ch, _MISSING)
+                if nxt is _MISSING:
+                    self._scanned += p - mark
+                    mark = p
+                    nxt = self._transition(st, ch)
+                st = nxt
+                p += 1
+            return n if st.accept_eol else None
+        finally:
+            self._scanned += p - mark
+
+    def stream_end(
+        self, text: str, pos: int, final: bool, state: _DState | None = None
+    ) -> int | None:
+        """:meth:`earliest_end` for text that may be followed by more input.
+
+        With ``final=False``, reaching the end of ``text`` without a match
+        raises :class:`~regex_lite.matcher.NeedMoreInput` whose ``keep`` is
+        the last position at which no thread from an earlier start was
+        alive (no pending match starts before it) and whose ``state`` is the
+        DFA state at the end.  Passing that ``state`` back continues the
+        scan over ``text[pos:]``, read as the text that follows; ``keep`` is
+        then ``-1`` if no such position was seen in that text.
+        """
+
+        n = len(text)
+        multiline = self.multiline
+        idle = p = mark = pos
+        if state is None:
+            bol = pos == 0 or (multiline and text[pos - 1] == "\n")
+            st = self._state(self._start_core, bol, True)
+        else:
+            st, idle = state, -1
+        try:
+            while p < n:
+                if st.idle:
+                    idle = p
+                ch = text[p]
+                if st.accept_eol if (multiline and ch == "\n") else st.accept:
+                    return p
+                nxt = st.next.get(ch, _MISSING)
+                if nxt is _MISSING:
+                    self._scanned += p - mark
+                    mark = p
+                    nxt = self._transition(st, ch)
+                st = nxt
+                p += 1
+            if final:
+                return n if st.accept_eol else None
+            raise matcher.NeedMoreInput(n if st.idle else idle, st)
+        finally:
+            self._scanned += p - mark
+
+    def which(self, text: str, pos: int = 0, total: int | None = None) -> set[int]:
+        """Return the tags of every accept state reached from ``pos`` on.
+
+        This is one unanchored pass; it stops early once ``total`` distinct
+        tags have been seen.
+        """
+
+        n = len(text)
+        multiline = self.multiline
+        bol = pos == 0 or (multiline and text[pos - 1] == "\n")
+        st = self._state(self._start_core, bol, True)
+        found: set[int] = set()
+        p = mark = pos
+        try:
+            while p < n:
+                ch = text[p]
+                ids = st.ids_eol if (multiline and ch == "\n") else st.ids
+                if ids:
+                    found |= ids
+                    if len(found) == total:
+                        return found
+                nxt = st.next.get(ch, _MISSING)
+                if nxt is _MISSING:
+                    self._scanned += p - mark
+                    mark = p
+                    nxt = self._transition(st, ch)
+                st = nxt
+                p += 1
+            found |= st.ids_eol
+            return found
+        finally:
+            self._scanned += p - mark
+
+    def search(self, text: str, pos: int = 0) -> tuple[int, int] | None:
+        """Return the leftmost-longest match at or after ``pos``, or ``None``."""
+
+        end = self.earliest_end(text, pos)
+        if end is None:
+            return None
+        return self.leftmost(text, pos, end)
+
+    def iter_spans(self, text: str, pos: int = 0) -> Iterator[tuple[int, int]]:
+        """Yield leftmost-longest non-overlapping spans, like the NFA matcher.
+
+        If the cache starts thrashing, the remaining spans are produced by
+        :func:`regex_lite.matcher._iter_spans` from the current position.
+        """
+
+        N = len(text)
+        while pos <= N:
+            try:
+                span = self.search(text, pos)
+            except DFAGaveUp:
+                yield from matcher._iter_spans(self.prog, text, pos)
+                return
+            if span is None:
+                return
+            yield span
+            start, end = span
+            pos = end if end > start else end + 1
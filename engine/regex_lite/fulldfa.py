@@ -0,0 +1,413 @@
+"""Ahead-of-time DFA for span-only matching.
+
+:class:`FullDFA` builds every state reachable from the start states at
+once, by the same subset construction as :class:`~regex_lite.dfa.LazyDFA`
+(anchors included), but over character equivalence classes
+(:class:`~regex_lite.alphabet.Alphabet`) instead of individual characters.
+With ``minimize`` the states are then merged by Hopcroft's partition
+refinement.  The result is a dense transition table indexed by
+``state * classes + class``, with ``-1`` for the dead state; a scan first
+translates the text to class codes, then each step is two table reads and
+never builds anything.
+
+Given the program of the reversed pattern (:func:`reverse_tree`), a second
+DFA is built that finds all match starts of a text in one backward pass,
+which replaces the per-position anchored tries of a leftmost search.
+
+Construction stops with :class:`DFATooLarge` once ``max_states`` states
+exist; :meth:`Pattern.to_dfa <regex_lite.pattern.Pattern.to_dfa>` then
+keeps using the lazy DFA or the NFA.
+"""
+
+from __future__ import annotations
+
+import sys
+from dataclasses import replace
+from typing import TYPE_CHECKING, Iterator, Sequence
+
+from . import ast
+from .alphabet import Alphabet
+from .dfa import DFAGaveUp, LazyDFA
+
+if TYPE_CHECKING:
+    from .compiler import Program
+    from .dfa import _DState
+
+#: Default limit on the number of states :class:`FullDFA` may construct.
+DEFAULT_MAX_STATES = 10_000
+
+
+class DFATooLarge(DFAGaveUp):
+    """Raised when full DFA construction exceeds its state limit."""
+
+
+class _ClassMap(dict):
+    """:meth:`str.translate` table from code points to class characters."""
+
+    def __init__(self, alphabet: Alphabet) -> None:
+        super().__init__((c, chr(k)) for c, k in enumerate(alphabet.table))
+        self.classify = alphabet.classify
+
+    def __missing__(self, c: int) -> str:
+        k = self[c] = chr(self.classify(c))
+        return k
+
+
+class FullDFA:
+    """Complete (optionally minimal) DFA over the classes of ``prog``.
+
+    States are stored premultiplied: state ``s`` is the offset
+    ``s * classes`` of its row in ``trans``, and ``trans[s + k]`` is the
+    offset of the target on class ``k`` (``-1`` when dead).  ``accept[s + k]``
+    tells whether ``s`` accepts before a character of class ``k`` (the
+    newline class counts as an end of line under ``m``) and
+    ``accept_end[s]`` whether it accepts at the end of the text.
+    ``starts[bol + 2 * seeded]`` is the start state of an anchored
+    (``seeded=False``) or unanchored search, at a beginning of line or not.
+
+    Texts are translated to one class code per character before a scan
+    (:meth:`codes`), so the scan loop only reads the two tables.
+    """
+
+    __slots__ = (
+        "prog",
+        "alphabet",
+        "multiline",
+        "classes",
+        "newline",
+        "trans",
+        "accept",
+        "accept_end",
+        "starts",
+        "reverse",
+        "_map",
+    )
+
+    def __init__(
+        self,
+        prog: "Program",
+        minimize: bool = True,
+        max_states: int = DEFAULT_MAX_STATES,
+        reverse: "Program | None" = None,
+    ) -> None:
+        self.prog = prog
+        self.alphabet = Alphabet(prog)
+        self.multiline = prog.multiline
+        self.classes = ncls = self.alphabet.count
+        self.newline = self.alphabet.classify(10) if prog.multiline else -1
+        rows, accept, accept_eol, starts = self._construct(max_states)
+        if minimize:
+            rows, accept, accept_eol, starts = _minimize(
+                rows, accept, accept_eol, starts, ncls
+            )
+        # A list: its items are not boxed again on every read.
+        self.trans = [t * ncls if t >= 0 else -1 for row in rows for t in row]
+        self.accept = bytes(
+            accept_eol[s] if k == self.newline else accept[s]
+            for s in range(len(rows))
+            for k in range(ncls)
+        )
+        self.accept_end = bytes(
+            accept_eol[s] if k == 0 else 0
+            for s in range(len(rows))
+            for k in range(ncls)
+        )
+        self.starts = tuple(s * ncls if s >= 0 else -1 for s in starts)
+        self._map = _ClassMap(self.alphabet)
+        self.reverse = (
+            FullDFA(reverse, minimize, max_states) if reverse is not None else None
+        )
+
+    def __len__(self) -> int:
+        return len(self.trans) // self.classes
+
+    def _construct(self, max_states: int) -> tuple:
+        # Explore the lazy DFA (with an unbounded cache) over one
+        # representative character per class.
+        lazy = LazyDFA(self.prog, sys.maxsize)
+        reps = self.alphabet.representatives
+        index: dict[int, int] = {}
+        states: list[_DState] = []
+
+        def number(st: "_DState | None") -> int:
+            if st is None:
+                return -1
+            i = index.get(id(st))
+            if i is None:
+                if len(states) >= max_states:
+                    raise DFATooLarge(f"more than {max_states} DFA states")
+                i = index[id(st)] = len(states)
+                states.append(st)
+            return i
+
+        starts = [
+            number(lazy._state(lazy._start_core, bol, seeded))
+            for seeded in (False, True)
+            for bol in (False, True)
+        ]
+        rows: list[list[int]] = []
+        while len(rows) < len(states):
+            st = states[len(rows)]
+            rows.append([number(lazy._transition(st, ch)) for ch in reps])
+        accept = [st.accept for st in states]
+        accept_eol = [st.accept_eol for st in states]
+        return rows, accept, accept_eol, starts
+
+    # ------------------------------------------------------------------
+    def codes(self, text) -> Sequence[int]:
+        """Return the class of every character of ``text``, as a sequence."""
+
+        if not isinstance(text, str):
+            # A ``ByteText`` view of a buffer; its characters are Latin-1.
+            text = bytes(text.buf).decode("latin-1")
+        mapped = text.translate(self._map)
+        if self.classes <= 256:
+            return mapped.encode("latin-1")
+        return memoryview(mapped.encode("utf-32-le")).cast("I")
+
+    def _bol(self, codes: Sequence[int], p: int) -> bool:
+        return p == 0 or codes[p - 1] == self.newline
+
+    def _longest(self, codes: Sequence[int], start: int) -> int | None:
+        st = self.starts[self._bol(codes, start)]
+        if st < 0:
+            return None
+        trans, accept = self.trans, self.accept
+        best: int | None = None
+        for p in range(start, len(codes)):
+            i = st + codes[p]
+            if accept[i]:
+                best = p
+            st = trans[i]
+            if st < 0:
+                return best
+        return len(codes) if self.accept_end[st] else best
+
+    def _earliest(self, codes: Sequence[int], pos: int) -> int | None:
+        st = self.starts[2 + self._bol(codes, pos)]
+        if st < 0:
+            return None
+        trans, accept = self.trans, self.accept
+        for p in range(pos, len(codes)):
+            i = st + codes[p]
+            if accept[i]:
+                return p
+            st = trans[i]
+            if st < 0:
+                return None
+        return len(codes) if self.accept_end[st] else None
+
+    def _search(self, codes: Sequence[int], pos: int) -> tuple[int, int] | None:
+        end = self._earliest(codes, pos)
+        if end is None:
+            return None
+        # Some match ends at ``end``, so the leftmost one starts at or before it.
+        for i in range(pos, end + 1):
+            j = self._longest(codes, i)
+            if j is not None:
+                return (i, j)
+        raise AssertionError("unanchored and anchored DFA disagree")
+
+    # The public scans read ``text`` directly and classify each character
+    # they reach, for callers (the literal prefilter) that only look at
+    # small parts of a text.
+    def longest_at(self, text: str, start: int) -> int | None:
+        """Return the end of the longest match starting at ``start``, if any."""
+
+        n = len(text)
+        bol = start == 0 or (self.multiline and text[start - 1] == "\n")
+        st = self.starts[bol]
+        if st < 0:
+            return None
+        trans, accept = self.trans, self.accept
+        table, classify = self.alphabet.table, self.alphabet.classify
+        best: int | None = None
+        for p in range(start, n):
+            c = ord(text[p])
+            i = st + (table[c] if c < 256 else classify(c))
+            if accept[i]:
+                best = p
+            st = trans[i]
+            if st < 0:
+                return best
+        return n if self.accept_end[st] else best
+
+    def earliest_end(self, text: str, pos: int = 0) -> int | None:
+        """Return the smallest end of any match starting at or after ``pos``."""
+
+        n = len(text)
+        bol = pos == 0 or (self.multiline and text[pos - 1] == "\n")
+        st = self.starts[2 + bol]
+        if st < 0:
+            return None
+        trans, accept = self.trans, self.accept
+        table, classify = self.alphabet.table, self.alphabet.classify
+        for p in range(pos, n):
+            c = ord(text[p])
+            i = st + (table[c] if c < 256 else classify(c))
+            if accept[i]:
+                return p
+            st = trans[i]
+            if st < 0:
+                return None
+        return n if self.accept_end[st] else None
+
+    def search(self, text: str, pos: int = 0) -> tuple[int, int] | None:
+        """Return the leftmost-longest match at or after ``pos``, or ``None``."""
+
+        end = self.earliest_end(text, pos)
+        if end is None:
+            return None
+        for i in range(pos, end + 1):
+            j = self.longest_at(text, i)
+            if j is not None:
+                return (i, j)
+        raise AssertionError("unanchored and anchored DFA disagree")
+
+    def _match_starts(self, codes: Sequence[int]) -> bytearray:
+        # Run as the DFA of the reversed pattern: one unanchored pass over
+        # the reversed text marks every position where a forward match
+        # starts.
+        rev = codes[::-1]
+        n = len(rev)
+        starts = bytearray(n + 1)
+        st = self.starts[3]
+        if st < 0:
+            return starts
+        trans, accept = self.trans, self.accept
+        for q in range(n):
+            i = st + rev[q]
+            if accept[i]:
+                starts[n - q] = 1
+            st = trans[i]
+            if st < 0:
+                return starts
+        if self.accept_end[st]:
+            starts[0] = 1
+        return starts
+
+    def iter_spans(self, text: str, pos: int = 0) -> Iterator[tuple[int, int]]:
+        """Yield leftmost-longest non-overlapping spans, like the NFA matcher.
+
+        The whole text is translated to class codes first (:meth:`codes`).
+        With a ``reverse`` DFA (built from the reversed pattern) one backward
+        pass finds every position where a match starts, so each match costs
+        a single anchored run from its start.
+        """
+
+        codes = self.codes(text)
+        N = len(codes)
+        if self.reverse is not None:
+            starts = self.reverse._match_starts(codes)
+            while pos <= N:
+                start = starts.find(1, pos)
+                if start < 0:
+                    return
+                end = self._longest(codes, start)
+                if end is None:
+                    raise AssertionError("forward and reverse DFA disagree")
+                yield start, end
+                pos = end if end > start else end + 1
+            return
+        while pos <= N:
+            span = self._search(codes, pos)
+            if span is None:
+                return
+            yield span
+            start, end = span
+            pos = end if end > start else end + 1
+
+
+def reverse_tree(node: ast.Expr) -> ast.Expr:
+    """Return a tree matching the reversed strings of ``node``.
+
+    ``^`` and ``$`` trade places, which keeps their meaning on reversed
+    text, under the ``m`` flag too.  Capture groups are kept but their
+    positions mean nothing; the tree is only used to find match starts.
+    """
+
+    if isinstance(node, ast.String):
+        return ast.String(node.text[::-1])
+    if isinstance(node, ast.AnchorStart):
+        return ast.AnchorEnd()
+    if isinstance(node, ast.AnchorEnd):
+        return ast.AnchorStart()
+    if isinstance(node, ast.Concat):
+        return ast.Concat([reverse_tree(p) for p in reversed(node.parts)])
+    if isinstance(node, ast.Alt):
+        return ast.Alt([reverse_tree(o) for o in node.options])
+    if isinstance(node, (ast.Group, ast.Repeat)):
+        return replace(node, expr=reverse_tree(node.expr))
+    return node
+
+
+def _minimize(
+    rows: list[list[int]],
+    accept: list[bool],
+    accept_eol: list[bool],
+    starts: list[int],
+    ncls: int,
+) -> tuple:
+    """Merge equivalent states with Hopcroft's algorithm.
+
+    The dead state (``-1``) takes part as an explicit state ``n`` so that
+    states equivalent to it are dropped.
+    """
+
+    n = len(rows)
+    dead = n
+    succ = [[dead if t < 0 else t for t in row] for row in rows]
+    succ.append([dead] * ncls)
+    signature = [(a, e) for a, e in zip(accept, accept_eol)] + [(False, False)]
+
+    # inverse[k][q]: states with a class-k transition into q
+    inverse: list[dict[int, list[int]]] = [{} for _ in range(ncls)]
+    for p, row in enumerate(succ):
+        for k, q in enumerate(row):
+            inverse[k].setdefault(q, []).append(p)
+
+    initial: dict[tuple[bool, bool], int] = {}
+    block_of = [initial.setdefault(sig, len(initial)) for sig in signature]
+    blocks: list[set[int]] = [set() for _ in initial]
+    for q, b in enumerate(block_of):
+        blocks[b].add(q)
+    largest = max(range(len(blocks)), key=lambda b: len(blocks[b]))
+    pending = set(range(len(blocks))) - {largest}
+    while pending:
+        splitter = list(blocks[pending.pop()])
+        for k in range(ncls):
+            inv = inverse[k]
+            into: dict[int, list[int]] = {}
+            for q in splitter:
+                for p in inv.get(q, ()):
+                    into.setdefault(block_of[p], []).append(p)
+            for b, members in into.items():
+                block = blocks[b]
+                moved = set(members)
+                if len(moved) == len(block):
+                    continue
+                block -= moved
+                nb = len(blocks)
+                blocks.append(moved)
+                for p in moved:
+                    block_of[p] = nb
+                if b in pending or len(moved) <= len(block):
+                    pending.add(nb)
+                else:
+                    pending.add(b)
+
+    # Renumber blocks in order of their first state; the dead block is -1.
+    new: dict[int, int] = {block_of[dead]: -1}
+    for q in range(n):
+        if block_of[q] not in new:
+            new[block_of[q]] = len(new) - 1
+    m = len(new) - 1
+    out_rows: list[list[int]] = [[] for _ in range(m)]
+    out_accept = [False] * m
+    out_eol = [False] * m
+    for q in range(n):
+        i = new[block_of[q]]
+        if i >= 0 and not out_rows[i]:
+            out_rows[i] = [new[block_of[t]] for t in succ[q]]
+            out_accept[i], out_eol[i] = accept[q], accept_eol[q]
+    return out_rows, out_accept, out_eol, [new[block_of[s]] for s in starts]
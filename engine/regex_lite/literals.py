@@ -0,0 +1,419 @@
+"""Literal analysis of pattern trees and the search prefilter built on it.
+
+:func:`analyze` walks a :mod:`regex_lite.ast` tree and summarizes, for every
+node, which literal strings its matches are known to start with, end with or
+contain.  :func:`prefilter` turns that summary into a :class:`Prefilter`
+that lets a search skip text with :meth:`str.find` before any automaton
+runs:
+
+* a *prefix* prefilter knows that every match starts with one of its
+  literals, so only their occurrences are candidate match starts;
+* a *required* prefilter only knows that every match contains one of its
+  literals, so text past the last occurrence cannot match;
+* a *line* prefilter knows that every match starts with ``^``, so only the
+  start of the text (or, under the ``m`` flag, the start of a line found
+  with ``str.find("\\n")``) is a candidate match start, and none past the
+  last occurrence of a required literal.
+
+Patterns that are nothing but literals (``foo``, ``GET|POST``) skip the
+automaton altogether: :func:`literal_searcher` returns a
+:class:`LiteralSearcher` that produces the same spans with :meth:`str.find`.
+
+Literal sets are capped at :data:`MAX_LITERALS` strings; anything larger is
+treated as unknown and the engines scan the text as usual.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, FrozenSet, Iterator, Optional
+
+from . import ast
+from .charset import fold_table
+
+#: Largest literal set tracked per node (and searched by a prefilter).
+MAX_LITERALS = 16
+#: Longest literal kept; longer prefixes/suffixes are truncated.
+MAX_LITERAL_LEN = 64
+# Largest character class expanded into single-character literals.
+_MAX_CLASS_CHARS = 8
+# Largest bounded repetition expanded into an exact literal set.
+_MAX_REPEAT = 4
+
+Literals = Optional[FrozenSet[str]]
+
+
+@dataclass(frozen=True)
+class LiteralInfo:
+    """What is known about the strings matched by one node.
+
+    ``exact`` is the complete set of matched strings when it is small and
+    finite.  Otherwise every match starts with a string of ``prefix``, ends
+    with one of ``suffix`` and contains one of ``required``; ``None`` means
+    nothing is known.
+    """
+
+    exact: Literals = None
+    prefix: Literals = None
+    suffix: Literals = None
+    required: Literals = None
+
+    @property
+    def prefixes(self) -> Literals:
+        return self.exact if self.exact is not None else self.prefix
+
+    @property
+    def suffixes(self) -> Literals:
+        return self.exact if self.exact is not None else self.suffix
+
+    @property
+    def requirements(self) -> Literals:
+        return self.exact if self.exact is not None else self.required
+
+
+_UNKNOWN = LiteralInfo()
+_EMPTY = LiteralInfo(exact=frozenset(("",)))
+
+
+def _cross(a: Literals, b: Literals) -> Literals:
+    if a is None or b is None or len(a) * len(b) > MAX_LITERALS:
+        return None
+    return frozenset(x + y for x in a for y in b)
+
+
+def _union(sets: list[Literals]) -> Literals:
+    if any(s is None for s in sets):
+        return None
+    out = frozenset().union(*sets)
+    return out if len(out) <= MAX_LITERALS else None
+
+
+def _score(lits: Literals) -> tuple[int, int]:
+    # Longer shortest literal first, then fewer literals.
+    if not lits:
+        return (0, 0)
+    return (min(len(s) for s in lits), -len(lits))
+
+
+def _best(*candidates: Literals) -> Literals:
+    best: Literals = None
+    for lits in candidates:
+        if lits is not None and (best is None or _score(lits) > _score(best)):
+            best = lits
+    return best
+
+
+def _limit(info: LiteralInfo) -> LiteralInfo:
+    """Truncate overlong literals so that sets stay cheap to search."""
+
+    def cut(lits: Literals, keep: Callable[[str], str]) -> Literals:
+        if lits is None or all(len(s) <= MAX_LITERAL_LEN for s in lits):
+            return lits
+        return frozenset(keep(s) for s in lits)
+
+    if info.exact is not None and any(len(s) > MAX_LITERAL_LEN for s in info.exact):
+        info = LiteralInfo(None, info.exact, info.exact, info.exact)
+    return LiteralInfo(
+        info.exact,
+        cut(info.prefix, lambda s: s[:MAX_LITERAL_LEN]),
+        cut(info.suffix, lambda s: s[-MAX_LITERAL_LEN:]),
+        cut(info.required, lambda s: s[:MAX_LITERAL_LEN]),
+    )
+
+
+def _concat(a: LiteralInfo, b: LiteralInfo) -> LiteralInfo:
+    if a.exact is not None:
+        prefix = _cross(a.exact, b.prefixes) or a.exact
+    else:
+        prefix = a.prefix
+    if b.exact is not None:
+        suffix = _cross(a.suffixes, b.exact) or b.exact
+    else:
+        suffix = b.suffix
+    required = _best(a.requirements, b.requirements, _cross(a.suffixes, b.prefixes))
+    return _limit(LiteralInfo(_cross(a.exact, b.exact), prefix, suffix, required))
+
+
+def _repeat(inner: LiteralInfo, lo: int, hi: int | None) -> LiteralInfo:
+    if inner.exact is not None and hi is not None and hi <= _MAX_REPEAT:
+        powers = [_EMPTY.exact]
+        for _ in range(hi):
+            powers.append(_cross(powers[-1], inner.exact))
+        exact = _union(powers[lo:])
+        if exact is not None:
+            return _limit(LiteralInfo(exact=exact))
+    if lo == 0:
+        return _UNKNOWN
+    return LiteralInfo(None, inner.prefixes, inner.suffixes, inner.requirements)
+
+
+def _class_chars(node: ast.CharClass) -> Literals:
+    if node.negated:
+        return None
+    chars: set[str] = set()
+    for it in node.items:
+        if isinstance(it, ast.Literal):
+            chars.add(it.char)
+        elif isinstance(it, ast.Range):
+            if ord(it.end) - ord(it.start) >= _MAX_CLASS_CHARS:
+                return None
+            chars.update(chr(c) for c in range(ord(it.start), ord(it.end) + 1))
+        else:
+            return None
+    return frozenset(chars) if len(chars) <= _MAX_CLASS_CHARS else None
+
+
+def analyze(node: ast.Expr) -> LiteralInfo:
+    """Return the :class:`LiteralInfo` of ``node``."""
+
+    if isinstance(node, ast.Literal):
+        return LiteralInfo(exact=frozenset((node.char,)))
+    if isinstance(node, (ast.Empty, ast.AnchorStart, ast.AnchorEnd)):
+        return _EMPTY
+    if isinstance(node, ast.CharClass):
+        chars = _class_chars(node)
+        return LiteralInfo(exact=chars) if chars else _UNKNOWN
+    if isinstance(node, ast.Group):
+        return analyze(node.expr)
+    if isinstance(node, ast.Concat):
+        info = _EMPTY
+        for part in node.parts:
+            info = _concat(info, analyze(part))
+        return info
+    if isinstance(node, ast.Alt):
+        infos = [analyze(o) for o in node.options]
+        return LiteralInfo(
+            _union([i.exact for i in infos]),
+            _union([i.prefixes for i in infos]),
+            _union([i.suffixes for i in infos]),
+            _union([i.requirements for i in infos]),
+        )
+    if isinstance(node, ast.Repeat):
+        lo = {"*": 0, "+": 1, "?": 0}.get(node.kind, node.m or 0)
+        hi = {"*": None, "+": None, "?": 1}.get(node.kind, node.n)
+        return _repeat(analyze(node.expr), lo, hi)
+    # Dot and shorthand classes match too many characters to enumerate.
+    return _UNKNOWN
+
+
+def _starts_anchored(node: ast.Expr) -> bool:
+    """Return whether every match of ``node`` begins with ``^``."""
+
+    if isinstance(node, ast.AnchorStart):
+        return True
+    if isinstance(node, ast.Group):
+        return _starts_anchored(node.expr)
+    if isinstance(node, ast.Concat):
+        for part in node.parts:
+            if not isinstance(part, ast.Empty):
+                return _starts_anchored(part)
+        return False
+    if isinstance(node, ast.Alt):
+        return all(_starts_anchored(o) for o in node.options)
+    if isinstance(node, ast.Repeat):
+        lo = {"*": 0, "+": 1, "?": 0}.get(node.kind, node.m or 0)
+        return lo > 0 and _starts_anchored(node.expr)
+    return False
+
+
+class Prefilter:
+    """Literal scan run before the automaton; see the module docstring.
+
+    ``kind`` is ``"prefix"``, ``"required"`` or ``"line"`` and ``literals``
+    the sorted strings searched for (for ``"line"``, the strings every match
+    contains, if any; its ``multiline`` tells whether every line start is a
+    candidate).
+    """
+
+    __slots__ = ("kind", "literals", "multiline")
+
+    def __init__(
+        self, kind: str, literals: FrozenSet[str] = frozenset(), multiline: bool = False
+    ) -> None:
+        self.multiline = multiline
+        # A literal that starts with (or, for "required", contains) another
+        # one never produces an occurrence the shorter one misses.
+        covers = str.startswith if kind == "prefix" else str.__contains__
+        self.kind = kind
+        self.literals = tuple(
+            sorted(
+                s
+                for s in literals
+                if not any(t != s and covers(s, t) for t in literals)
+            )
+        )
+
+    def __repr__(self) -> str:
+        return f"Prefilter({self.kind!r}, {self.literals!r})"
+
+    def scanner(self, text: str) -> Callable[[int], int]:
+        """Return ``find(pos)``: the first candidate position at or after ``pos``.
+
+        That is a literal occurrence, or a line start for ``"line"``; ``find``
+        returns ``-1`` when there is none.  Positions must
+        not decrease between calls; each literal's next occurrence is cached,
+        so a whole scan costs one pass over ``text`` per literal.
+        """
+
+        if self.kind == "line":
+            return self._line_scanner(text)
+        return self._literal_scanner(text)
+
+    def _line_scanner(self, text: str) -> Callable[[int], int]:
+        # A line start is a candidate only while a literal every match
+        # contains still occurs at or after it.
+        present = self._literal_scanner(text) if self.literals else None
+        multiline = self.multiline
+        # Next literal occurrence: -2 before the first search; the text is
+        # searched again only once the line starts have passed it.
+        occurrence = -2
+
+        def line_start(pos: int) -> int:
+            nonlocal occurrence
+            if pos != 0 and not (multiline and text[pos - 1] == "\n"):
+                i = text.find("\n", pos) if multiline else -1
+                if i < 0:
+                    return -1
+                pos = i + 1
+            if present is not None:
+                if occurrence == -2 or -1 < occurrence < pos:
+                    occurrence = present(pos)
+                if occurrence < 0:
+                    return -1
+            return pos
+
+        return line_start
+
+    def _literal_scanner(self, text: str) -> Callable[[int], int]:
+        if len(self.literals) == 1:
+            (lit,) = self.literals
+            return lambda pos: text.find(lit, pos)
+
+        lits = self.literals
+        found = [-2] * len(lits)  # -2: not searched yet
+
+        def find(pos: int) -> int:
+            best = -1
+            for k, lit in enumerate(lits):
+                i = found[k]
+                if -1 < i < pos or i == -2:
+                    i = found[k] = text.find(lit, pos)
+                if i >= 0 and (best < 0 or i < best):
+                    best = i
+            return best
+
+        return find
+
+
+def _usable(lits: Literals) -> bool:
+    return bool(lits) and all(lits)
+
+
+def prefilter(tree: ast.Expr, flags: str = "") -> Prefilter | None:
+    """Choose a :class:`Prefilter` for ``tree`` compiled with ``flags``.
+
+    A start-anchored pattern gets a ``"line"`` prefilter, which keeps the
+    literals every match contains to rule out line starts past their last
+    occurrence.  Otherwise returns ``None`` when no literal is known, and
+    under the ``i`` flag (folded text cannot be searched with
+    :meth:`str.find` offsets intact).
+    """
+
+    anchored = _starts_anchored(tree)
+    if "i" in flags:
+        return Prefilter("line", multiline="m" in flags) if anchored else None
+    info = analyze(tree)
+    prefix = info.prefixes if _usable(info.prefixes) else None
+    required = info.requirements if _usable(info.requirements) else None
+    if anchored:
+        return Prefilter("line", required or frozenset(), "m" in flags)
+    # A short prefix still beats a required literal: it pins the match start.
+    if prefix is not None and (
+        required is None or _score(prefix)[0] >= min(_score(required)[0], 3)
+    ):
+        return Prefilter("prefix", prefix)
+    if required is not None:
+        return Prefilter("required", required)
+    return None
+
+
+class LiteralSearcher:
+    """Leftmost-longest search for a pattern that is only literal strings.
+
+    Used instead of any automaton for patterns such as ``foo`` or
+    ``GET|POST|PUT``: occurrences are located with :meth:`str.find` and the
+    longest literal at the leftmost occurrence wins, as in the engines.
+    Under the ``i`` flag pattern and text are folded with
+    :func:`regex_lite.charset.fold_table` first.
+    """
+
+    __slots__ = ("literals", "fold", "_table", "_prefilter")
+
+    def __init__(self, literals: FrozenSet[str], fold: bool = False) -> None:
+        self.fold = fold
+        self._table = fold_table() if fold else None
+        if fold:
+            literals = frozenset(s.translate(self._table) for s in literals)
+        # Longest first, so the first hit at a position is the longest one.
+        self.literals = tuple(sorted(literals, key=lambda s: (-len(s), s)))
+        self._prefilter = Prefilter("prefix", literals)
+
+    def __repr__(self) -> str:
+        return f"LiteralSearcher({self.literals!r}, fold={self.fold!r})"
+
+    @property
+    def single(self) -> str | None:
+        """The literal when there is exactly one and no folding is needed."""
+
+        if len(self.literals) == 1 and not self.fold:
+            return self.literals[0]
+        return None
+
+    def iter_spans(self, text: str, pos: int = 0) -> Iterator[tuple[int, int]]:
+        if self._table is not None:
+            text = text.translate(self._table)
+        lit = self.single
+        if lit is not None:
+            n = len(lit)
+            while True:
+                i = text.find(lit, pos)
+                if i < 0:
+                    return
+                yield (i, i + n)
+                pos = i + n
+        find = self._prefilter.scanner(text)
+        lits = self.literals
+        while True:
+            i = find(pos)
+            if i < 0:
+                return
+            for lit in lits:
+                if text.startswith(lit, i):
+                    break
+            pos = i + len(lit)
+            yield (i, pos)
+
+
+def _literal_string(node: ast.Expr) -> str | None:
+    if isinstance(node, ast.Literal):
+        return node.char
+    if isinstance(node, ast.Concat) and all(
+        isinstance(p, ast.Literal) for p in node.parts
+    ):
+        return "".join(p.char for p in node.parts)
+    return None
+
+
+def literal_searcher(tree: ast.Expr, flags: str = "") -> LiteralSearcher | None:
+    """Return a :class:`LiteralSearcher` if ``tree`` is literals only.
+
+    That is a ``Literal``/``Concat`` string or an ``Alt`` of such strings
+    (without groups, anchors or empty branches, and at most
+    :data:`MAX_LITERALS` of them); otherwise ``None``.
+    """
+
+    options = tree.options if isinstance(tree, ast.Alt) else [tree]
+    strings = [_literal_string(o) for o in options]
+    if not all(strings) or len(strings) > MAX_LITERALS:
+        return None
+    return LiteralSearcher(frozenset(strings), "i" in flags)
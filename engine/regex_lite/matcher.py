@@ -1,251 +1,161 @@
 # regex_lite/matcher.py
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, List, Set, Tuple
+from typing import TYPE_CHECKING, Iterator, Tuple
 
-from . import parser
-from .compiler import compile as compile_nfa
+from . import backtrack, pikevm
+from . import pattern as _pattern
+from .compiler import F_ACCEPT, F_BOL, F_EOL
 
 if TYPE_CHECKING:
-    from .compiler import Edge, State
-
-
-def _is_word(ch: str) -> bool:
-    return ch.isalnum() or ch == "_"
-
-
-def _match_edge(e: "Edge", ch: str, flags: str) -> bool:
-    if "i" in flags:
-        ch_cmp = ch.lower()
-    else:
-        ch_cmp = ch
-
-    if e.kind == "char":
-        t = e.data
-        t = t.lower() if "i" in flags else t
-        return ch_cmp == t
-
-    if e.kind == "dot":
-        if "s" in flags:
-            return True
-        return ch != "\n"
-
-    if e.kind == "pred":
-        k = e.data
-        if k == "d":
-            return ch.isdigit()
-        if k == "w":
-            return _is_word(ch)
-        if k == "s":
-            return ch.isspace()
-        return False
-
-    if e.kind == "class":
-        negated, lits, ranges = e.data
-        c = ch_cmp
-        if "i" in flags:
-            lits_cmp = {t.lower() for t in lits}
-            ranges_cmp = [(a.lower(), b.lower()) for (a, b) in ranges]
-        else:
-            lits_cmp = lits
-            ranges_cmp = ranges
-        hit = (c in lits_cmp) or any(a <= c <= b for (a, b) in ranges_cmp)
-        return (not hit) if negated else hit
-
-    return False
-
-
-def _eps_closure(states: List["State"], S: Set[int]) -> Set[int]:
-    stack = list(S)
-    seen = set(S)
-    while stack:
-        u = stack.pop()
-        for v in states[u].eps:
-            if v not in seen:
-                seen.add(v)
-                stack.append(v)
-    return seen
-
-
-# --- Position-aware ε-closure: check require_bol/require_eol at current pos ---
-def _eps_closure_at(
-    states: List["State"], S: Set[int], pos: int, text: str, flags: str
-) -> Set[int]:
-    stack = list(S)
-    seen: Set[int] = set()
-    n = len(text)
-    multiline = "m" in flags
-
-    def at_bol(p: int) -> bool:
-        if p == 0:
-            return True
-        return multiline and text[p - 1] == "\n"
-
-    def at_eol(p: int) -> bool:
-        if p == n:
-            return True
-        return multiline and text[p] == "\n"
-
-    while stack:
-        u = stack.pop()
-        st = states[u]
-        # Enforce anchor checks at current position
-        if getattr(st, "require_bol", False) and not at_bol(pos):
-            continue
-        if getattr(st, "require_eol", False) and not at_eol(pos):
-            continue
-        if u in seen:
-            continue
-        seen.add(u)
-        for v in st.eps:
-            stack.append(v)
-    return seen
-
-
-# --- Single-step transition: advance along matching edges ---
-def _step(states: List["State"], S: Set[int], ch: str, flags: str) -> Set[int]:
-    out: Set[int] = set()
-    for u in S:
-        for e in states[u].edges:
-            if _match_edge(e, ch, flags):
-                out.add(e.to)
-    return out
-
-
-def _ok_eol(
-    states: List["State"], S: Set[int], pos_after: int, text: str, flags: str
-) -> bool:
-    # If any state requires end-of-line, the match end must satisfy EOL or EOF
-    n = len(text)
-    for u in S:
-        if states[u].require_eol:
-            if "m" in flags:
-                if not (pos_after == n or (pos_after < n and text[pos_after] == "\n")):
-                    return False
-            else:
-                if pos_after != n:
-                    return False
-    return True
+    from .compiler import Program
 
 
 # ---------------------------------------------------------------------------
-# Public: return only spans (legacy helper for engine unit tests)
+# Engine loops over a compiled Program (shared by Pattern and the helpers below)
 # ---------------------------------------------------------------------------
-def match(pattern: str, text: str, flags: str = "") -> list[tuple[int, int]]:
-    tree = parser.parse(pattern)
-    nfa = compile_nfa(tree)
-    spans: list[tuple[int, int]] = []
+class NeedMoreInput(Exception):
+    """Raised by the engines when ``text`` may continue and the answer depends
+    on what follows.  Positions before ``keep`` cannot start a pending match,
+    so a streaming caller may drop them before retrying with more input.
+    ``state``, when not ``None``, lets the engine continue from the end of
+    ``text`` instead (see :class:`~regex_lite.stream.StreamMatcher`).
+    """
 
-    i = 0
+    def __init__(self, keep: int, state: object = None) -> None:
+        super().__init__(keep)
+        self.keep = keep
+        self.state = state
+
+
+def _search(
+    prog: "Program",
+    text: str,
+    pos: int = 0,
+    anchored: bool = False,
+    final: bool = True,
+    earliest: bool = False,
+) -> tuple[int, int] | None:
+    """Return the leftmost-longest match at or after ``pos`` in one pass.
+
+    Instead of restarting the simulation at every offset, a new thread is
+    seeded at each position (an implicit unanchored ``.*?`` prefix) and every
+    NFA state remembers the smallest start that reached it.  Once a thread
+    accepts, later starts can no longer win: seeding stops and their threads
+    are dropped, and the scan ends when no thread with an earlier or equal
+    start is left.  Text without a match therefore costs a single pass.
+
+    With ``anchored`` only ``pos`` is seeded, so the result is the longest
+    match starting exactly there.  With ``final=False`` the text is a prefix
+    of a longer input and :class:`NeedMoreInput` is raised instead of
+    deciding at its end.  With ``earliest`` the first accepting thread ends
+    the scan: the result then only tells that some match exists (its end is
+    the smallest one, not the longest).
+    """
+
+    out = prog.out
+    classify, consumers = prog.alphabet.classify, prog.alphabet.consumers
+    state_flags, closures, closure_of = (
+        prog.state_flags,
+        prog.closures,
+        prog.closure,
+    )
+    start = prog.start
     N = len(text)
-    while i <= N:
-        # Starting ε-closure (check anchors at position i)
-        S = _eps_closure_at(nfa.states, {nfa.start}, i, text, flags)
-        j = i
-        best_j: int | None = None
-
-        # Acceptable immediately (empty match / pure anchors)
-        Sc = _eps_closure_at(nfa.states, S, j, text, flags)
-        if any(nfa.states[s].accept for s in Sc) and _ok_eol(
-            nfa.states, Sc, j, text, flags
-        ):
-            best_j = j
-
-        # Consume characters to find the longest match for this start
-        while j < N:
-            Sc = _eps_closure_at(nfa.states, S, j, text, flags)
-            S = _step(nfa.states, Sc, text[j], flags)
-            if not S:
+    stop = -1 if final else N
+    multiline = prog.multiline
+    # state -> smallest start that reaches it; insertion order is start order
+    threads: dict[int, int] = {}
+    best: tuple[int, int] | None = None
+    p = pos
+    while True:
+        if p == stop:
+            if threads or (best is None and not anchored):
+                # A thread from before the best start may still win.
+                raise NeedMoreInput(min(threads.values(), default=p))
+            return best
+        if best is None and start not in threads and (p == pos or not anchored):
+            threads[start] = p
+
+        # Anchor bits that fail at this position
+        blocked = (0 if p == 0 or (multiline and text[p - 1] == "\n") else F_BOL) | (
+            0 if p == N or (multiline and text[p] == "\n") else F_EOL
+        )
+        closure: dict[int, int] = {}
+        for u, s in threads.items():
+            states, masks = closures[u] or closure_of(u)
+            if masks is None:
+                for v in states:
+                    if v not in closure:
+                        closure[v] = s
+            else:
+                for v, m in zip(states, masks):
+                    if not m & blocked and v not in closure:
+                        closure[v] = s
+
+        for v, s in closure.items():
+            if state_flags[v] & F_ACCEPT:
+                # Threads are ordered by start, so this is the leftmost one;
+                # for an equal start a later position is a longer match.
+                best = (s, p)
+                if earliest:
+                    return best
+                closure = {u: t for u, t in closure.items() if t <= s}
                 break
-            j += 1
-            Sc2 = _eps_closure_at(nfa.states, S, j, text, flags)
-            if any(nfa.states[s].accept for s in Sc2) and _ok_eol(
-                nfa.states, Sc2, j, text, flags
-            ):
-                best_j = j
 
-        if best_j is not None:
-            spans.append((i, best_j))
-            # Non-overlapping: advance at least 1 if zero-length
-            i = best_j if best_j > i else i + 1
-        else:
-            i += 1
+        if p == N or (not closure and (best is not None or anchored)):
+            return best
 
-    return spans
+        # The states whose edge accepts this character's class.
+        movers = consumers(classify(ord(text[p])))
+        threads = {}
+        for u, s in closure.items():
+            if u in movers:
+                t = out[u]
+                if t not in threads:
+                    threads[t] = s
+        p += 1
+
+
+def _captures(
+    prog: "Program", text: str, start: int, end: int, ngroups: int
+) -> list[tuple[int, int] | None] | None:
+    """Return the group spans of the preferred path matching ``text[start:end]``.
+
+    Short spans go to the bounded backtracker (:mod:`regex_lite.backtrack`)
+    when its visited table fits :data:`~regex_lite.backtrack.BUDGET`, longer
+    ones to the Pike VM; both report the same groups.
+    """
+
+    if backtrack.fits(prog, start, end):
+        return backtrack.captures(prog, text, start, end, ngroups)
+    return pikevm.captures(prog, text, start, end, ngroups)
+
+
+def _iter_spans(prog: "Program", text: str, pos: int = 0) -> Iterator[tuple[int, int]]:
+    N = len(text)
+    while pos <= N:
+        span = _search(prog, text, pos)
+        if span is None:
+            return
+        yield span
+        start, end = span
+        # Non-overlapping: advance at least 1 if zero-length
+        pos = end if end > start else end + 1
+
+
+# ---------------------------------------------------------------------------
+# Public: return only spans (legacy helper for engine unit tests)
+# ---------------------------------------------------------------------------
+def match(pattern: str, text: str, flags: str = "") -> list[tuple[int, int]]:
+    return _pattern.compile(pattern, flags).spans(text)
 
 
 # ---------------------------------------------------------------------------
 # Public: return spans + groups (for API, closer to "re" style)
 # ---------------------------------------------------------------------------
 def match_with_groups(pattern: str, text: str, flags: str = "") -> list[dict]:
-    tree = parser.parse(pattern)
-    nfa = compile_nfa(tree)
-    out: list[dict] = []
-
-    i = 0
-    N = len(text)
-    while i <= N:
-        S = _eps_closure_at(nfa.states, {nfa.start}, i, text, flags)
-        j = i
-
-        # Track the longest match (greedy) and its groups for this start
-        best_j: int | None = None
-        group_starts: dict[int, int] = {}
-        group_spans: dict[int, tuple[int, int]] = {}
-        best_groups: dict[int, tuple[int, int]] | None = None
-
-        def apply_group_hooks(state_set: set[int], pos: int):
-            # Record group start/end based on enter/exit hooks on states
-            for s in state_set:
-                st = nfa.states[s]
-                for g in st.enter_groups:
-                    group_starts[g] = pos
-                for g in st.exit_groups:
-                    st_pos = group_starts.get(g)
-                    if st_pos is not None:
-                        group_spans[g] = (st_pos, pos)
-
-        # Apply hooks on initial closure
-        Sc = _eps_closure_at(nfa.states, S, j, text, flags)
-        apply_group_hooks(Sc, j)
-        if any(nfa.states[s].accept for s in Sc) and _ok_eol(
-            nfa.states, Sc, j, text, flags
-        ):
-            best_j = j
-            best_groups = dict(group_spans)
-
-        # Consume characters to find the longest match and capture groups
-        while j < N:
-            Sc = _eps_closure_at(nfa.states, S, j, text, flags)
-            S = _step(nfa.states, Sc, text[j], flags)
-            if not S:
-                break
-            j += 1
-            Sc2 = _eps_closure_at(nfa.states, S, j, text, flags)
-            apply_group_hooks(Sc2, j)
-            if any(nfa.states[s].accept for s in Sc2) and _ok_eol(
-                nfa.states, Sc2, j, text, flags
-            ):
-                best_j = j
-                best_groups = dict(group_spans)
-
-        if best_j is not None:
-            # Normalize groups: fill 1..max_idx, use None for missing
-            groups_norm: list[tuple[int, int] | None] = []
-            if best_groups:
-                max_idx = max(best_groups)
-                groups_norm = [None] * max_idx
-                for k, span in best_groups.items():
-                    if k >= 1:
-                        if k > len(groups_norm):
-                            groups_norm.extend([None] * (k - len(groups_norm)))
-                        groups_norm[k - 1] = span
-            out.append({"span": (i, best_j), "groups": groups_norm})
-            i = best_j if best_j > i else i + 1
-        else:
-            i += 1
-
-    return out
+    return [m.describe() for m in _pattern.compile(pattern, flags).finditer(text)]
 
 
 def match_spans(pattern: str, text: str, flags: str = "") -> list[tuple[int, int]]:
@@ -254,43 +164,45 @@ def match_spans(pattern: str, text: str, flags: str = "") -> list[tuple[int, int
     return match(pattern, text, flags)
 
 
-def replace(pattern: str, flags: str, text: str, repl: str) -> Tuple[str, int]:
-    """
-    Replace all matches of pattern in text with repl string.
-    Returns tuple of (result_text, count_of_replacements).
-    Note: Does not support backreferences in replacement string yet.
-    """
-    spans = match_spans(pattern, text, flags)
+def is_match(pattern: str, text: str, flags: str = "") -> bool:
+    """Return whether ``pattern`` matches anywhere in ``text``."""
+
+    return _pattern.compile(pattern, flags).is_match(text)
+
 
-    if not spans:
-        # If no matches, return original text and zero replacements
-        return text, 0
+def count(pattern: str, text: str, flags: str = "") -> int:
+    """Return the number of non-overlapping matches of ``pattern`` in ``text``."""
 
-    # Build result by replacing matches from right to left
-    # (avoids offset adjustments)
-    result = text
-    count = len(spans)
+    return _pattern.compile(pattern, flags).count(text)
 
-    for start, end in reversed(spans):
-        result = result[:start] + repl + result[end:]
 
-    return result, count
+def replace(
+    pattern: str, flags: str, text: str, repl: str, count: int = 0
+) -> Tuple[str, int]:
+    """
+    Replace matches of pattern in text with repl string.
+    Returns tuple of (result_text, count_of_replacements).
+    repl may refer to groups as \\1 or \\g<1>; a positive count limits
+    the number of replacements and a negative one allows none, as in re.
+    """
+    return _pattern.compile(pattern, flags).subn(repl, text, count)
 
 
-def split(pattern: str, text: str, flags: str = "") -> list[str]:
-    """Split text by matches of pattern; return list of substrings between matches."""
+def split(
+    pattern: str, text: str, flags: str = "", maxsplit: int = 0
+) -> list[str | None]:
+    """Split text by matches of pattern; return list of substrings between matches.
 
-    spans = match_spans(pattern, text, flags)
+    Captured groups are returned between the substrings and a positive
+    ``maxsplit`` bounds the number of splits, as in :func:`re.split`.
+    """
 
-    if not spans:
-        return [text]
+    return _pattern.compile(pattern, flags).split(text, maxsplit)
 
-    pieces: list[str] = []
-    last_end = 0
 
-    for start, end in spans:
-        pieces.append(text[last_end:start])
-        last_end = end
+def splititer(
+    pattern: str, text: str, flags: str = "", maxsplit: int = 0
+) -> Iterator[str | None]:
+    """Like :func:`split`, yielding the pieces as the matches are found."""
 
-    pieces.append(text[last_end:])
-    return pieces
+    return _pattern.compile(pattern, flags).splititer(text, maxsplit)
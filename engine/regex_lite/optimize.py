@@ -0,0 +1,306 @@
+"""Rewrites of the parsed tree before it is compiled.
+
+:func:`optimize` returns an equivalent tree that compiles to fewer NFA
+states and epsilon edges.  Every rewrite keeps the match spans and the
+capture groups of the original tree, and alternatives keep their priority
+order.  Rewrites are named (:data:`REWRITES`) and can be enabled one by one:
+
+* ``"flatten"``: splice nested ``Concat``/``Alt`` nodes into their parent and
+  unwrap single-item ones;
+* ``"drop_empty"``: remove ``Empty`` parts of a concatenation (an empty
+  group ``()`` stays, it still captures);
+* ``"repeats"``: ``x{1}`` becomes ``x``, and the nullable body of a star
+  loses its own quantifier (``(x*)*`` becomes ``(x+)*``, ``(x?)*`` becomes
+  ``(x)*``), which removes the nested empty loop, unless that quantifier
+  repeats a group that may match the empty string;
+* ``"factor_prefix"``: adjacent alternatives starting with the same
+  group-free items share them (``ab|ac`` becomes ``a(?:b|c)``);
+* ``"char_class"``: adjacent single-character alternatives become one class
+  (``a|b|\\d`` becomes ``[ab\\d]``);
+* ``"merge_literals"``: adjacent literals become one :class:`~ast.String`,
+  compiled as a chain of character edges.
+
+:func:`dump` renders a tree one node per line and :func:`explain` shows a
+pattern before and after optimization.
+"""
+
+from __future__ import annotations
+
+from dataclasses import replace
+from typing import Iterable, List
+
+from . import ast, parser
+
+#: Names of the available rewrites, in the order they are applied.
+REWRITES = (
+    "flatten",
+    "drop_empty",
+    "repeats",
+    "factor_prefix",
+    "char_class",
+    "merge_literals",
+)
+
+# Single-character atoms that can be items of a non-negated class.
+_ATOMS = (ast.Literal, ast.Shorthand)
+
+
+def optimize(tree: ast.Expr, rewrites: Iterable[str] = REWRITES) -> ast.Expr:
+    """Return ``tree`` with the named ``rewrites`` applied until stable."""
+
+    enabled = frozenset(rewrites)
+    unknown = enabled.difference(REWRITES)
+    if unknown:
+        raise ValueError(f"unknown rewrites: {', '.join(sorted(unknown))}")
+    while True:
+        new = _rewrite(tree, enabled)
+        if new == tree:
+            return new
+        tree = new
+
+
+def _rewrite(node: ast.Expr, enabled: frozenset[str]) -> ast.Expr:
+    if isinstance(node, ast.Group):
+        return replace(node, expr=_rewrite(node.expr, enabled))
+    if isinstance(node, ast.Repeat):
+        return _repeat(replace(node, expr=_rewrite(node.expr, enabled)), enabled)
+    if isinstance(node, ast.Concat):
+        return _concat([_rewrite(p, enabled) for p in node.parts], enabled)
+    if isinstance(node, ast.Alt):
+        return _alt([_rewrite(o, enabled) for o in node.options], enabled)
+    return node
+
+
+def _has_group(node: ast.Expr) -> bool:
+    if isinstance(node, ast.Group):
+        return True
+    if isinstance(node, ast.Repeat):
+        return _has_group(node.expr)
+    if isinstance(node, ast.Concat):
+        return any(_has_group(p) for p in node.parts)
+    if isinstance(node, ast.Alt):
+        return any(_has_group(o) for o in node.options)
+    return False
+
+
+def _nullable(node: ast.Expr) -> bool:
+    if isinstance(node, (ast.Empty, ast.AnchorStart, ast.AnchorEnd)):
+        return True
+    if isinstance(node, ast.String):
+        return not node.text
+    if isinstance(node, ast.Group):
+        return _nullable(node.expr)
+    if isinstance(node, ast.Repeat):
+        if node.kind in ("*", "?") or (node.kind.startswith("{") and not node.m):
+            return True
+        return _nullable(node.expr)
+    if isinstance(node, ast.Concat):
+        return all(_nullable(p) for p in node.parts)
+    if isinstance(node, ast.Alt):
+        return any(_nullable(o) for o in node.options)
+    return False
+
+
+def _has_empty_group(node: ast.Expr) -> bool:
+    # Whether a capture group inside ``node`` may match the empty string.
+    if isinstance(node, ast.Group):
+        return _nullable(node.expr) or _has_empty_group(node.expr)
+    if isinstance(node, ast.Repeat):
+        return _has_empty_group(node.expr)
+    if isinstance(node, ast.Concat):
+        return any(_has_empty_group(p) for p in node.parts)
+    if isinstance(node, ast.Alt):
+        return any(_has_empty_group(o) for o in node.options)
+    return False
+
+
+def _repeat(node: ast.Repeat, enabled: frozenset[str]) -> ast.Expr:
+    if "repeats" not in enabled:
+        return node
+    if node.kind.startswith("{") and (node.m, node.n) == (1, 1):
+        return node.expr
+    if node.kind == "*" and not node.lazy:
+        # A star never repeats an empty iteration, so the nullable body of
+        # (x*)* or (x?)* can be made non-nullable: (x+)*, (x)*.
+        expr = _non_nullable(node.expr)
+        if expr is not None:
+            return replace(node, expr=expr)
+    return node
+
+
+def _non_nullable(node: ast.Expr) -> ast.Expr | None:
+    if isinstance(node, ast.Group):
+        expr = _non_nullable(node.expr)
+        return replace(node, expr=expr) if expr is not None else None
+    if isinstance(node, ast.Repeat) and not node.lazy:
+        if _has_empty_group(node.expr):
+            # Dropping the empty iteration would change what such a group
+            # reports, e.g. group 4 of (((ab|a)|(b*)|x(b*))*)* on "xx".
+            return None
+        if node.kind == "*":
+            return replace(node, kind="+")
+        if node.kind == "?":
+            return node.expr
+    return None
+
+
+def _concat(parts: List[ast.Expr], enabled: frozenset[str]) -> ast.Expr:
+    if "flatten" in enabled:
+        parts = [
+            q for p in parts for q in (p.parts if isinstance(p, ast.Concat) else [p])
+        ]
+    if "drop_empty" in enabled:
+        parts = [p for p in parts if not isinstance(p, ast.Empty)]
+        if not parts:
+            return ast.Empty()
+    if "merge_literals" in enabled:
+        parts = _merge_literals(parts)
+    if "flatten" in enabled and len(parts) == 1:
+        return parts[0]
+    return ast.Concat(parts)
+
+
+def _merge_literals(parts: List[ast.Expr]) -> List[ast.Expr]:
+    merged: List[ast.Expr] = []
+    for p in parts:
+        if isinstance(p, ast.Literal):
+            p = ast.String(p.char)
+        if isinstance(p, ast.String) and merged and isinstance(merged[-1], ast.String):
+            merged[-1] = ast.String(merged[-1].text + p.text)
+        else:
+            merged.append(p)
+    return [
+        ast.Literal(p.text) if isinstance(p, ast.String) and len(p.text) == 1 else p
+        for p in merged
+    ]
+
+
+def _alt(options: List[ast.Expr], enabled: frozenset[str]) -> ast.Expr:
+    if "flatten" in enabled:
+        options = [
+            q for o in options for q in (o.options if isinstance(o, ast.Alt) else [o])
+        ]
+    if "factor_prefix" in enabled:
+        options = _factor_prefix(options, enabled)
+    if "char_class" in enabled:
+        options = _char_classes(options)
+    if "flatten" in enabled and len(options) == 1:
+        return options[0]
+    return ast.Alt(options)
+
+
+def _sequence(node: ast.Expr) -> List[ast.Expr]:
+    # The items of an alternative as a concatenation, strings split up.
+    parts = node.parts if isinstance(node, ast.Concat) else [node]
+    return [
+        q
+        for p in parts
+        if not isinstance(p, ast.Empty)
+        for q in (
+            [ast.Literal(c) for c in p.text] if isinstance(p, ast.String) else [p]
+        )
+    ]
+
+
+def _common_prefix(a: List[ast.Expr], b: List[ast.Expr]) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y or _has_group(x):
+            break
+        n += 1
+    return n
+
+
+def _factor_prefix(options: List[ast.Expr], enabled: frozenset[str]) -> List[ast.Expr]:
+    out: List[ast.Expr] = []
+    i = 0
+    while i < len(options):
+        head = _sequence(options[i])
+        # Longest run of following options sharing a prefix with this one.
+        j, n = i + 1, len(head)
+        while j < len(options):
+            k = _common_prefix(head[:n], _sequence(options[j]))
+            if not k:
+                break
+            j, n = j + 1, k
+        if j - i < 2:
+            out.append(options[i])
+            i += 1
+            continue
+        rests = [
+            _concat(_sequence(o)[n:], enabled) if len(_sequence(o)) > n else ast.Empty()
+            for o in options[i:j]
+        ]
+        out.append(_concat([*head[:n], _alt(rests, enabled)], enabled))
+        i = j
+    return out
+
+
+def _class_items(node: ast.Expr) -> list | None:
+    if isinstance(node, _ATOMS):
+        return [node]
+    if isinstance(node, ast.CharClass) and not node.negated:
+        return list(node.items)
+    return None
+
+
+def _char_classes(options: List[ast.Expr]) -> List[ast.Expr]:
+    out: List[ast.Expr] = []
+    run: List[ast.Expr] = []  # current run of single-character options
+    for o in [*options, None]:
+        if o is not None and _class_items(o) is not None:
+            run.append(o)
+            continue
+        if len(run) > 1:
+            out.append(ast.CharClass([it for r in run for it in _class_items(r)]))
+        else:
+            out.extend(run)
+        run = []
+        if o is not None:
+            out.append(o)
+    return out
+
+
+def dump(node: ast.Expr, indent: int = 0) -> str:
+    """Return ``node`` as an indented tree, one node per line."""
+
+    pad = "  " * indent
+    name = type(node).__name__
+    if isinstance(node, ast.Literal):
+        return f"{pad}{name} {node.char!r}"
+    if isinstance(node, ast.String):
+        return f"{pad}{name} {node.text!r}"
+    if isinstance(node, ast.Shorthand):
+        return f"{pad}{name} \\{node.kind}"
+    if isinstance(node, ast.CharClass):
+        items = ", ".join(_item_repr(it) for it in node.items)
+        return f"{pad}{name}{' negated' if node.negated else ''} [{items}]"
+    if isinstance(node, ast.Group):
+        return f"{pad}{name} {node.index}\n{dump(node.expr, indent + 1)}"
+    if isinstance(node, ast.Repeat):
+        kind = node.kind
+        if kind.startswith("{"):
+            kind = kind.replace("m", str(node.m)).replace("n", str(node.n))
+        head = f"{pad}{name} {kind}{' lazy' if node.lazy else ''}"
+        return f"{head}\n{dump(node.expr, indent + 1)}"
+    children = (
+        node.parts
+        if isinstance(node, ast.Concat)
+        else node.options if isinstance(node, ast.Alt) else []
+    )
+    return "\n".join([f"{pad}{name}", *(dump(c, indent + 1) for c in children)])
+
+
+def _item_repr(item) -> str:
+    if isinstance(item, ast.Range):
+        return f"{item.start!r}-{item.end!r}"
+    if isinstance(item, ast.Shorthand):
+        return f"\\{item.kind}"
+    return repr(item.char)
+
+
+def explain(pattern: str, rewrites: Iterable[str] = REWRITES) -> str:
+    """Return the dumps of ``pattern``'s tree before and after :func:`optimize`."""
+
+    tree = parser.parse(pattern)
+    return f"before:\n{dump(tree, 1)}\nafter:\n{dump(optimize(tree, rewrites), 1)}"
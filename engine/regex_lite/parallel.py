@@ -0,0 +1,166 @@
+"""Searching one large input with a pool of worker processes.
+
+The input is cut into chunks that end just after a newline.  Each chunk is
+searched in a worker of a :class:`~concurrent.futures.ProcessPoolExecutor`,
+which receives the compiled pattern once (pickled when the pool starts; the
+lazy DFA travels without its cache) instead of re-parsing it.
+
+This only gives the serial answer when no match can contain a newline: a
+match then lies within one line, so a chunk's matches are found from the
+chunk alone, and non-overlapping leftmost matches restart cleanly at every
+line start.  One character of context on each side of a chunk keeps ``^``
+and ``$`` decided as in the whole text.  Patterns that may consume a
+newline (``.`` under ``s``, ``\\s``, ``[^x]``, ...) are searched serially.
+
+A :class:`str` is searched as text.  A path (:class:`os.PathLike`) is
+memory-mapped and searched as UTF-8 by the pattern's
+:class:`~regex_lite.binary.BytesPattern` (:func:`utf8_pattern`, compiled
+once per pattern); workers map the file themselves,
+so only chunk boundaries and spans cross process boundaries, and spans are
+byte offsets.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Union
+
+from . import binary
+
+if TYPE_CHECKING:
+    from .compiler import Program
+    from .pattern import Pattern
+
+#: Default number of characters (or bytes) per chunk.
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+Source = Union[str, "os.PathLike[str]"]
+
+# Pattern installed in each worker process by ``_init_worker``.
+_worker_pattern: "Pattern | None" = None
+
+
+def line_local(prog: "Program") -> bool:
+    """Return whether no consuming edge of ``prog`` accepts a newline."""
+
+    return not any(prog.matches(s, "\n") for s in range(len(prog)))
+
+
+def utf8_pattern(pattern: "Pattern") -> "binary.BytesPattern":
+    """Return ``pattern`` compiled to match UTF-8 bytes.
+
+    The byte pattern is built on the first call and kept on ``pattern``;
+    a :class:`~regex_lite.binary.BytesPattern` is returned as is.
+    """
+
+    if isinstance(pattern, binary.BytesPattern):
+        return pattern
+    bpat = getattr(pattern, "_utf8_bytes", None)
+    if bpat is None:
+        bpat = pattern._utf8_bytes = binary.BytesPattern(
+            pattern.pattern, pattern.flags, True, pattern.engine
+        )
+    return bpat
+
+
+def _boundaries(n: int, chunk_size: int, find_newline) -> list[int]:
+    """Return chunk starts (and ``n``), each just after a newline."""
+
+    bounds = [0]
+    while True:
+        nl = find_newline(bounds[-1] + chunk_size)
+        if nl < 0 or nl + 1 >= n:
+            break
+        bounds.append(nl + 1)
+    bounds.append(n)
+    return bounds
+
+
+def _init_worker(pattern: "Pattern") -> None:
+    global _worker_pattern
+    _worker_pattern = pattern
+
+
+def _chunk_spans(text, lo: int, hi: int, offset: int) -> list[tuple[int, int]]:
+    # ``text`` holds the chunk ``[lo, hi)`` plus context; report the matches
+    # that start inside the chunk, shifted by ``offset``.  The last chunk
+    # passes ``hi = len(text) + 1`` to keep an empty match at the very end.
+    spans = []
+    for start, end in _worker_pattern._iter_spans(text, lo):
+        if start >= hi:
+            break
+        spans.append((start + offset, end + offset))
+    return spans
+
+
+def _scan_file(path: str, a: int, b: int) -> list[tuple[int, int]]:
+    with (
+        open(path, "rb") as fp,
+        mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+    ):
+        ctx_lo = max(a - 1, 0)
+        view = memoryview(mm)[ctx_lo : b + 1]
+        hi = b - ctx_lo + (b == len(mm))
+        try:
+            return _chunk_spans(view, a - ctx_lo, hi, ctx_lo)
+        finally:
+            view.release()
+
+
+def _run(
+    pattern: "Pattern", workers: int | None, mp_context, fn, jobs: list[tuple]
+) -> list:
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp_context,
+        initializer=_init_worker,
+        initargs=(pattern,),
+    ) as pool:
+        results = pool.map(fn, *zip(*jobs))
+        return [span for spans in results for span in spans]
+
+
+def findall_parallel(
+    pattern: "Pattern",
+    source: Source,
+    workers: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    mp_context=None,
+) -> list[tuple[int, int]]:
+    """Return the spans of ``pattern`` in ``source``, searched in parallel.
+
+    The result equals :meth:`Pattern.spans` on the text (or
+    :meth:`BytesPattern.spans` on the mapped file).  Inputs that fit in one
+    chunk, ``workers == 1`` and patterns that are not :func:`line_local` are
+    searched in this process.  ``mp_context`` is passed to the
+    :class:`~concurrent.futures.ProcessPoolExecutor` (the platform's start
+    method by default).
+    """
+
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be >= 1")
+    if isinstance(source, str):
+        text = source
+        bounds = _boundaries(len(text), chunk_size, lambda i: text.find("\n", i))
+        if len(bounds) <= 2 or workers == 1 or not line_local(pattern.prog):
+            return pattern.spans(text)
+        jobs = []
+        for a, b in zip(bounds, bounds[1:]):
+            ctx_lo = max(a - 1, 0)
+            hi = b - ctx_lo + (b == len(text))
+            jobs.append((text[ctx_lo : b + 1], a - ctx_lo, hi, ctx_lo))
+        return _run(pattern, workers, mp_context, _chunk_spans, jobs)
+
+    path = os.fspath(source)
+    bpat = utf8_pattern(pattern)
+    with open(path, "rb") as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return bpat.spans(b"")
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            bounds = _boundaries(len(mm), chunk_size, lambda i: mm.find(b"\n", i))
+            if len(bounds) <= 2 or workers == 1 or not line_local(bpat.prog):
+                return bpat.spans(mm)
+    jobs = [(path, a, b) for a, b in zip(bounds, bounds[1:])]
+    return _run(bpat, workers, mp_context, _scan_file, jobs)
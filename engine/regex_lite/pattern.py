@@ -0,0 +1,661 @@
+"""Compiled :class:`Pattern` objects and the process-wide compile cache."""
+
+from __future__ import annotations
+
+import functools
+import threading
+from array import array
+from collections import OrderedDict
+from typing import IO, Callable, Iterable, Iterator, NamedTuple, Sequence
+
+from . import (
+    ast,
+    batch,
+    fulldfa,
+    literals,
+    matcher,
+    optimize,
+    parallel,
+    parser,
+    serialize,
+    stream,
+    template,
+)
+from .compiler import Program
+from .compiler import compile as compile_nfa
+from .dfa import DEFAULT_CACHE_BYTES, DFAGaveUp, LazyDFA
+
+_FLAG_CHARS = "ims"
+
+#: Engine names accepted by :class:`Pattern` and :func:`compile`.
+#: ``"auto"`` answers span-only queries with the lazy DFA and falls back to
+#: NFA simulation when captures are needed; patterns that are only literals
+#: bypass the automaton (see :class:`~regex_lite.literals.LiteralSearcher`).
+#: ``"dfa"`` and ``"nfa"`` force one generic engine for span queries (useful
+#: for testing and benchmarking).
+ENGINES = ("auto", "dfa", "nfa")
+
+
+def _normalize_flags(flags: str) -> str:
+    """Return the supported flags of ``flags`` in canonical ``"ims"`` order.
+
+    Unknown flag characters are ignored, matching the matcher's historic
+    behavior (``"g"`` is accepted and means nothing).
+    """
+
+    return "".join(ch for ch in _FLAG_CHARS if ch in flags)
+
+
+def _count_groups(node: ast.Expr) -> int:
+    """Return the highest capturing group index used in ``node``."""
+
+    if isinstance(node, ast.Group):
+        return max(node.index, _count_groups(node.expr))
+    if isinstance(node, ast.Repeat):
+        return _count_groups(node.expr)
+    if isinstance(node, ast.Concat):
+        return max((_count_groups(p) for p in node.parts), default=0)
+    if isinstance(node, ast.Alt):
+        return max((_count_groups(o) for o in node.options), default=0)
+    return 0
+
+
+class Match:
+    """One match of a :class:`Pattern` in ``string``.
+
+    :meth:`span`, :meth:`start`, :meth:`end` and :meth:`group` take a group
+    number, ``0`` (the default) meaning the whole match.  A group that did
+    not take part in the match has span ``None`` and text ``None``.
+    ``pos`` is the offset of ``string[0]``: streamed matches keep only the
+    matched text, with offsets counted from the start of the stream.
+    """
+
+    __slots__ = ("string", "pos", "_span", "_groups")
+
+    def __init__(
+        self,
+        string: str,
+        span: tuple[int, int],
+        groups: list[tuple[int, int] | None],
+        pos: int = 0,
+    ) -> None:
+        self.string = string
+        self.pos = pos
+        self._span = span
+        self._groups = groups
+
+    def span(self, group: int = 0) -> tuple[int, int] | None:
+        """Return ``(start, end)`` of ``group``."""
+
+        if group == 0:
+            return self._span
+        if not 0 < group <= len(self._groups):
+            raise IndexError(f"no such group: {group}")
+        return self._groups[group - 1]
+
+    def start(self, group: int = 0) -> int:
+        """Return the start of ``group``, ``-1`` if it did not take part."""
+
+        span = self.span(group)
+        return span[0] if span is not None else -1
+
+    def end(self, group: int = 0) -> int:
+        """Return the end of ``group``, ``-1`` if it did not take part."""
+
+        span = self.span(group)
+        return span[1] if span is not None else -1
+
+    def group(self, group: int = 0) -> str | None:
+        """Return the text matched by ``group``."""
+
+        span = self.span(group)
+        if span is None:
+            return None
+        return self.string[span[0] - self.pos : span[1] - self.pos]
+
+    def groups(self) -> tuple[str | None, ...]:
+        """Return the text of every group, in order."""
+
+        return tuple(self.group(g) for g in range(1, len(self._groups) + 1))
+
+    def describe(self) -> dict:
+        """Return ``{"span": ..., "groups": [...]}`` (used by the API)."""
+
+        return {"span": self._span, "groups": list(self._groups)}
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Match):
+            return NotImplemented
+        return (self._span, self._groups, self.string, self.pos) == (
+            other._span,
+            other._groups,
+            other.string,
+            other.pos,
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"<Match span={self._span!r} groups={self._groups!r}>"
+
+
+class Pattern:
+    """A regular expression compiled once and reusable across many texts.
+
+    Instances are normally obtained through :func:`compile`, which consults
+    the process-wide :data:`cache` so that repeated compilations of the same
+    pattern and flags share the parsed tree and compiled program.
+
+    ``engine`` selects how span-only queries (:meth:`spans`, :meth:`sub`,
+    :meth:`split`) run, see :data:`ENGINES`; ``dfa_cache_bytes`` bounds the
+    memory used by the lazy DFA's state cache, and ``max_states`` the number
+    of NFA states a pattern may compile to (default
+    :data:`regex_lite.compiler.MAX_STATES`) before it is rejected with
+    :class:`~regex_lite.parser.RegexSyntaxError`.  ``rewrites`` names the
+    :mod:`~regex_lite.optimize` rewrites applied to the tree before it is
+    compiled (all of them by default).
+
+    ``prefilter`` is the literal scan chosen for the pattern (see
+    :mod:`regex_lite.literals`), or ``None`` when every search runs the
+    automaton over the whole text.  ``literal`` is the searcher used instead
+    of the automaton for literal-only patterns under ``engine="auto"``.
+    """
+
+    def __init__(
+        self,
+        pattern: str,
+        flags: str = "",
+        engine: str = "auto",
+        dfa_cache_bytes: int = DEFAULT_CACHE_BYTES,
+        max_states: int | None = None,
+        rewrites: Iterable[str] = optimize.REWRITES,
+    ) -> None:
+        if engine not in ENGINES:
+            raise ValueError(f"unknown engine {engine!r}; expected one of {ENGINES}")
+        self.pattern = pattern
+        self.flags = _normalize_flags(flags)
+        self.engine = engine
+        self.tree = parser.parse(pattern)
+        nfa = compile_nfa(optimize.optimize(self.tree, rewrites), max_states)
+        # Only the flat tables are kept; the State/Edge graph is dropped.
+        self.prog = Program(nfa, self.flags)
+        self.groups = _count_groups(self.tree)
+        self.prefilter = literals.prefilter(self.tree, self.flags)
+        self.literal = (
+            literals.literal_searcher(self.tree, self.flags)
+            if engine == "auto"
+            else None
+        )
+        self.dfa = LazyDFA(self.prog, dfa_cache_bytes) if engine != "nfa" else None
+        self.full_dfa: fulldfa.FullDFA | None = None
+        # The pattern compiled for UTF-8 bytes, built on first use by
+        # parallel.utf8_pattern.
+        self._utf8_bytes = None
+
+    def __repr__(self) -> str:
+        return f"Pattern({self.pattern!r}, flags={self.flags!r})"
+
+    def __getstate__(self) -> dict:
+        # Pickles (and dumps) carry what matching reads: the program, the
+        # prefilter and literal searcher, the group count and any full DFA.
+        # The parsed tree is rebuilt by ``tree`` if it is needed again, the
+        # UTF-8 byte pattern by parallel.utf8_pattern.
+        state = self.__dict__.copy()
+        state.pop("tree", None)
+        state["_utf8_bytes"] = None
+        return state
+
+    @functools.cached_property
+    def tree(self) -> ast.Expr:
+        """The parsed pattern (reparsed on first use by an unpickled copy)."""
+
+        return parser.parse(self.pattern)
+
+    # ------------------------------------------------------------------
+    def _iter_spans(self, text: str, pos: int = 0) -> Iterator[tuple[int, int]]:
+        if self.literal is not None:
+            return self.literal.iter_spans(text, pos)
+        if self.prefilter is not None:
+            return self._iter_filtered(text, pos)
+        if self.full_dfa is not None:
+            return self.full_dfa.iter_spans(text, pos)
+        if self.dfa is not None:
+            return self.dfa.iter_spans(text, pos)
+        return matcher._iter_spans(self.prog, text, pos)
+
+    def _iter_filtered(self, text: str, pos: int) -> Iterator[tuple[int, int]]:
+        # The prefilter only decides where the automaton starts.  Matches of
+        # a start-anchored pattern ("line") begin at a line start, so it runs
+        # anchored at each candidate line start only.  Otherwise one
+        # unanchored search runs from the first candidate (a prefix
+        # occurrence), or from pos if a required literal occurs at all, so a
+        # text full of candidates but without a match is still read once.
+        find = self.prefilter.scanner(text)
+        kind = self.prefilter.kind
+        N = len(text)
+        if kind == "line":
+            while pos <= N:
+                i = find(pos)
+                if i < 0:
+                    return
+                end = self._longest_at(text, i)
+                if end is None:
+                    pos = i + 1
+                    continue
+                yield i, end
+                pos = end if end > i else end + 1
+            return
+        if self.full_dfa is not None:
+            i = find(pos)
+            if i >= 0:
+                yield from self.full_dfa.iter_spans(
+                    text, pos if kind == "required" else i
+                )
+            return
+        dfa = self.dfa
+        while pos <= N:
+            i = find(pos)
+            if i < 0:
+                return
+            if kind != "required":
+                pos = i
+            try:
+                span = (
+                    dfa.search(text, pos)
+                    if dfa is not None
+                    else matcher._search(self.prog, text, pos)
+                )
+            except DFAGaveUp:
+                dfa = None
+                continue
+            if span is None:
+                return
+            yield span
+            start, end = span
+            pos = end if end > start else end + 1
+
+    def to_dfa(
+        self, minimize: bool = True, max_states: int = fulldfa.DEFAULT_MAX_STATES
+    ) -> fulldfa.FullDFA | None:
+        """Build the whole DFA now and use it for span queries from then on.
+
+        This trades compile time for the fastest scans: states are built by
+        subset construction over character classes, merged by Hopcroft's
+        algorithm when ``minimize`` is true, and stored in a dense table; a
+        second DFA for the reversed pattern locates match starts (see
+        :mod:`regex_lite.fulldfa`).  If more than ``max_states`` states
+        are needed, nothing changes and ``None`` is returned; the pattern
+        keeps using the lazy DFA or NFA simulation.
+        """
+
+        tree = optimize.optimize(fulldfa.reverse_tree(self.tree))
+        reverse = Program(compile_nfa(tree), self.prog.flags)
+        try:
+            self.full_dfa = fulldfa.FullDFA(self.prog, minimize, max_states, reverse)
+        except fulldfa.DFATooLarge:
+            return None
+        return self.full_dfa
+
+    def dumps(self) -> bytes:
+        """Return this pattern compiled, for :func:`regex_lite.loads`.
+
+        See :mod:`regex_lite.serialize`; a full DFA built by :meth:`to_dfa`
+        is included.
+        """
+
+        return serialize.dumps(self)
+
+    def is_match(self, text: str, pos: int = 0) -> bool:
+        """Return whether any match starts at or after ``pos``.
+
+        The scan stops at the first accepting position and never extends a
+        match for greediness; no span or group is computed.
+        """
+
+        if pos > len(text):
+            return False
+        if self.literal is not None:
+            return next(self.literal.iter_spans(text, pos), None) is not None
+        if self.prefilter is not None:
+            if self.prefilter.scanner(text)(pos) < 0:
+                return False
+            if self.prefilter.kind == "line":
+                # Few candidate starts: try each rather than scan the text.
+                return next(self._iter_filtered(text, pos), None) is not None
+        dfa = self.full_dfa or self.dfa
+        if dfa is not None:
+            try:
+                return dfa.earliest_end(text, pos) is not None
+            except DFAGaveUp:
+                pass
+        return matcher._search(self.prog, text, pos, earliest=True) is not None
+
+    def count(self, text: str) -> int:
+        """Return the number of matches :meth:`spans` would return."""
+
+        lit = self.literal.single if self.literal is not None else None
+        if lit is not None:
+            return text.count(lit)
+        return sum(1 for _ in self._iter_spans(text))
+
+    def spans(self, text: str) -> list[tuple[int, int]]:
+        """Return the spans of all non-overlapping matches in ``text``."""
+
+        return list(self._iter_spans(text))
+
+    def _iter_groups(
+        self, text: str, pos: int = 0
+    ) -> Iterator[tuple[tuple[int, int], list]]:
+        # Locate each match with the span engine, then resolve the groups of
+        # the preferred path over exactly that span.
+        for start, end in self._iter_spans(text, pos):
+            groups = (
+                matcher._captures(self.prog, text, start, end, self.groups)
+                if self.groups
+                else []
+            )
+            yield (start, end), groups
+
+    def _longest_at(self, text: str, pos: int) -> int | None:
+        # End of the longest match starting at pos, from pos only.
+        dfa = self.full_dfa or self.dfa
+        if dfa is not None:
+            try:
+                return dfa.longest_at(text, pos)
+            except DFAGaveUp:
+                pass
+        span = matcher._search(self.prog, text, pos, anchored=True)
+        return span[1] if span is not None else None
+
+    def _anchored_groups(
+        self, text: str, pos: int
+    ) -> tuple[tuple[int, int], list] | None:
+        # The longest match starting at pos and its groups, or None; the
+        # automaton runs from pos only.
+        if pos > len(text):
+            return None
+        end = self._longest_at(text, pos)
+        if end is None:
+            return None
+        groups = (
+            matcher._captures(self.prog, text, pos, end, self.groups)
+            if self.groups
+            else []
+        )
+        return (pos, end), groups
+
+    def match(self, text: str, pos: int = 0) -> Match | None:
+        """Return the longest match starting exactly at ``pos``, or ``None``.
+
+        Unlike :meth:`search`, no later start is tried.
+        """
+
+        found = self._anchored_groups(text, pos)
+        return Match(text, *found) if found is not None else None
+
+    def fullmatch(self, text: str, pos: int = 0) -> Match | None:
+        """Return the match of all of ``text[pos:]``, or ``None``."""
+
+        m = self.match(text, pos)
+        return m if m is not None and m.end() == len(text) else None
+
+    def search(self, text: str, pos: int = 0) -> Match | None:
+        """Return the first match at or after ``pos``, or ``None``."""
+
+        return next(self.finditer(text, pos), None)
+
+    def finditer(self, text: str, pos: int = 0) -> Iterator[Match]:
+        """Yield a :class:`Match` for every match in ``text`` from ``pos`` on.
+
+        Matches are found one at a time as the iterator advances, so a
+        caller that stops early does no work for the rest of ``text``.
+        """
+
+        for span, groups in self._iter_groups(text, pos):
+            yield Match(text, span, groups)
+
+    def match_many(
+        self, texts: Sequence[str], use_numpy: bool | None = None
+    ) -> bytearray:
+        """Return a mask with 1 for every text that matches at its start.
+
+        With NumPy installed, large batches advance the lazy DFA over all
+        records at once; ``use_numpy`` forces (``True``) or disables
+        (``False``) that path.  See :mod:`regex_lite.batch`.
+        """
+
+        return batch.match_many(self, texts, use_numpy)
+
+    def search_many(self, texts: Sequence[str], use_numpy: bool | None = None) -> array:
+        """Return an ``array('q')`` of first-match starts, ``-1`` for none."""
+
+        return batch.search_many(self, texts, use_numpy)
+
+    def finditer_stream(self, chunks: Iterable[str]) -> Iterator[Match]:
+        """Yield a :class:`Match` for every match of the concatenation of ``chunks``.
+
+        Offsets are absolute within the whole input and each match keeps
+        only its own text; only the text that may still belong to a pending
+        match is buffered (see :mod:`regex_lite.stream`).
+        """
+
+        return stream.finditer_stream(self, chunks)
+
+    def scan_file(
+        self, fp: IO[str], chunk_size: int = stream.DEFAULT_CHUNK_SIZE
+    ) -> Iterator[Match]:
+        """Like :meth:`finditer_stream` over a text file read in chunks."""
+
+        return stream.scan_file(self, fp, chunk_size)
+
+    def findall_parallel(
+        self,
+        source: parallel.Source,
+        workers: int | None = None,
+        chunk_size: int = parallel.DEFAULT_CHUNK_SIZE,
+        mp_context=None,
+    ) -> list[tuple[int, int]]:
+        """Return the same spans as :meth:`spans`, searching chunks in parallel.
+
+        ``source`` is the text, or a path to a UTF-8 file (spans are then
+        byte offsets).  Patterns whose matches may cross a line fall back to
+        a serial search; see :mod:`regex_lite.parallel`.  ``mp_context``
+        selects the multiprocessing start method of the worker pool.
+        """
+
+        return parallel.findall_parallel(self, source, workers, chunk_size, mp_context)
+
+    def subn(
+        self, repl: str | Callable[[Match], str], text: str, count: int = 0
+    ) -> tuple[str, int]:
+        """Replace matches with ``repl``; return ``(result, replacements)``.
+
+        ``repl`` is a template (``\\1`` and ``\\g<1>`` insert a group, see
+        :mod:`regex_lite.template`) or a function called with each
+        :class:`Match` that returns its replacement.  A positive ``count``
+        replaces only the first ``count`` matches and, as in :func:`re.subn`,
+        a negative one replaces none.  The text is walked once, appending the
+        pieces to a list that is joined at the end.
+        """
+
+        if callable(repl):
+            expand = repl
+        else:
+            tpl = template.parse(repl, self.groups)
+            if count >= 0 and tpl.literal is not None:
+                lit = self.literal.single if self.literal is not None else None
+                if lit is not None:
+                    n = text.count(lit)
+                    if 0 < count < n:
+                        n = count
+                    return text.replace(lit, tpl.literal, count or -1), n
+                return self._replace_spans(tpl.literal, text, count)
+            expand = tpl.expand
+        if count < 0:
+            return text, 0
+        parts: list[str] = []
+        last = n = 0
+        for m in self.finditer(text):
+            start, end = m.span()
+            parts.append(text[last:start])
+            parts.append(expand(m))
+            last = end
+            n += 1
+            if n == count:
+                break
+        if not n:
+            return text, 0
+        parts.append(text[last:])
+        return "".join(parts), n
+
+    def _replace_spans(self, repl: str, text: str, count: int) -> tuple[str, int]:
+        # A replacement without group references needs the spans only.
+        parts: list[str] = []
+        last = n = 0
+        for start, end in self._iter_spans(text):
+            parts.append(text[last:start])
+            parts.append(repl)
+            last = end
+            n += 1
+            if n == count:
+                break
+        if not n:
+            return text, 0
+        parts.append(text[last:])
+        return "".join(parts), n
+
+    def sub(self, repl: str | Callable[[Match], str], text: str, count: int = 0) -> str:
+        """Like :meth:`subn`, returning only the new string."""
+
+        return self.subn(repl, text, count)[0]
+
+    def _split_points(
+        self, text: str, maxsplit: int
+    ) -> Iterator[tuple[int, int, tuple]]:
+        # (start, end, groups) of the matches to split at, at most maxsplit
+        # of them when it is positive; no match is sought past the last one.
+        if maxsplit < 0:
+            return
+        if self.groups:
+            found = ((*m.span(), m.groups()) for m in self.finditer(text))
+        else:
+            found = ((start, end, ()) for start, end in self._iter_spans(text))
+        for n, point in enumerate(found, 1):
+            yield point
+            if n == maxsplit:
+                return
+
+    def splititer(self, text: str, maxsplit: int = 0) -> Iterator[str | None]:
+        """Yield the pieces :meth:`split` returns, as the matches are found."""
+
+        last = 0
+        for start, end, groups in self._split_points(text, maxsplit):
+            yield text[last:start]
+            yield from groups
+            last = end
+        yield text[last:]
+
+    def split(self, text: str, maxsplit: int = 0) -> list[str | None]:
+        """Split ``text`` by matches; return the substrings between them.
+
+        As in :func:`re.split`, the groups of each match (``None`` for a
+        group that did not take part) are returned between the substrings
+        it separates, and a positive ``maxsplit`` splits at most that many
+        times, leaving the rest of the text as the last piece.
+        """
+
+        lit = self.literal.single if self.literal is not None else None
+        if lit is not None and maxsplit >= 0:
+            return text.split(lit, maxsplit or -1)
+        return list(self.splititer(text, maxsplit))
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class PatternCache:
+    """Thread-safe LRU cache of :class:`Pattern` objects.
+
+    Entries are keyed by ``(pattern, flags, engine)`` with flags normalized, so
+    ``"mi"`` and ``"im"`` share one entry.  A ``maxsize`` of ``0`` disables
+    caching entirely; every lookup then counts as a miss.
+    """
+
+    def __init__(self, maxsize: int = 512) -> None:
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        self._maxsize = maxsize
+        self._entries: OrderedDict[tuple[str, str, str], Pattern] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, value: int) -> None:
+        if value < 0:
+            raise ValueError("maxsize must be >= 0")
+        with self._lock:
+            self._maxsize = value
+            while len(self._entries) > value:
+                self._entries.popitem(last=False)
+
+    def get(self, pattern: str, flags: str = "", engine: str = "auto") -> Pattern:
+        """Return the cached :class:`Pattern`, compiling it on a miss."""
+
+        key = (pattern, _normalize_flags(flags), engine)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+        # Compile outside the lock; a concurrent miss on the same key simply
+        # compiles twice and the later insert wins.
+        compiled = Pattern(pattern, key[1], engine)
+        with self._lock:
+            if self._maxsize:
+                self._entries[key] = compiled
+                self._entries.move_to_end(key)
+                while len(self._entries) > self._maxsize:
+                    self._entries.popitem(last=False)
+        return compiled
+
+    def purge(self) -> None:
+        """Drop every cached pattern and reset the hit/miss counters."""
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self._maxsize, len(self._entries))
+
+
+#: Process-wide cache shared by :func:`compile` and the ``matcher`` helpers.
+cache = PatternCache()
+
+
+def compile(pattern: str, flags: str = "", engine: str = "auto") -> Pattern:
+    """Compile ``pattern`` with ``flags``, reusing a cached :class:`Pattern`."""
+
+    return cache.get(pattern, flags, engine)
+
+
+def purge() -> None:
+    """Clear the process-wide pattern cache."""
+
+    cache.purge()
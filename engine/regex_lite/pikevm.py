@@ -0,0 +1,118 @@
+"""Pike VM: capture extraction by priority-ordered NFA simulation.
+
+The span engines decide *where* a match is (leftmost-longest); the Pike VM
+then decides *how* it matched.  It runs the NFA anchored at the match start
+with one thread per NFA state, ordered by priority: alternatives left to
+right, greedy quantifiers preferring another iteration and lazy ones
+preferring to stop (the epsilon edge order emitted by the compiler).  When
+two threads reach the same state at the same position only the higher
+priority one survives, so the groups reported are those of the preferred
+path that ends exactly at the match end, at a cost of O(len(span) x states).
+
+Every thread owns a slot list ``[start1, end1, start2, end2, ...]``.  Slot
+lists are shared between threads until a group hook writes to one, at which
+point that thread gets its own copy.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from .compiler import F_ACCEPT, F_BOL, F_EOL, F_LAZY, OP_NONE
+
+if TYPE_CHECKING:
+    from .compiler import Program
+
+Thread = tuple[int, list[int]]
+
+
+def _add_thread(
+    prog: "Program",
+    threads: list[Thread],
+    seen: set[int],
+    u: int,
+    slots: list[int],
+    pos: int,
+    blocked: int,
+) -> None:
+    """Follow epsilon edges from ``u`` in priority order, recording groups.
+
+    ``blocked`` holds the anchor bits (``F_BOL``/``F_EOL``) that fail at
+    ``pos``.
+    """
+
+    state_flags, eps, eps_lo, eps_hi = (
+        prog.state_flags,
+        prog.eps,
+        prog.eps_lo,
+        prog.eps_hi,
+    )
+    saves, save_lo, save_hi = prog.saves, prog.save_lo, prog.save_hi
+    op = prog.op
+    stack = [(u, slots)]
+    while stack:
+        u, slots = stack.pop()
+        if u in seen or state_flags[u] & blocked:
+            continue
+        seen.add(u)
+        lo, hi = save_lo[u], save_hi[u]
+        if lo != hi:
+            slots = slots.copy()
+            for i in range(lo, hi):
+                slots[saves[i]] = pos
+        if op[u] != OP_NONE or state_flags[u] & F_ACCEPT:
+            threads.append((u, slots))
+        if state_flags[u] & F_LAZY:
+            prog.expand(u)
+        # Push in reverse so the highest-priority edge is explored first.
+        for i in range(eps_hi[u] - 1, eps_lo[u] - 1, -1):
+            stack.append((eps[i], slots))
+
+
+def captures(
+    prog: "Program", text: str, start: int, end: int, ngroups: int
+) -> list[tuple[int, int] | None] | None:
+    """Return the group spans of the preferred path matching ``text[start:end]``.
+
+    The result has one entry per group (``None`` for groups that did not
+    participate), or is ``None`` if no path matches exactly that span.
+    """
+
+    out, state_flags = prog.out, prog.state_flags
+    classify, consumers = prog.alphabet.classify, prog.alphabet.consumers
+    multiline = prog.multiline
+    n = len(text)
+
+    def blocked(p: int) -> int:
+        bol = p == 0 or (multiline and text[p - 1] == "\n")
+        eol = p == n or (multiline and text[p] == "\n")
+        return (0 if bol else F_BOL) | (0 if eol else F_EOL)
+
+    clist: list[Thread] = []
+    empty = [-1] * (2 * ngroups)
+    _add_thread(prog, clist, set(), prog.start, empty, start, blocked(start))
+    p = start
+    while p < end and clist:
+        movers = consumers(classify(ord(text[p])))
+        nlist: list[Thread] = []
+        seen: set[int] = set()
+        p += 1
+        mask = blocked(p)
+        for u, slots in clist:
+            if u in movers:
+                _add_thread(prog, nlist, seen, out[u], slots, p, mask)
+        clist = nlist
+
+    if p != end:
+        return None
+    for u, slots in clist:
+        if state_flags[u] & F_ACCEPT:
+            return [
+                (
+                    (slots[i], slots[i + 1])
+                    if slots[i] >= 0 and slots[i + 1] >= 0
+                    else None
+                )
+                for i in range(0, len(slots), 2)
+            ]
+    return None
@@ -0,0 +1,113 @@
+"""Matching many patterns at once with one merged automaton.
+
+:class:`RegexSet` compiles its patterns side by side into a single NFA (see
+:meth:`~regex_lite.compiler.NFA.union`) whose accept states are tagged with
+the index of their pattern.  One unanchored lazy-DFA pass over a text then
+reports every pattern that matches somewhere in it, instead of one search
+per pattern.  Spans are only computed afterwards, and only for the patterns
+that matched.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from . import parser
+from . import pattern as _pattern
+from .compiler import F_BOL, F_EOL, NFA, Program
+from .dfa import DFAGaveUp, LazyDFA
+
+#: Default DFA cache budget of a set; merged automata have much larger
+#: states than single patterns.
+SET_CACHE_BYTES = 16 * 1024 * 1024
+
+
+def _which_nfa(prog: Program, tags: dict[int, int], text: str, total: int) -> set[int]:
+    """NFA-simulation fallback for :meth:`LazyDFA.which` (no state caching)."""
+
+    closures, closure_of = prog.closures, prog.closure
+    out = prog.out
+    classify, consumers = prog.alphabet.classify, prog.alphabet.consumers
+    multiline = prog.multiline
+    n = len(text)
+    found: set[int] = set()
+    current: set[int] = set()
+    for p in range(n + 1):
+        blocked = (0 if p == 0 or (multiline and text[p - 1] == "\n") else F_BOL) | (
+            0 if p == n or (multiline and text[p] == "\n") else F_EOL
+        )
+        closure: set[int] = set()
+        for u in (prog.start, *current):
+            states, masks = closures[u] or closure_of(u)
+            if masks is None:
+                closure.update(states)
+            else:
+                closure.update(v for v, m in zip(states, masks) if not m & blocked)
+        found.update(tags[u] for u in closure if u in tags)
+        if p == n or len(found) == total:
+            break
+        current = {out[u] for u in closure & consumers(classify(ord(text[p])))}
+    return found
+
+
+class RegexSet:
+    """A fixed list of patterns matched together in one pass.
+
+    Pattern indices are positions in ``patterns``.  A syntax error in any
+    pattern raises :class:`~regex_lite.parser.RegexSyntaxError` with an
+    extra ``pattern_index`` attribute naming the offending pattern.
+    """
+
+    def __init__(
+        self,
+        patterns: Iterable[str],
+        flags: str = "",
+        dfa_cache_bytes: int = SET_CACHE_BYTES,
+    ) -> None:
+        self.patterns = tuple(patterns)
+        self.flags = _pattern._normalize_flags(flags)
+        trees = []
+        for i, pat in enumerate(self.patterns):
+            try:
+                trees.append(parser.parse(pat))
+            except parser.RegexSyntaxError as exc:
+                exc.pattern_index = i
+                raise
+        nfa, accepts = NFA.union(trees)
+        self.prog = Program(nfa, self.flags)
+        tag_of = {a: i for i, a in enumerate(accepts)}
+        # Pattern index of each accept state (program state -> index).
+        self.tags = {
+            s: tag_of[u] for s, u in enumerate(self.prog.origin) if u in tag_of
+        }
+        self.dfa = LazyDFA(self.prog, dfa_cache_bytes, self.tags)
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def __repr__(self) -> str:
+        return f"RegexSet({len(self.patterns)} patterns, flags={self.flags!r})"
+
+    def _which(self, text: str, total: int) -> set[int]:
+        try:
+            return self.dfa.which(text, 0, total)
+        except DFAGaveUp:
+            return _which_nfa(self.prog, self.tags, text, total)
+
+    def matches(self, text: str) -> list[int]:
+        """Return the sorted indices of the patterns that match in ``text``."""
+
+        return sorted(self._which(text, len(self.patterns)))
+
+    def is_match(self, text: str) -> bool:
+        """Return whether any pattern of the set matches in ``text``."""
+
+        return bool(self._which(text, 1))
+
+    def spans(self, text: str) -> dict[int, list[tuple[int, int]]]:
+        """Map the index of every matching pattern to its match spans."""
+
+        return {
+            i: _pattern.compile(self.patterns[i], self.flags).spans(text)
+            for i in self.matches(text)
+        }
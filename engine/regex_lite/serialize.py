@@ -0,0 +1,125 @@
+"""Saving compiled patterns and loading them without recompiling.
+
+:func:`dumps` (also :meth:`Pattern.dumps <regex_lite.pattern.Pattern.dumps>`)
+turns a compiled :class:`~regex_lite.pattern.Pattern` into bytes: a
+``MAGIC`` tag, the :data:`FORMAT_VERSION` and a pickle of what matching
+reads (program tables and precomputed closures, prefilter and literal
+searcher, group count, and the full DFA if
+:meth:`~regex_lite.pattern.Pattern.to_dfa` was called; the lazy DFA travels
+without its cache).  The parsed tree and the NFA the tables were built from
+are left out.  :func:`loads` reverses it without parsing or compiling
+anything.
+
+:class:`DiskCache` keeps such files in a directory, so worker processes
+that compile the same pattern library at startup find it already compiled.
+
+Loading unpickles the data: only load files written by a trusted process.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+from . import pattern as _pattern
+
+MAGIC = b"RXLT"
+#: Version of the serialized layout and of the compiled tables inside it.
+#: It is bumped whenever compilation output changes; data written under
+#: another version is rejected by :func:`loads` and missed by
+#: :class:`DiskCache`.
+FORMAT_VERSION = 5
+
+_PROTOCOL = 5
+_HEADER = len(MAGIC) + 2
+
+
+def dumps(compiled: "_pattern.Pattern") -> bytes:
+    """Return ``compiled`` serialized for :func:`loads`."""
+
+    header = MAGIC + FORMAT_VERSION.to_bytes(2, "big")
+    return header + pickle.dumps(compiled, _PROTOCOL)
+
+
+def loads(data: bytes) -> "_pattern.Pattern":
+    """Return the pattern serialized in ``data`` by :func:`dumps`.
+
+    Raises :class:`ValueError` when ``data`` is not a serialized pattern or
+    was written under another :data:`FORMAT_VERSION`.
+    """
+
+    view = memoryview(data)
+    if len(view) < _HEADER or view[: len(MAGIC)] != MAGIC:
+        raise ValueError("not a serialized regex_lite pattern")
+    version = int.from_bytes(view[len(MAGIC) : _HEADER], "big")
+    if version != FORMAT_VERSION:
+        raise ValueError(
+            f"pattern serialized with format version {version}, "
+            f"expected {FORMAT_VERSION}"
+        )
+    compiled = pickle.loads(view[_HEADER:])
+    if not isinstance(compiled, _pattern.Pattern):
+        raise ValueError("not a serialized regex_lite pattern")
+    return compiled
+
+
+class DiskCache:
+    """Directory of serialized :class:`~regex_lite.pattern.Pattern` objects.
+
+    Files are named after a hash of ``(pattern, flags, engine)`` with flags
+    normalized, and :data:`FORMAT_VERSION`, so an engine upgrade that
+    changes the compiled tables starts from an empty cache.  Patterns are
+    compiled with the default options of :class:`Pattern`.  Files are written
+    atomically, so processes may share one directory.
+    """
+
+    def __init__(self, directory: str | os.PathLike[str]) -> None:
+        self.directory = os.fspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, pattern: str, flags: str = "", engine: str = "auto") -> str:
+        """Return the file that holds ``pattern`` compiled with ``flags``."""
+
+        key = repr((pattern, _pattern._normalize_flags(flags), engine, FORMAT_VERSION))
+        name = hashlib.sha256(key.encode("utf-8", "surrogatepass")).hexdigest()
+        return os.path.join(self.directory, name + ".rxl")
+
+    def get(
+        self, pattern: str, flags: str = "", engine: str = "auto"
+    ) -> "_pattern.Pattern":
+        """Return the stored :class:`Pattern`, compiling and storing it on a miss.
+
+        An unreadable or corrupt file counts as a miss and is replaced.
+        """
+
+        try:
+            with open(self.path(pattern, flags, engine), "rb") as f:
+                compiled = loads(f.read())
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            pass
+        else:
+            self.hits += 1
+            return compiled
+        self.misses += 1
+        compiled = _pattern.Pattern(pattern, flags, engine)
+        self.put(compiled)
+        return compiled
+
+    def put(self, compiled: "_pattern.Pattern") -> None:
+        """Store ``compiled`` (with its full DFA, if one was built)."""
+
+        if type(compiled) is not _pattern.Pattern:
+            raise TypeError("DiskCache only stores str Pattern objects")
+        path = self.path(compiled.pattern, compiled.flags, compiled.engine)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(dumps(compiled))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
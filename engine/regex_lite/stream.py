@@ -0,0 +1,241 @@
+"""Leftmost-longest matching over chunked input.
+
+:class:`StreamMatcher` accepts text piece by piece (:meth:`~StreamMatcher.feed`)
+and reports the same matches, with absolute offsets, as searching the
+concatenated input would.  Only a window of the input is kept: the engines
+are run with ``final=False`` and raise
+:class:`~regex_lite.matcher.NeedMoreInput` when the end of the window
+leaves a match undecided, naming the earliest position a pending match
+could still start at.  Everything before that position (minus one character
+of context for ``^``) is dropped.  ``$`` at the end of a chunk is decided
+once the next character, or the end of the input, is known.
+
+Text without pending matches is therefore held for at most one chunk; a
+match that is still growing keeps the text from its start.  With the lazy
+DFA, the scan that ran out of input is also kept (its DFA state, and the
+start of the anchored run once the earliest match end is known) and
+continues on the next chunk, so each character is read once rather than
+once per chunk fed while a match is pending.  Held chunks are joined only
+when a search has to look back into them.
+"""
+
+from __future__ import annotations
+
+from typing import IO, TYPE_CHECKING, Iterable, Iterator
+
+from . import matcher
+from . import pattern as _pattern
+from .dfa import DFAGaveUp
+
+if TYPE_CHECKING:
+    from .pattern import Match, Pattern
+
+#: Characters read per call by :meth:`Pattern.scan_file`.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class StreamMatcher:
+    """Incremental matcher for one ``Pattern`` over one input stream.
+
+    Matches are :class:`~regex_lite.pattern.Match` objects with offsets
+    counted from the start of the stream; each keeps only the matched text
+    as its ``string``.
+    """
+
+    def __init__(self, pattern: "Pattern") -> None:
+        self.pattern = pattern
+        self._dfa = pattern.dfa
+        # The held text, as the chunks it was fed in; joined only when a
+        # search has to look back into it.
+        self._pieces: list[str] = []
+        self._held = 0  # total length of self._pieces
+        self._base = 0  # stream offset of the first held character
+        self._pos = 0  # stream offset where the next search starts
+        # DFA scan left undecided at the end of the held text, continued on
+        # the next chunk instead of re-reading the held text:
+        # ("end", state) while looking for the earliest match end, or
+        # ("run", start, state, best, end) for the anchored run from
+        # ``start`` (best: longest end so far; end: earliest match end).
+        self._resume: tuple | None = None
+        # UTF-8 byte patterns report no empty match inside a character.
+        self._utf8 = getattr(pattern, "utf8", False)
+        self._closed = False
+
+    @property
+    def buffered(self) -> int:
+        """Number of characters currently held."""
+
+        return self._held
+
+    @property
+    def offset(self) -> int:
+        """Stream offset of the first character still held."""
+
+        return self._base
+
+    def feed(self, chunk: str) -> list["Match"]:
+        """Append ``chunk`` and return the matches it completed."""
+
+        if self._closed:
+            raise ValueError("feed() after close()")
+        if not chunk:
+            return []
+        self._pieces.append(chunk)
+        self._held += len(chunk)
+        return list(self._drain(chunk, final=False))
+
+    def close(self) -> list["Match"]:
+        """Signal the end of input and return the remaining matches."""
+
+        if self._closed:
+            return []
+        self._closed = True
+        return list(self._drain("", final=True))
+
+    # ------------------------------------------------------------------
+    def _text(self) -> str:
+        if len(self._pieces) != 1:
+            self._pieces = ["".join(self._pieces)]
+        return self._pieces[0]
+
+    def _drop(self, count: int) -> None:
+        # Forget the first ``count`` held characters.
+        pieces = self._pieces
+        self._base += count
+        self._held -= count
+        i = 0
+        while count and count >= len(pieces[i]):
+            count -= len(pieces[i])
+            i += 1
+        pieces = pieces[i:]
+        if count:
+            pieces[0] = pieces[0][count:]
+        self._pieces = pieces
+
+    def _next_span(self, new: str, final: bool) -> tuple[int, int] | None:
+        # Offsets in and out are relative to the held text; ``new`` is the
+        # chunk just fed (its end is the end of the held text).
+        resume, base = self._resume, self._base
+        if resume is not None:
+            self._resume = None
+            return self._continue(resume, new, final)
+        text = self._text()
+        pos = self._pos - base
+        if pos > len(text):
+            if final:
+                return None
+            raise matcher.NeedMoreInput(len(text))
+        dfa = self._dfa
+        if dfa is None:
+            return matcher._search(self.pattern.prog, text, pos, final=final)
+        try:
+            end = dfa.stream_end(text, pos, final)
+        except matcher.NeedMoreInput as more:
+            self._resume = ("end", more.state)
+            raise
+        if end is None:
+            return None
+        return self._leftmost(text, pos, end, final)
+
+    def _leftmost(self, text: str, pos: int, end: int, final: bool) -> tuple[int, int]:
+        try:
+            return self._dfa.leftmost(text, pos, end, final)
+        except matcher.NeedMoreInput as more:
+            if more.state is not None:
+                base = self._base
+                st, best = more.state
+                self._resume = (
+                    "run",
+                    base + more.keep,
+                    st,
+                    None if best is None else base + best,
+                    base + end,
+                )
+            raise
+
+    def _continue(self, resume: tuple, new: str, final: bool) -> tuple[int, int] | None:
+        dfa, base = self._dfa, self._base
+        off = base + self._held - len(new)  # stream offset of new[0]
+        if resume[0] == "end":
+            try:
+                end = dfa.stream_end(new, 0, final, resume[1])
+            except matcher.NeedMoreInput as more:
+                self._resume = ("end", more.state)
+                keep = off + more.keep if more.keep >= 0 else self._pos
+                raise matcher.NeedMoreInput(keep - base) from None
+            if end is None:
+                return None
+            return self._leftmost(
+                self._text(), self._pos - base, off + end - base, final
+            )
+        _, start, st, best, end = resume
+        try:
+            j = dfa.longest_at(new, 0, final, st)
+        except matcher.NeedMoreInput as more:
+            st, j = more.state
+            if j is not None:
+                best = off + j
+            self._resume = ("run", start, st, best, end)
+            raise matcher.NeedMoreInput(start - base) from None
+        if j is not None:
+            best = off + j
+        if best is not None:
+            return start - base, best - base
+        # The run from ``start`` died without a match: a later start, at or
+        # before ``end``, has the leftmost match.
+        return self._leftmost(self._text(), start + 1 - base, end - base, final)
+
+    def _drain(self, new: str, final: bool) -> Iterator["Match"]:
+        prog, ngroups = self.pattern.prog, self.pattern.groups
+        make = _pattern.Match
+        while True:
+            base = self._base
+            try:
+                span = self._next_span(new, final)
+            except DFAGaveUp:
+                self._dfa = None
+                self._resume = None
+                continue
+            except matcher.NeedMoreInput as more:
+                # Keep one character before the earliest pending start so
+                # that ``^`` can still be decided there.
+                self._pos = max(self._pos, base + more.keep)
+                self._drop(max(self._pos - base - 1, 0))
+                return
+            if span is None:
+                self._pieces = []
+                self._held = 0
+                self._base = self._pos
+                return
+            text = self._text()
+            start, end = span
+            if (
+                start == end < len(text)
+                and self._utf8
+                and 0x80 <= ord(text[start]) < 0xC0
+            ):
+                self._pos = base + end + 1
+                continue
+            groups = (
+                matcher._captures(prog, text, start, end, ngroups) if ngroups else []
+            )
+            yield make(
+                text[start:end],
+                (base + start, base + end),
+                [None if g is None else (g[0] + base, g[1] + base) for g in groups],
+                base + start,
+            )
+            self._pos = base + (end if end > start else end + 1)
+
+
+def finditer_stream(pattern: "Pattern", chunks: Iterable[str]) -> Iterator["Match"]:
+    sm = StreamMatcher(pattern)
+    for chunk in chunks:
+        yield from sm.feed(chunk)
+    yield from sm.close()
+
+
+def scan_file(
+    pattern: "Pattern", fp: IO[str], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator["Match"]:
+    return finditer_stream(pattern, iter(lambda: fp.read(chunk_size), ""))
@@ -0,0 +1,155 @@
+"""Replacement templates for :meth:`Pattern.sub <regex_lite.pattern.Pattern.sub>`.
+
+A template is the replacement string with backreferences, parsed once into
+literal pieces and group numbers:
+
+* ``\\1`` ... ``\\99`` and ``\\g<n>`` insert group ``n`` (``\\g<0>`` the whole
+  match); a group that did not take part inserts nothing;
+* ``\\0`` and three octal digits (``\\012``, ``\\101``) are octal escapes:
+  ``\\0`` is NUL, not the whole match;
+* ``\\\\``, ``\\a``, ``\\b``, ``\\f``, ``\\n``, ``\\r``, ``\\t`` and ``\\v`` insert
+  a backslash and the usual control characters;
+* another backslash before an ASCII letter is an error, and before any
+  other character it is kept as is.
+
+This follows :func:`re.sub`.
+
+Group names (``\\g<name>``) are parsed, but patterns have no named groups,
+so they are always reported as unknown.  Errors raise
+:class:`~regex_lite.parser.RegexSyntaxError` with the offset in the
+template.  Bytes templates are parsed as Latin-1 text.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, Union
+
+from .parser import RegexSyntaxError
+
+if TYPE_CHECKING:
+    from .pattern import Match
+
+_ESCAPES = {
+    "\\": "\\",
+    "a": "\a",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    "v": "\v",
+}
+_OCTAL = "01234567"
+
+
+class Template:
+    """A parsed replacement: ``pieces`` are literal strings and group numbers.
+
+    ``literal`` is the whole replacement when it refers to no group (a
+    match then needs no capture resolution), else ``None``.
+    """
+
+    __slots__ = ("pieces", "literal", "_empty")
+
+    def __init__(self, pieces: list[Union[str, bytes, int]], empty: str | bytes):
+        self.pieces = tuple(pieces)
+        self._empty = empty
+        refs = any(isinstance(p, int) for p in pieces)
+        self.literal = None if refs else empty.join(pieces)
+
+    def expand(self, match: "Match") -> str | bytes:
+        """Return the replacement for ``match``."""
+
+        if self.literal is not None:
+            return self.literal
+        empty = self._empty
+        return empty.join(
+            p if not isinstance(p, int) else (match.group(p) or empty)
+            for p in self.pieces
+        )
+
+
+@lru_cache(maxsize=256)
+def parse(repl: str | bytes, groups: int) -> Template:
+    """Parse ``repl`` for a pattern with ``groups`` capturing groups."""
+
+    is_bytes = isinstance(repl, bytes)
+    text = repl.decode("latin-1") if is_bytes else repl
+    pieces: list[Union[str, int]] = []
+    literal: list[str] = []
+
+    def group(ref: int, pos: int) -> None:
+        if ref > groups:
+            raise RegexSyntaxError(f"invalid group reference {ref}", pos)
+        if literal:
+            pieces.append("".join(literal))
+            literal.clear()
+        pieces.append(ref)
+
+    i, n = 0, len(text)
+    while i < n:
+        j = text.find("\\", i)
+        if j < 0:
+            literal.append(text[i:])
+            break
+        literal.append(text[i:j])
+        i = j + 1
+        if i == n:
+            raise RegexSyntaxError("bad escape (end of template)", j)
+        ch = text[i]
+        if ch == "0":
+            # Octal escape: \0 plus up to two more octal digits.
+            k = i + 1
+            while k < n and k < i + 3 and text[k] in _OCTAL:
+                k += 1
+            literal.append(chr(int(text[i:k], 8)))
+            i = k
+        elif ch in "123456789":
+            k = i + 1
+            if k < n and text[k] in "0123456789":
+                k += 1
+                if (
+                    ch in _OCTAL
+                    and text[k - 1] in _OCTAL
+                    and k < n
+                    and text[k] in _OCTAL
+                ):
+                    # Three octal digits: an escape, not a group.
+                    value = int(text[i : k + 1], 8)
+                    if value > 0o377:
+                        raise RegexSyntaxError(
+                            f"octal escape value \\{text[i : k + 1]} outside of "
+                            "range 0-0o377",
+                            j,
+                        )
+                    literal.append(chr(value))
+                    i = k + 1
+                    continue
+            group(int(text[i:k]), j)
+            i = k
+        elif ch == "g":
+            close = text.find(">", i)
+            if i + 1 >= n or text[i + 1] != "<" or close < 0:
+                raise RegexSyntaxError("missing group name", j)
+            name = text[i + 2 : close]
+            if not name:
+                raise RegexSyntaxError("missing group name", j)
+            if not (name.isascii() and name.isdigit()):
+                raise RegexSyntaxError(f"unknown group name {name!r}", j)
+            group(int(name), j)
+            i = close + 1
+        elif ch in _ESCAPES:
+            literal.append(_ESCAPES[ch])
+            i += 1
+        elif ch.isascii() and ch.isalpha():
+            raise RegexSyntaxError(f"bad escape \\{ch}", j)
+        else:
+            literal.append("\\" + ch)
+            i += 1
+    if literal:
+        pieces.append("".join(literal))
+    if is_bytes:
+        encoded = [p.encode("latin-1") if isinstance(p, str) else p for p in pieces]
+        return Template(encoded, b"")
+    return Template(pieces, "")
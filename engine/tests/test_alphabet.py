@@ -0,0 +1,39 @@
+import pytest
+from regex_lite.alphabet import Alphabet
+from regex_lite.pattern import Pattern
+
+SAMPLE = [*range(0, 0x300, 7), 0x661, 0x2003, 0x4E00, 0x10FFFF, ord("\n")]
+
+
+@pytest.mark.parametrize("pattern", ["\\w+\\s\\d", "[^a-z]é.", "[α-ω]x|\\D"])
+@pytest.mark.parametrize("flags", ["", "i", "m"])
+def test_lazy_alphabet_agrees_with_exact(pattern, flags):
+    prog = Pattern(pattern, flags).prog
+    lazy, exact = prog.alphabet, Alphabet(prog)
+    assert not lazy.exact and lazy.count <= exact.count
+    for a in SAMPLE:
+        assert lazy.classify(a) < 256 or a >= 256
+        for b in SAMPLE:
+            same = exact.classify(a) == exact.classify(b)
+            assert (lazy.classify(a) == lazy.classify(b)) == same
+        movers = {s for s in range(len(prog)) if prog.matches(s, chr(a))}
+        assert lazy.consumers(lazy.classify(a)) == movers
+
+
+def test_higher_code_points_share_latin1_classes():
+    alphabet = Pattern("\\w+\\s\\d").prog.alphabet
+    assert alphabet.classify(0x4E00) == alphabet.classify(ord("a"))
+    assert alphabet.classify(0x661) == alphabet.classify(ord("7"))
+    assert alphabet.classify(0x2003) == alphabet.classify(ord(" "))
+    # No Latin-1 letter is a Greek letter: a new key beyond the counted ones.
+    greek = Pattern("[α-ω]").prog.alphabet
+    assert greek.classify(ord("β")) >= greek.count
+    assert greek.classify(ord("β")) == greek.classify(ord("γ"))
+
+
+def test_unicode_classes_in_the_nfa():
+    text = "x١٢3 一二 "
+    for engine in ("nfa", "dfa"):
+        assert Pattern("\\d+", engine=engine).spans(text) == [(1, 4)]
+        assert Pattern("\\w+\\s", engine=engine).spans(text) == [(0, 5), (5, 8)]
+    assert Pattern("(\\w)(\\d+)").search(text).groups() == ("x", "١٢3")
@@ -0,0 +1,51 @@
+import itertools
+
+import pytest
+from regex_lite import backtrack, pikevm
+from regex_lite.pattern import Pattern
+
+PATTERNS = [
+    "(a|ab)(c|bcd)(d*)",
+    "(a*?)(a*)",
+    "((a)|b)*",
+    "(x?)(x{1,3}?)(x*)",
+    "^(a+)$",
+    "(a|b)+?(b)",
+    "(|a)+",
+    "(\\w+)@(\\w+)\\.(com|org)",
+]
+TEXTS = ["abcd", "aaab\nab", "xxxx", "x@y.com ab@cd.org", "bab", ""]
+
+
+@pytest.mark.parametrize("flags", ["", "m", "i"])
+def test_agrees_with_pike_vm(flags):
+    for pattern, text in itertools.product(PATTERNS, TEXTS):
+        p = Pattern(pattern, flags)
+        for start, end in p.spans(text):
+            expected = pikevm.captures(p.prog, text, start, end, p.groups)
+            got = backtrack.captures(p.prog, text, start, end, p.groups)
+            assert got == expected, (pattern, flags, text, start, end)
+
+
+def test_no_path_for_the_span():
+    prog = Pattern("(ab)").prog
+    assert backtrack.captures(prog, "abab", 0, 3, 1) is None
+    assert backtrack.captures(prog, "abab", 2, 4, 1) == [(2, 4)]
+
+
+def test_budget_picks_the_engine(monkeypatch):
+    p = Pattern("(a)+")
+    assert backtrack.fits(p.prog, 0, 10)
+    assert not backtrack.fits(p.prog, 0, backtrack.BUDGET)
+    calls = []
+    monkeypatch.setattr(backtrack, "captures", lambda *args: calls.append(args))
+    p.search("aaa")
+    assert len(calls) == 1
+    p.search("a" * backtrack.BUDGET)
+    assert len(calls) == 1
+
+
+def test_nested_empty_loops_stay_linear():
+    p = Pattern("((a*)*)*b")
+    text = "a" * 2000
+    assert p.search(text + "b").span(2) == (0, 2000)
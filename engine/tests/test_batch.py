@@ -0,0 +1,83 @@
+import random
+
+import pytest
+from regex_lite import BytesPattern, batch
+from regex_lite.pattern import Pattern
+
+CASES = [
+    ("a+b", ""),
+    (r"\d", ""),
+    ("^x", "m"),
+    ("b$", "m"),
+    ("b$", ""),
+    ("x*", ""),
+    ("é|ab", "i"),
+    ("^$", "m"),
+]
+
+
+def _records(n=600, seed=3):
+    rng = random.Random(seed)
+    return [
+        "".join(rng.choice("ab1 \nxé") for _ in range(rng.randint(0, 12)))
+        for _ in range(n)
+    ]
+
+
+def _expected(p, texts):
+    starts = [m.start() if m else -1 for m in map(p.search, texts)]
+    mask = [int(p.dfa.longest_at(t, 0) is not None) for t in texts]
+    return starts, mask
+
+
+@pytest.mark.parametrize("pattern,flags", CASES)
+def test_many_agrees_with_single_searches(pattern, flags):
+    p = Pattern(pattern, flags)
+    texts = _records()
+    starts, mask = _expected(p, texts)
+    assert list(p.search_many(texts, use_numpy=False)) == starts
+    assert list(p.match_many(texts, use_numpy=False)) == mask
+    assert p.search_many(texts).typecode == "q"
+    assert isinstance(p.match_many(texts), bytearray)
+
+
+@pytest.mark.parametrize("pattern,flags", CASES)
+def test_numpy_path_agrees_with_python_path(pattern, flags):
+    pytest.importorskip("numpy")
+    p = Pattern(pattern, flags)
+    texts = _records() + [""]
+    starts, mask = _expected(p, texts)
+    assert list(p.search_many(texts, use_numpy=True)) == starts
+    assert list(p.match_many(texts, use_numpy=True)) == mask
+
+
+def test_numpy_path_survives_cache_flushes():
+    pytest.importorskip("numpy")
+    p = Pattern("[ab]*a[ab]{4}", dfa_cache_bytes=4096)
+    texts = _records(300, seed=5)
+    starts, mask = _expected(Pattern("[ab]*a[ab]{4}"), texts)
+    assert list(p.search_many(texts, use_numpy=True)) == starts
+    assert list(p.match_many(texts, use_numpy=True)) == mask
+
+
+def test_numpy_path_finds_far_starts_in_linear_time():
+    pytest.importorskip("numpy")
+    p = Pattern(r"\w*c|b")
+    texts = ["x" * 3000 + "ab", "xb", "x"]
+    assert list(p.search_many(texts, use_numpy=True)) == [3001, 1, -1]
+    assert p.dfa._scanned <= 10 * sum(map(len, texts))
+
+
+def test_numpy_path_rejects_unsupported_inputs(monkeypatch):
+    with pytest.raises(ValueError):
+        batch.search_many(Pattern("a", engine="nfa"), ["a"], use_numpy=True)
+    monkeypatch.setattr(batch, "np", None)
+    with pytest.raises(ModuleNotFoundError):
+        Pattern("a").match_many(["a"], use_numpy=True)
+    assert Pattern("a").match_many(["a", "ba"]) == bytearray([1, 0])
+
+
+def test_bytes_pattern_batches():
+    bp = BytesPattern(rb"a\d")
+    assert bp.match_many([b"a1", b"xa1"]) == bytearray([1, 0])
+    assert list(bp.search_many([b"a1", b"xa1", b""])) == [0, 1, -1]
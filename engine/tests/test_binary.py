@@ -0,0 +1,165 @@
+import mmap
+import random
+import re
+
+import pytest
+from regex_lite import BytesPattern, RegexSyntaxError
+from regex_lite.binary import ByteText, utf8_sequences
+from regex_lite.pattern import Pattern
+
+RE_FLAGS = {"i": re.I, "m": re.M, "s": re.S}
+
+
+def _re_flags(flags):
+    return sum(RE_FLAGS[f] for f in flags)
+
+
+@pytest.mark.parametrize("flags", ["", "i", "m", "s"])
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        rb"\w+",
+        rb"[\x80-\xff]+",
+        rb".",
+        rb"AB|c",
+        rb"\d+\s",
+        rb"[^\x00a]",
+        rb"^\S",
+        rb"x*",
+    ],
+)
+def test_byte_mode_agrees_with_re(pattern, flags):
+    bp = BytesPattern(pattern, flags)
+    for text in (b"abc\xff\xfe AB 12 \n C\x00", bytes(range(256))):
+        expected = [m.span() for m in re.finditer(pattern, text, _re_flags(flags))]
+        assert bp.spans(text) == expected
+        assert bp.spans(bytearray(text)) == expected
+        assert bp.spans(memoryview(text)) == expected
+
+
+@pytest.mark.parametrize("flags", ["", "i", "m", "s"])
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        r"\w+",
+        r"\d",
+        r".",
+        r"[^a-z ]+",
+        r"[à-ÿ]",
+        r"\w$",
+        "é+",
+        r"(\w)(\W)",
+        "x*",
+        "[日本]+",
+    ],
+)
+def test_utf8_mode_reports_byte_offsets_of_str_matches(pattern, flags):
+    bp = BytesPattern(pattern, flags, utf8=True)
+    p = Pattern(pattern, flags)
+    for text in ("héllo wörld 123 ÀÉ\nfoo_bar ça", "日本語 テキスト\n\n42é", "ß ss"):
+        off = [len(text[:i].encode()) for i in range(len(text) + 1)]
+
+        def to_bytes(span):
+            return None if span is None else (off[span[0]], off[span[1]])
+
+        expected = [
+            {
+                "span": to_bytes(m.span()),
+                "groups": [to_bytes(g) for g in m.describe()["groups"]],
+            }
+            for m in p.finditer(text)
+        ]
+        assert [m.describe() for m in bp.finditer(text.encode())] == expected
+
+
+def test_utf8_sequences_cover_each_encoding_once():
+    rng = random.Random(7)
+    for lo, hi in [(0, 0x10FFFF), (0x7F, 0x800), (0xD7FF, 0xE000), (0x1234, 0x5678)]:
+        seqs = utf8_sequences(lo, hi)
+        for _ in range(2000):
+            c = rng.randint(0, 0x10FFFF)
+            if 0xD800 <= c <= 0xDFFF:
+                continue
+            data = chr(c).encode()
+            hits = sum(
+                len(s) == len(data) and all(a <= b <= z for (a, z), b in zip(s, data))
+                for s in seqs
+            )
+            assert hits == (1 if lo <= c <= hi else 0)
+
+
+def test_byte_mode_rejects_wide_characters():
+    with pytest.raises(RegexSyntaxError):
+        BytesPattern("日")
+    assert BytesPattern("日", utf8=True).spans("a日".encode()) == [(1, 4)]
+
+
+def test_search_mmap_in_place(tmp_path):
+    path = tmp_path / "big.bin"
+    path.write_bytes(b"x" * 100_000 + b"needle 42\n" + b"\xff" * 10)
+    with (
+        open(path, "rb") as fp,
+        mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+    ):
+        bp = BytesPattern(rb"needle (\d+)")
+        m = bp.search(mm)
+        assert m.describe() == {
+            "span": (100_000, 100_009),
+            "groups": [(100_007, 100_009)],
+        }
+        assert m.group(1) == b"42"
+        assert BytesPattern(rb"\xff+").spans(mm) == [(100_010, 100_020)]
+
+
+def test_memoryview_find_scans_in_windows(monkeypatch):
+    monkeypatch.setattr("regex_lite.binary._FIND_WINDOW", 4)
+    view = ByteText(memoryview(b"abcdefghij"))
+    assert view.find("efg") == 4
+    assert view.find("j", 5) == 9
+    assert view.find("zz") == -1
+
+
+def test_sub_and_split_return_bytes():
+    bp = BytesPattern(rb"\s+")
+    assert bp.sub(b"_", b"a  b\tc") == b"a_b_c"
+    assert bp.split(memoryview(b"a  b\tc")) == [b"a", b"b", b"c"]
+    groups = BytesPattern(rb"(\w)(\d)?")
+    assert groups.subn(rb"\2\1", bytearray(b"a1 b"), 1) == (b"1a b", 1)
+    assert groups.sub(lambda m: bytes(m.group(1)).upper(), b"a1 b") == b"A B"
+    assert groups.subn(b"_", bytearray(b"a1 b"), -1) == (b"a1 b", 0)
+    assert bp.sub(rb"\0", b"a b") == b"a\x00b"
+    fields = BytesPattern(rb"(-)|;").split(memoryview(b"a-b;c-d"), maxsplit=2)
+    assert fields == [b"a", b"-", b"b", None, b"c-d"]
+
+
+def test_str_text_is_rejected():
+    with pytest.raises(TypeError):
+        BytesPattern(b"a").spans("a")
+
+
+@pytest.mark.parametrize(
+    "pattern,utf8", [(rb"(\w)\w*", False), (r"(\w+)", True), ("é|", True)]
+)
+def test_stream_over_byte_chunks(pattern, utf8, tmp_path):
+    bp = BytesPattern(pattern, utf8=utf8)
+    data = "aé x€ yz\nq".encode() * 3
+    expected = [
+        (m.describe(), bytes(data[slice(*m.span())])) for m in bp.finditer(data)
+    ]
+    for size in (1, 2, 5, len(data)):
+        chunks = [memoryview(data)[i : i + size] for i in range(0, len(data), size)]
+        got = [(m.describe(), m.group()) for m in bp.finditer_stream(chunks)]
+        assert got == expected
+    path = tmp_path / "data.bin"
+    path.write_bytes(data)
+    with open(path, "rb") as fp:
+        got = [(m.describe(), m.group()) for m in bp.scan_file(fp, chunk_size=3)]
+        assert got == expected
+
+
+def test_bytes_pattern_takes_state_budget_and_rewrites():
+    with pytest.raises(RegexSyntaxError):
+        BytesPattern("a{50}", max_states=64)
+    bp = BytesPattern("foo|foobar|fox", rewrites=())
+    assert len(bp.prog) > len(BytesPattern("foo|foobar|fox").prog)
+    assert bp.spans(b"foobar fox") == [(0, 6), (7, 10)]
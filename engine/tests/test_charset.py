@@ -0,0 +1,54 @@
+import re
+
+import pytest
+from regex_lite.charset import CharSet
+from regex_lite.matcher import match_spans
+
+SAMPLE = "aZ09_ -\t\n.éÿŸΔδKKſ٣　x"
+
+CLASSES = [
+    "[a-z]",
+    "[^a-z]",
+    r"[\d]",
+    r"[\w-]",
+    r"[^\s\d]",
+    r"[\D]",
+    r"[^\W_]",
+    r"[\S.]",
+    "[k]",
+    "[s-t]",
+    "[A-ZΔ]",
+    "[à-ÿ]",
+    r"\D",
+    r"\W",
+    r"\S",
+]
+
+
+@pytest.mark.parametrize("flags", ["", "i"])
+@pytest.mark.parametrize("cls", CLASSES)
+def test_class_membership_matches_python_re(cls, flags):
+    py = re.compile(cls, re.IGNORECASE if flags else 0)
+    for ch in SAMPLE:
+        expected = [(0, 1)] if py.fullmatch(ch) else []
+        assert match_spans(cls, ch, flags) == expected, (cls, flags, ch)
+
+
+def test_ranges_are_sorted_and_merged():
+    cs = CharSet([(100, 120), (97, 99), (300, 310), (305, 400)])
+    assert cs.ranges == ((97, 120), (300, 400))
+    assert "Ɛ" in cs and "Ƒ" not in cs
+
+
+def test_folding_is_done_once_at_build_time():
+    cs = CharSet([(ord("a"), ord("c"))])
+    folded = cs.folded()
+    assert folded is cs.folded()
+    assert folded.ranges == ((ord("A"), ord("C")), (ord("a"), ord("c")))
+    assert "B" in folded and "B" not in cs
+
+
+def test_single_code_point():
+    assert CharSet([(48, 48)]).single() == 48
+    assert CharSet([(48, 49)]).single() is None
+    assert CharSet([(48, 48)], negated=True).single() is None
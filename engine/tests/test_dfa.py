@@ -0,0 +1,133 @@
+import itertools
+import random
+import sys
+import threading
+
+import pytest
+from regex_lite.dfa import LazyDFA
+from regex_lite.pattern import Pattern
+
+PATTERNS = [
+    "abc",
+    "a*",
+    "a+b",
+    "(ab|cd)e",
+    "foo|foobar",
+    r"\d{2,3}",
+    "[^0-9]+",
+    "a.c",
+    "^ab",
+    "ab$",
+    "^a|b",
+    "^$",
+    r"\w+@\w+",
+    "(a|b)*c?",
+]
+TEXTS = ["", "abc", "xxabe--cdeyy", "foo foobar", "a\nc\nab", "12 345 6789", "aab\nb"]
+
+
+@pytest.mark.parametrize("flags", ["", "i", "m", "s", "ims"])
+def test_dfa_agrees_with_nfa(flags):
+    for pat, text in itertools.product(PATTERNS, TEXTS):
+        dfa = Pattern(pat, flags, engine="dfa")
+        nfa = Pattern(pat, flags, engine="nfa")
+        assert dfa.spans(text) == nfa.spans(text), (pat, text, flags)
+
+
+def test_dfa_reuses_cached_transitions():
+    p = Pattern("[a-c]+", engine="dfa")
+    p.spans("abcabc")
+    states = p.dfa.state_count
+    p.spans("cbacba")
+    assert p.dfa.state_count == states
+
+
+def test_dfa_flushes_under_small_budget():
+    p = Pattern("(a|b)*abb", engine="dfa")
+    dfa = LazyDFA(p.prog, cache_bytes=4000)
+    p.dfa = dfa
+    text = "ab" * 200 + "abb"
+    assert p.spans(text) == Pattern("(a|b)*abb", engine="nfa").spans(text)
+    assert dfa.cache_used <= 4000
+
+
+def test_dfa_falls_back_to_nfa_when_thrashing():
+    p = Pattern("[ab]*a[ab]{6}", engine="dfa", dfa_cache_bytes=1500)
+    text = "abbabaababbbabaabbbaab" * 5
+    assert p.spans(text) == Pattern("[ab]*a[ab]{6}", engine="nfa").spans(text)
+    assert p.dfa.flushes >= 1
+
+
+def test_unknown_engine_rejected():
+    with pytest.raises(ValueError):
+        Pattern("a", engine="jit")
+
+
+def test_dfa_transitions_are_shared_by_character_classes():
+    p = Pattern("\\w+!", engine="dfa")
+    text = "".join(chr(0x4E00 + i) for i in range(500)) + "!"
+    assert p.spans(text) == [(0, 501)]
+    states = list(p.dfa._states.values())
+    assert sum(len(st.by_class) for st in states) <= 3 * len(states)
+    assert sum(len(st.next) for st in states) > 500
+
+
+@pytest.mark.parametrize(
+    "pattern,text",
+    [(r"\w*c|b", "x" * 3000 + "ab"), ("[ab]*c|b", "a" * 3000 + "b")],
+)
+def test_leftmost_start_search_stays_linear(pattern, text):
+    # Every start before the match runs to the end of the text; the search
+    # hands over to one NFA pass instead of trying each of them.
+    p = Pattern(pattern, engine="dfa")
+    assert p.spans(text) == Pattern(pattern, engine="nfa").spans(text)
+    assert p.dfa._scanned <= 10 * len(text)
+    stream = list(p.finditer_stream([text[i : i + 500] for i in range(0, 3002, 500)]))
+    assert [m.span() for m in stream] == p.spans(text)
+
+
+def test_shared_dfa_survives_concurrent_flushes():
+    # One compiled pattern, as handed out by the pattern cache, searched
+    # from several threads while its small DFA cache keeps flushing.
+    pattern = r"(a|b)*a(a|b){6}x"
+    p = Pattern(pattern, engine="dfa", dfa_cache_bytes=200000)
+    expected = Pattern(pattern, engine="nfa")
+    errors = []
+
+    def work(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(6):
+                text = "".join(rng.choice("ab") for _ in range(2000)) + "x"
+                assert p.spans(text) == expected.spans(text)
+        except Exception as exc:  # reported from the main thread
+            errors.append(exc)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert p.dfa.flushes >= 1
+
+
+def test_state_building_waits_for_the_cache_lock():
+    p = Pattern("(a|b)*abb", engine="dfa")
+    done = threading.Event()
+
+    def work():
+        p.spans("ababbab")
+        done.set()
+
+    with p.dfa._lock:
+        t = threading.Thread(target=work)
+        t.start()
+        assert not done.wait(0.2)
+    t.join()
+    assert done.is_set()
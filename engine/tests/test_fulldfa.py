@@ -0,0 +1,83 @@
+import pytest
+from regex_lite.alphabet import Alphabet
+from regex_lite.binary import BytesPattern
+from regex_lite.fulldfa import FullDFA, reverse_tree
+from regex_lite.parser import parse
+from regex_lite.pattern import Pattern
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        "[a-z]+\\d+",
+        "\\w+@\\w+\\.com",
+        "(a|b|c)*abb",
+        "^\\w+$",
+        "foo|x*",
+        "[^\\s]+",
+        "é.ü?",
+        "a|",
+    ],
+)
+@pytest.mark.parametrize("flags", ["", "i", "m", "s"])
+def test_agrees_with_nfa(pattern, flags):
+    text = "ab abb caBB x1 héü7 foo@bar.com\n\nFoo ée\r\nzz9 Ü"
+    expected = Pattern(pattern, flags, engine="nfa").spans(text)
+    for minimize in (True, False):
+        p = Pattern(pattern, flags)
+        assert p.to_dfa(minimize) is p.full_dfa is not None
+        assert p.spans(text) == expected
+        assert [m.span() for m in p.finditer(text[5:])] == Pattern(
+            pattern, flags, engine="nfa"
+        ).spans(text[5:])
+
+
+def test_minimization_merges_states():
+    p = Pattern("(a|b)*abb")
+    assert len(p.to_dfa(minimize=False)) > len(p.to_dfa())
+
+
+def test_state_limit_keeps_the_lazy_dfa():
+    p = Pattern("(a|b)*a(a|b){12}")
+    assert p.to_dfa(max_states=100) is None and p.full_dfa is None
+    assert p.spans("ab" * 10) == [(0, 19)]
+
+
+def test_bytes_patterns():
+    p = BytesPattern("é+\\w", utf8=True)
+    text = "aéé1 éx".encode()
+    expected = p.spans(text)
+    assert p.to_dfa() is not None
+    assert p.spans(text) == expected == [(1, 6), (7, 10)]
+
+
+def test_public_scans():
+    dfa = Pattern("b+c").to_dfa()
+    assert dfa.longest_at("abbc", 1) == 4 and dfa.longest_at("abbc", 0) is None
+    assert dfa.earliest_end("abbcbc") == 4
+    assert dfa.search("xxbcbbc", 3) == (4, 7)
+    assert list(dfa.iter_spans("bc abbc c")) == [(0, 2), (4, 7)]
+
+
+def test_reverse_tree():
+    assert reverse_tree(parse("^ab(c|de)$")) == parse("^(c|ed)ba$")
+    assert reverse_tree(parse("a(b)*")) == parse("(b)*a")
+
+
+def test_alphabet_classes():
+    prog = Pattern("[a-z]+\\d|x").prog
+    alphabet = Alphabet(prog)
+    # Outside the edges, [a-wyz], x, digits.
+    assert len(alphabet) == 4
+    assert alphabet.classify(ord("a")) == alphabet.classify(ord("z"))
+    assert alphabet.classify(ord("x")) != alphabet.classify(ord("y"))
+    assert alphabet.classify(0x10FFFF) == alphabet.classify(ord("!")) == 0
+    assert alphabet.representatives[alphabet.classify(ord("5"))] == "0"
+    assert len(Alphabet(Pattern("a", "m").prog)) == 3
+
+
+def test_multiline_anchors():
+    p = Pattern("^a+$", "m")
+    dfa = p.to_dfa()
+    assert isinstance(dfa, FullDFA)
+    assert p.spans("aa\nba\na") == [(0, 2), (6, 7)]
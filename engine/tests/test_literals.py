@@ -0,0 +1,147 @@
+import itertools
+
+import pytest
+from regex_lite import matcher
+from regex_lite.literals import analyze, prefilter
+from regex_lite.parser import parse
+from regex_lite.pattern import Pattern
+
+
+@pytest.mark.parametrize(
+    "pattern,kind,literals",
+    [
+        (r"ERROR: \d+", "prefix", ("ERROR: ",)),
+        ("(foo|bar)baz", "prefix", ("barbaz", "foobaz")),
+        ("colou?r", "prefix", ("color", "colour")),
+        ("foo|foobar", "prefix", ("foo",)),
+        ("^abc$", "line", ("abc",)),
+        (r"\w+@example\.com", "required", ("@example.com",)),
+        ("x*y", "required", ("y",)),
+        ("[ab]*a[ab]{6}", "required", ("aa", "ab")),
+    ],
+)
+def test_prefilter_choice(pattern, kind, literals):
+    pf = Pattern(pattern).prefilter
+    assert (pf.kind, pf.literals) == (kind, literals)
+
+
+@pytest.mark.parametrize("pattern", [r"\d+", "a|", "a*", "[^x]y?", ".+"])
+def test_no_prefilter_without_a_literal(pattern):
+    assert Pattern(pattern).prefilter is None
+
+
+def test_no_prefilter_under_ignorecase():
+    assert prefilter(parse("abc"), "i") is None
+
+
+def test_anchored_patterns_only_try_line_starts():
+    for pattern in ["^a", "(^a|^b)c", "(^x)+", "^"]:
+        assert prefilter(parse(pattern), "i").kind == "line", pattern
+    for pattern in ["^a|b", "(^a)?b", "a^"]:
+        pf = prefilter(parse(pattern))
+        assert pf is None or pf.kind != "line", pattern
+    find = prefilter(parse(r"^\w"), "m").scanner("a\nb\n")
+    assert [find(0), find(1), find(3), find(4)] == [0, 2, 4, 4]
+    # No line start past the last occurrence of a required literal.
+    find = prefilter(parse(r"^\wa"), "m").scanner("ba\nb\nca\nd")
+    assert [find(0), find(1), find(5), find(6)] == [0, 3, 5, -1]
+    find = prefilter(parse("^a")).scanner("a\na")
+    assert [find(0), find(1)] == [0, -1]
+
+
+def test_exact_sets_are_capped():
+    assert analyze(parse("[abc][abc][abc]")).exact is None
+    assert analyze(parse("(a|b)(c|d)")).exact == {"ac", "ad", "bc", "bd"}
+
+
+PATTERNS = [
+    "abc",
+    "ab|cd",
+    "a+b",
+    "x*yz",
+    "foo|foobar",
+    "(a|ab)(c|bcd)",
+    "^ab",
+    "ab$",
+    "a.c",
+    r"\d+-ab",
+    "(ab)+c",
+]
+TEXTS = ["", "abc", "xabcdx ab", "foo foobar", "a\nab\nabc", "12-ab 3-ab", "ababcabc"]
+
+
+@pytest.mark.parametrize("engine", ["dfa", "nfa"])
+@pytest.mark.parametrize("flags", ["", "m", "s"])
+def test_prefilter_does_not_change_results(engine, flags):
+    for pat, text in itertools.product(PATTERNS, TEXTS):
+        p = Pattern(pat, flags, engine=engine)
+        assert p.prefilter is not None, pat
+        plain = Pattern(pat, flags, engine=engine)
+        plain.prefilter = None
+        assert p.spans(text) == plain.spans(text), (pat, text)
+
+
+def test_text_without_literal_never_reaches_the_automaton(monkeypatch):
+    p = Pattern(r"ERROR: \d+", engine="nfa")
+    monkeypatch.setattr(
+        "regex_lite.matcher._search", lambda *a, **k: pytest.fail("automaton ran")
+    )
+    assert p.spans("all good here\n" * 100) == []
+
+
+@pytest.mark.parametrize("engine", ["auto", "dfa", "nfa"])
+def test_dense_prefix_without_match_is_searched_once(engine, monkeypatch):
+    # Every character starts the prefix, none ends a match: the prefilter
+    # only finds the first candidate and one search runs from there.
+    text = "a" * 4000
+    p = Pattern(r"a\w*c", engine=engine)
+    assert p.prefilter.kind == "prefix"
+    search = matcher._search
+    calls = []
+    monkeypatch.setattr(
+        "regex_lite.matcher._search", lambda *a, **k: calls.append(a) or search(*a, **k)
+    )
+    assert p.spans(text) == []
+    assert len(calls) <= 1
+    if engine == "dfa":
+        assert p.dfa._scanned <= 2 * len(text)
+
+
+def test_anchored_multiline_runs_at_line_starts_only(monkeypatch):
+    text = "xxx y\nxx1\n\nyx2\nx3"
+    p = Pattern(r"^x+\d", "m", engine="nfa")
+    search = matcher._search
+    calls = []
+    monkeypatch.setattr(
+        "regex_lite.matcher._search",
+        lambda *a, **k: calls.append((a[2], k)) or search(*a, **k),
+    )
+    assert p.spans(text) == [(6, 9), (15, 17)]
+    assert calls == [(i, {"anchored": True}) for i in (0, 6, 10, 11, 15)]
+
+
+LITERAL_PATTERNS = ["ab", "a", "abab", "ab|cd", "a|ab|abc", "Kelvin|k", "ſt|x"]
+LITERAL_TEXTS = ["", "abababc", "xabcd ab", "KELVIN K kk", "ſT St sT", "aaa"]
+
+
+@pytest.mark.parametrize("flags", ["", "i"])
+def test_literal_fast_path_matches_generic_engine(flags):
+    for pat, text in itertools.product(LITERAL_PATTERNS, LITERAL_TEXTS):
+        fast = Pattern(pat, flags)
+        generic = Pattern(pat, flags, engine="dfa")
+        assert fast.literal is not None and generic.literal is None
+        assert fast.spans(text) == generic.spans(text), (pat, text)
+        assert fast.subn("-", text) == generic.subn("-", text), (pat, text)
+        assert fast.split(text) == generic.split(text), (pat, text)
+
+
+@pytest.mark.parametrize("pattern", ["a|", "(ab)", "a.b", "^ab", "ab*", "[ab]"])
+def test_literal_fast_path_needs_plain_literals(pattern):
+    assert Pattern(pattern).literal is None
+
+
+def test_single_literal_uses_str_methods():
+    p = Pattern("ab")
+    assert p.literal.single == "ab"
+    assert Pattern("ab", "i").literal.single is None
+    assert Pattern("ab|cd").literal.single is None
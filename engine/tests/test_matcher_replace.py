@@ -1,4 +1,8 @@
+import re
+
+import pytest
 from regex_lite.matcher import replace
+from regex_lite.parser import RegexSyntaxError
 
 
 def test_replace_basic():
@@ -16,3 +20,40 @@ def test_replace_basic():
     result, count = replace("abc", "i", "ABC def ABC", "X")
     assert result == "X def X"
     assert count == 2
+
+
+def test_replace_templates_and_count():
+    assert replace(r"(\w+)@(\w+)", "", "a@b c@d", r"\2 at \g<1>") == (
+        "b at a d at c",
+        2,
+    )
+    assert replace(r"(a)|b", "", "ab", r"[\1\\]") == ("[a\\][\\]", 2)
+    assert replace(r"\d", "", "1 2 3", "#", count=2) == ("# # 3", 2)
+    assert replace("x", "", "xxx", "y", count=5) == ("yyy", 3)
+    assert replace("x", "", "xxx", "y", count=1) == ("yxx", 1)
+    assert replace("", "", "ab", "-") == ("-a-b-", 3)
+    for pattern, repl in (("x", "y"), ("x+", "y"), ("(x)", r"<\1>")):
+        assert replace(pattern, "", "xxx", repl, count=-1) == ("xxx", 0)
+
+
+def test_replace_template_errors():
+    with pytest.raises(RegexSyntaxError, match="invalid group reference 2") as exc:
+        replace("(a)", "", "a", "x\\2")
+    assert exc.value.position == 1
+    for bad in ("\\g<name>", "\\g<", "\\q", "\\"):
+        with pytest.raises(RegexSyntaxError):
+            replace("(a)", "", "a", bad)
+
+
+@pytest.mark.parametrize(
+    "repl",
+    [r"x\0", r"\01|\012|\0123", r"\1\10", r"\101\1x", r"\a\b\f\v", r"\g<0>\0"],
+)
+def test_templates_follow_re(repl):
+    pattern, text = "(a)(b)(c)(d)(e)(f)(g)(h)(i)(j)", "abcdefghij-"
+    assert replace(pattern, "", text, repl) == re.subn(pattern, repl, text)
+
+
+def test_octal_escape_range():
+    with pytest.raises(RegexSyntaxError, match="octal escape"):
+        replace("(a)", "", "a", "\\400")
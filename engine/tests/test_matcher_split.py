@@ -1,4 +1,6 @@
-from regex_lite.matcher import split
+import re
+
+from regex_lite.matcher import split, splititer
 
 
 def test_split_basic():
@@ -17,3 +19,18 @@ def test_split_basic():
     # Pattern at edges
     pieces = split(r"\s+", "  a b  ", "")
     assert pieces == ["", "a", "b", ""]
+
+
+def test_split_maxsplit_and_groups():
+    cases = [
+        (r"[,]", "a,b,c,d", 2),
+        (r"(-)|(;)", "a-b;c", 0),
+        (r"(\s)*", "a b", 0),
+        (r"x*", "abc", 2),
+        (r"(\d)", "a1b2c3", -1),
+        (r"-", "a-b", 5),
+    ]
+    for pattern, text, maxsplit in cases:
+        expected = re.split(pattern, text, maxsplit=maxsplit)
+        assert split(pattern, text, "", maxsplit) == expected, (pattern, maxsplit)
+    assert list(splititer(r"(\|)", "a|b|c", maxsplit=1)) == ["a", "|", "b|c"]
@@ -0,0 +1,129 @@
+import pytest
+from regex_lite import ast
+from regex_lite.compiler import NFA, state_count
+from regex_lite.optimize import REWRITES, dump, explain, optimize
+from regex_lite.parser import parse
+from regex_lite.pattern import Pattern
+
+
+def _opt(pattern, *rewrites):
+    return optimize(parse(pattern), rewrites or REWRITES)
+
+
+def test_literals_merge_into_strings():
+    assert _opt("abc") == ast.String("abc")
+    assert _opt("ab.cd") == ast.Concat([ast.String("ab"), ast.Dot(), ast.String("cd")])
+    assert _opt("abc", "flatten") == parse("abc")
+
+
+def test_common_prefixes_are_factored():
+    tree = _opt("abc|abd|x", "flatten", "factor_prefix")
+    assert tree == ast.Alt(
+        [
+            ast.Concat(
+                [
+                    ast.Literal("a"),
+                    ast.Literal("b"),
+                    ast.Alt([ast.Literal("c"), ast.Literal("d")]),
+                ]
+            ),
+            ast.Literal("x"),
+        ]
+    )
+    # Options starting with a group keep their own copy of it.
+    assert _opt("(a)b|(a)c", "flatten", "factor_prefix") == parse("(a)b|(a)c")
+
+
+def test_single_character_options_become_a_class():
+    tree = _opt("a|b|[c-e]|\\d|xy|z")
+    assert isinstance(tree, ast.Alt) and len(tree.options) == 3
+    assert tree.options[0] == ast.CharClass(
+        [
+            ast.Literal("a"),
+            ast.Literal("b"),
+            ast.Range("c", "e"),
+            ast.Shorthand("d"),
+        ]
+    )
+    assert tree.options[2] == ast.Literal("z")
+
+
+def test_nested_alternations_and_empties_flatten():
+    tree = ast.Concat(
+        [ast.Empty(), ast.Concat([ast.Dot(), ast.Alt([ast.Alt([ast.Dot()])])])]
+    )
+    assert optimize(tree) == ast.Concat([ast.Dot(), ast.Dot()])
+    assert _opt("()") == parse("()")
+
+
+def test_repeats_simplify():
+    assert _opt("x{1}") == ast.Literal("x")
+    assert _opt("(x*)*") == ast.Repeat(
+        ast.Group(ast.Repeat(ast.Literal("x"), "+"), 1), "*"
+    )
+    assert _opt("(x?)*") == ast.Repeat(ast.Group(ast.Literal("x"), 1), "*")
+    assert _opt("(x*)+") == parse("(x*)+")
+    assert _opt("((x|(y?))*)*") == parse("((x|(y?))*)*")
+
+
+def test_rewrites_are_switchable():
+    assert optimize(parse("a|b"), ()) == parse("a|b")
+    with pytest.raises(ValueError, match="unknown rewrites: nope"):
+        _opt("a", "nope")
+    assert len(Pattern("foo|foobar|fox").prog) < len(
+        Pattern("foo|foobar|fox", rewrites=()).prog
+    )
+
+
+def test_optimized_trees_are_smaller():
+    for pattern in ["foo|foobar|fox", "(a|b|c|d|e)+\\d", "hello world"]:
+        tree = _opt(pattern)
+        assert state_count(tree) < state_count(parse(pattern))
+        assert state_count(tree) == len(NFA(tree).states)
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        "abc|abd|ab",
+        "(x*)*y",
+        "(a|b)(a|)c",
+        "ab|a(b)|abc",
+        "^ab|^ac|$",
+        "(x?)*z",
+        "a{1}b{1,1}",
+        "(((ab|a)|(b*)|x(b*))*)*",
+        "((x*)*)*y",
+    ],
+)
+@pytest.mark.parametrize("flags", ["", "i"])
+def test_matches_and_captures_are_unchanged(pattern, flags):
+    text = "abc ab Abd xxy xz ac abcab\nac"
+    plain = Pattern(pattern, flags, engine="nfa", rewrites=())
+    assert list(Pattern(pattern, flags).finditer(text)) == list(plain.finditer(text))
+
+
+def test_dump_before_and_after():
+    assert dump(_opt("a|b(c)*")) == (
+        "Alt\n"
+        "  Literal 'a'\n"
+        "  Concat\n"
+        "    Literal 'b'\n"
+        "    Repeat *\n"
+        "      Group 1\n"
+        "        Literal 'c'"
+    )
+    assert explain("ab|ac") == (
+        "before:\n"
+        "  Alt\n"
+        "    Concat\n"
+        "      Literal 'a'\n"
+        "      Literal 'b'\n"
+        "    Concat\n"
+        "      Literal 'a'\n"
+        "      Literal 'c'\n"
+        "after:\n"
+        "  Concat\n"
+        "    Literal 'a'\n"
+        "    CharClass ['b', 'c']"
+    )
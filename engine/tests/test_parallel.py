@@ -0,0 +1,65 @@
+import pickle
+from multiprocessing import get_context
+
+import pytest
+from regex_lite import BytesPattern, parallel
+from regex_lite.pattern import Pattern
+
+TEXT = "ab\nxx 12\n\nx a\nfoo42 bar\n" * 40 + "tail x"
+
+
+@pytest.mark.parametrize(
+    "pattern,flags",
+    [(r"\w+", ""), (r"^\w", "m"), ("^a", ""), (r"\d+$", "m"), ("x*", ""), ("$", "")],
+)
+def test_parallel_spans_equal_serial(pattern, flags):
+    p = Pattern(pattern, flags)
+    assert parallel.line_local(p.prog)
+    expected = p.spans(TEXT)
+    for chunk_size in (1, 7, 50):
+        assert p.findall_parallel(TEXT, workers=2, chunk_size=chunk_size) == expected
+
+
+@pytest.mark.parametrize("pattern,flags", [(r"a\s", ""), ("b.", "s"), ("[^a]+", "")])
+def test_cross_line_patterns_run_serially(pattern, flags, monkeypatch):
+    p = Pattern(pattern, flags)
+    assert not parallel.line_local(p.prog)
+
+    def no_pool(*args):
+        raise AssertionError("pool used for a pattern that may span lines")
+
+    monkeypatch.setattr(parallel, "_run", no_pool)
+    assert p.findall_parallel(TEXT, workers=2, chunk_size=7) == p.spans(TEXT)
+
+
+def test_parallel_over_file_reports_byte_offsets(tmp_path):
+    text = "ℓé x1\n" * 50 + "end"
+    path = tmp_path / "input.txt"
+    path.write_text(text, encoding="utf-8")
+    expected = BytesPattern(r"\w+", utf8=True).spans(text.encode())
+    p = Pattern(r"\w+")
+    assert p.findall_parallel(path, workers=2, chunk_size=32) == expected
+    # The UTF-8 byte pattern is compiled once and reused.
+    bpat = parallel.utf8_pattern(p)
+    assert p.findall_parallel(path, workers=1) == expected
+    assert parallel.utf8_pattern(p) is bpat and bpat.utf8
+    assert pickle.loads(pickle.dumps(p))._utf8_bytes is None
+
+
+def test_pickled_dfa_starts_with_empty_cache():
+    p = Pattern(r"\d+")
+    p.spans("a 12 b 345")
+    assert p.dfa.state_count
+    clone = pickle.loads(pickle.dumps(p))
+    assert clone.dfa.state_count == 0
+    assert clone.spans("a 12 b 345") == [(2, 4), (7, 10)]
+
+
+def test_spawned_workers_receive_negated_shorthands():
+    # spawn (and forkserver) pickle the pattern handed to each worker.
+    p = Pattern(r"\S+")
+    assert parallel.line_local(p.prog)
+    spans = p.findall_parallel(
+        TEXT, workers=2, chunk_size=50, mp_context=get_context("spawn")
+    )
+    assert spans == p.spans(TEXT)
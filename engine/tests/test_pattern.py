@@ -0,0 +1,132 @@
+import pytest
+import regex_lite
+from regex_lite import pattern
+from regex_lite.matcher import match_spans
+
+
+@pytest.fixture
+def fresh_cache():
+    cache = pattern.cache
+    old_size = cache.maxsize
+    cache.purge()
+    yield cache
+    cache.maxsize = old_size
+    cache.purge()
+
+
+def test_compile_returns_reusable_pattern():
+    p = regex_lite.compile(r"\d+")
+    assert p.spans("a1 b22") == [(1, 2), (4, 6)]
+    assert p.search("a1 b22").span() == (1, 2)
+    assert p.search("a1 b22", 2).describe() == {"span": (4, 6), "groups": []}
+    assert p.search("abc") is None
+    assert [m.span() for m in p.finditer("1 2 3")] == [(0, 1), (2, 3), (4, 5)]
+    assert p.sub("#", "a1 b22") == "a# b#"
+    assert p.subn("#", "a1 b22") == ("a# b#", 2)
+    assert p.split("a1b22c") == ["a", "b", "c"]
+
+
+def test_flags_are_normalized(fresh_cache):
+    assert regex_lite.compile("a", "mi") is regex_lite.compile("a", "im")
+    assert regex_lite.compile("a", "g").flags == ""
+
+
+def test_cache_counts_hits_and_misses(fresh_cache):
+    regex_lite.compile("abc")
+    regex_lite.compile("abc")
+    match_spans("abc", "xabc")
+    info = fresh_cache.info()
+    assert (info.hits, info.misses, info.currsize) == (2, 1, 1)
+
+    regex_lite.purge()
+    assert fresh_cache.info() == (0, 0, fresh_cache.maxsize, 0)
+
+
+def test_cache_evicts_least_recently_used(fresh_cache):
+    fresh_cache.maxsize = 2
+    a = regex_lite.compile("a")
+    regex_lite.compile("b")
+    regex_lite.compile("a")  # refresh "a"
+    regex_lite.compile("c")  # evicts "b"
+    assert len(fresh_cache) == 2
+    assert regex_lite.compile("a") is a
+    misses = fresh_cache.misses
+    regex_lite.compile("b")
+    assert fresh_cache.misses == misses + 1
+
+
+def test_cache_disabled_with_zero_size(fresh_cache):
+    fresh_cache.maxsize = 0
+    assert regex_lite.compile("a") is not regex_lite.compile("a")
+    assert len(fresh_cache) == 0
+    with pytest.raises(ValueError):
+        fresh_cache.maxsize = -1
+
+
+def test_syntax_errors_are_not_cached(fresh_cache):
+    with pytest.raises(regex_lite.RegexSyntaxError):
+        regex_lite.compile("(a")
+    assert len(fresh_cache) == 0
+
+
+def test_match_objects():
+    m = regex_lite.compile(r"(\w+)@(\w+)?(x)?").search("to: me@host!")
+    assert isinstance(m, regex_lite.Match)
+    assert (m.span(), m.start(), m.end()) == ((4, 11), 4, 11)
+    assert (m.group(), m.group(1), m.groups()) == (
+        "me@host",
+        "me",
+        ("me", "host", None),
+    )
+    assert (m.span(3), m.start(3), m.end(3)) == (None, -1, -1)
+    assert m.describe() == {"span": (4, 11), "groups": [(4, 6), (7, 11), None]}
+    with pytest.raises(IndexError):
+        m.span(4)
+    assert not hasattr(m, "__dict__")
+
+
+def test_finditer_and_splititer_are_lazy(monkeypatch):
+    p = regex_lite.Pattern(r"(\d)", engine="nfa")
+    calls = []
+    captures = pattern.matcher._captures
+    monkeypatch.setattr(
+        pattern.matcher, "_captures", lambda *a: calls.append(a) or captures(*a)
+    )
+    text = "a1" * 10_000
+    first = next(p.finditer(text, 3))
+    assert first.span() == (3, 4) and len(calls) == 1
+    pieces = p.splititer(text)
+    assert [next(pieces), next(pieces)] == ["a", "1"]
+    assert list(p.splititer("x1y")) == p.split("x1y") == ["x", "1", "y"]
+    calls.clear()
+    assert list(p.splititer(text, maxsplit=2)) == ["a", "1", "a", "1", text[4:]]
+    assert len(calls) == 2
+
+
+def test_sub_with_callable_and_count():
+    p = regex_lite.Pattern(r"(\d+)")
+    assert p.sub(lambda m: str(int(m.group(1)) * 2), "a1 b22 c3", 2) == "a2 b44 c3"
+    assert p.subn(r"<\1>", "x") == ("x", 0)
+    assert p.subn("#", "1 2 3", count=-1) == ("1 2 3", 0)
+
+
+def test_match_and_fullmatch_are_anchored():
+    p = regex_lite.Pattern(r"(\d+)(x)?")
+    assert p.match("12x3").span() == (0, 3) and p.match("12x3").group(2) == "x"
+    assert p.match("a12") is None and p.match("a12", 1).groups() == ("12", None)
+    assert p.match("1", 5) is None
+    assert p.fullmatch("12x") is not None and p.fullmatch("12x3") is None
+    assert p.fullmatch("a34", 1).span() == (1, 3)
+    assert regex_lite.Pattern("a*", engine="nfa").match("b").span() == (0, 0)
+
+
+@pytest.mark.parametrize("flags", ["", "m"])
+def test_anchored_search_skips_other_starts(flags):
+    p = regex_lite.Pattern(r"^\w+", flags)
+    text = "ab cd\nef gh\n"
+    expected = [(0, 2), (6, 8)] if flags else [(0, 2)]
+    assert p.spans(text) == expected
+    assert p.is_match(text, 1) == bool(flags)
+    p.to_dfa()
+    assert p.spans(text) == expected
+    assert regex_lite.Pattern(r"^\w+", flags, engine="nfa").spans(text) == expected
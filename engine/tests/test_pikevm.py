@@ -0,0 +1,46 @@
+import re
+
+import pytest
+from regex_lite.matcher import match_with_groups
+
+CASES = [
+    ("(a|ab)(c|bcd)(d*)", "abcd"),
+    ("(a*)(a*)", "aaa"),
+    ("(a*?)(a*)", "aaa"),
+    ("(a+?)(a*)", "aaa"),
+    ("(a|b)+c", "aaabbc"),
+    ("(a|(b))+", "ba"),
+    ("(a)|(b)", "xab"),
+    ("((a)|b)*", "abab"),
+    ("(x?)(x{1,3}?)(x*)", "xxxx"),
+    (r"(\d+)-(\d+)?", "12-34 5-"),
+    ("(ab|a)(bc|c)?", "abc"),
+]
+
+
+@pytest.mark.parametrize("pattern,text", CASES)
+def test_groups_follow_priority_within_span(pattern, text):
+    py = re.compile(pattern)
+    for m in match_with_groups(pattern, text):
+        start, end = m["span"]
+        ref = py.fullmatch(text, start, end)
+        assert ref is not None
+        expected = [
+            ref.span(i) if ref.group(i) is not None else None
+            for i in range(1, py.groups + 1)
+        ]
+        assert m["groups"] == expected, (pattern, text, m)
+
+
+def test_every_group_is_reported():
+    assert match_with_groups("(a)|(b)", "ab") == [
+        {"span": (0, 1), "groups": [(0, 1), None]},
+        {"span": (1, 2), "groups": [None, (1, 2)]},
+    ]
+
+
+def test_groups_under_anchors_and_flags():
+    assert match_with_groups("^(a+)$", "x\naa\n", "m") == [
+        {"span": (2, 4), "groups": [(2, 4)]}
+    ]
+    assert match_with_groups("(A)(b)", "ab", "i")[0]["groups"] == [(0, 1), (1, 2)]
@@ -0,0 +1,157 @@
+from array import array
+
+import pytest
+from regex_lite import compiler
+from regex_lite.compiler import (
+    F_BOL,
+    F_EOL,
+    NFA,
+    OP_ANY,
+    OP_CHAR,
+    OP_NONE,
+    OP_NOTNL,
+    OP_TEST,
+    Program,
+    state_count,
+)
+from regex_lite.parser import RegexSyntaxError, parse
+from regex_lite.pattern import Pattern
+
+
+def _program(pattern, flags=""):
+    return Program(NFA(parse(pattern)), flags)
+
+
+def test_tables_are_flat_arrays():
+    prog = _program("a(b|c)*")
+    for name in ("op", "arg", "out", "eps_lo", "eps_hi", "eps", "saves"):
+        assert isinstance(getattr(prog, name), array)
+    assert prog.start == 0
+    assert all(0 <= t < len(prog) for t in prog.eps)
+
+
+def test_unreachable_cloned_states_are_dropped():
+    # A zero-count repeat builds its body but never links it in.
+    nfa = NFA(parse("(ab){0}c"))
+    prog = Program(nfa)
+    assert len(prog) < len(nfa.states)
+
+
+def test_flags_are_resolved_into_opcodes():
+    plain = _program("a.")
+    assert {plain.op[s] for s in range(len(plain))} == {OP_NONE, OP_CHAR, OP_NOTNL}
+    folded = _program("a.", "is")
+    assert {folded.op[s] for s in range(len(folded))} == {OP_NONE, OP_TEST, OP_ANY}
+    s = next(s for s in range(len(folded)) if folded.op[s] == OP_TEST)
+    assert folded.matches(s, "A") and folded.matches(s, "a")
+
+
+def test_group_slots_and_edge_descriptions():
+    prog = _program("(x)")
+    # Group 1 opens on entering the first state and closes on the second.
+    assert list(prog.saves) == [0, 1]
+    assert [prog.describe_edge(s) for s in range(len(prog))] == [
+        {"kind": "char", "char": "x", "to": 1},
+        None,
+    ]
+    cls = _program("[a-c]", "i")
+    assert cls.describe_edge(0) == {
+        "kind": "class",
+        "negated": False,
+        "chars": [],
+        "ranges": [["a", "c"]],
+        "classes": [],
+        "to": 1,
+    }
+
+
+def test_multiple_consuming_edges_rejected():
+    nfa = NFA(parse("ab"))
+    nfa.states[nfa.start].edges *= 2
+    with pytest.raises(ValueError):
+        Program(nfa)
+
+
+@pytest.mark.parametrize(
+    "pattern", ["a|b|c", "(a|b){2,20}c", "x+?", "(ab){0}c", "a{3,}", "", "(a*)*b"]
+)
+def test_state_count_matches_construction(pattern):
+    tree = parse(pattern)
+    assert state_count(tree) == len(NFA(tree).states)
+
+
+def test_counted_repeat_is_linear_in_its_bound():
+    prog = _program("[a-z]{1,10000}")
+    # Only the copies matching has reached are built.
+    assert len(prog) < 10
+    prog.expand_all()
+    # Two states per copy, and every optional copy exits to the end directly.
+    assert len(prog) == 2 * 10000 + 2 and not prog.stubs
+    assert max(prog.eps_hi[s] - prog.eps_lo[s] for s in range(len(prog))) == 2
+    # The copies share the class test, so the alphabet sees one edge.
+    assert len(prog.tests) == 1 and len(_program(r"(\w+\s){500}").tests) == 2
+    assert Pattern("[a-z]{1,10000}").spans("ab cd" * 500)[:2] == [(0, 2), (3, 7)]
+
+
+def test_lazy_repeats_expand_as_matching_reaches_them():
+    p = Pattern(r"(\w+\s){1,300}x[a-z]{1,5000}", engine="nfa")
+    assert len(p.prog) < 40
+    assert p.match("ab cd xyz").span(1) == (3, 6)
+    reached = len(p.prog)
+    assert reached < 80
+    # Another scan over the same text builds nothing new.
+    assert p.spans("ab cd xyz") == [(0, 9)] and len(p.prog) == reached
+    p.prog.expand_all()
+    assert len(p.prog) > 300 * 5 + 5000 * 2
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [r"(a|b){2,300}c", "(x{1,200}y){2,5}", "a{300,}b", "(ab){0,400}?", r"(\d\s?){150}"],
+)
+def test_lazy_expansion_builds_the_eager_program(pattern, monkeypatch):
+    lazy = Pattern(pattern, engine="nfa")
+    texts = [
+        "ab" * 200 + "c",
+        "xy" * 3 + "x" * 300 + "y",
+        "a" * 400 + "b",
+        "1 2 3" * 60,
+    ]
+    found = [list(lazy.finditer(t)) for t in texts]
+    lazy.prog.expand_all()
+    monkeypatch.setattr(compiler, "EAGER_REPEAT_STATES", 10**9)
+    eager = Pattern(pattern, engine="nfa")
+    assert len(lazy.prog) == len(eager.prog)
+    assert sorted(lazy.prog.op) == sorted(eager.prog.op)
+    assert found == [list(eager.finditer(t)) for t in texts]
+
+
+def test_state_budget_rejects_large_patterns():
+    with pytest.raises(RegexSyntaxError, match="too large"):
+        NFA(parse("(a{1000}){1000}"))
+    with pytest.raises(RegexSyntaxError):
+        Pattern("a{50}", max_states=64)
+    assert Pattern("a{50}", max_states=200).spans("a" * 60) == [(0, 50)]
+
+
+def test_closure_keeps_consuming_states_with_their_assertions():
+    prog = _program("(^a|b)c*$")
+    states, masks = prog.closure(prog.start)
+    assert [prog.describe_edge(s)["char"] for s in states] == ["a", "b"]
+    assert masks == (F_BOL, 0)
+    # After "b": "c" or the end, which needs $.
+    after_b = prog.closure(prog.out[states[1]])
+    assert [(prog.op[s] == OP_NONE, m) for s, m in zip(*after_b)] == [
+        (False, 0),
+        (True, F_EOL),
+    ]
+    assert prog.closure(prog.out[states[0]]) == after_b
+    assert _program("a*b").closure(0)[1] is None
+
+
+def test_closures_past_the_budget_are_computed_on_demand(monkeypatch):
+    monkeypatch.setattr(compiler, "CLOSURE_BUDGET", 0)
+    pattern = Pattern("(x|^y)+z", "m", engine="nfa")
+    assert all(c is None for c in pattern.prog.closures)
+    assert pattern.spans("xz\nyxz yz") == [(0, 2), (3, 6)]
+    assert pattern.prog.closures[pattern.prog.start] is not None
@@ -0,0 +1,56 @@
+import itertools
+
+import pytest
+from regex_lite import RegexSet, RegexSyntaxError
+from regex_lite.pattern import Pattern
+from regex_lite.regexset import _which_nfa
+
+PATTERNS = [
+    "abc",
+    r"\d+",
+    "^ab",
+    "ab$",
+    "a|b",
+    "x*",
+    "(foo|bar)baz",
+    "[^a-z]",
+    "q.u",
+    "^$",
+]
+TEXTS = ["", "abc", "xab\nab", "foobaz 12", "ABC", "q\nu", "quu", "\n"]
+
+
+@pytest.mark.parametrize("flags", ["", "i", "m", "s"])
+def test_set_agrees_with_individual_patterns(flags):
+    rs = RegexSet(PATTERNS, flags)
+    singles = [Pattern(p, flags, engine="nfa") for p in PATTERNS]
+    for text in TEXTS:
+        expected = [i for i, p in enumerate(singles) if p.spans(text)]
+        assert rs.matches(text) == expected, (text, flags)
+        assert _which_nfa(rs.prog, rs.tags, text, len(rs)) == set(expected)
+        assert rs.is_match(text) == bool(expected)
+
+
+def test_spans_only_for_matching_patterns():
+    rs = RegexSet(["a+", "b", "z"])
+    assert rs.spans("aab a") == {0: [(0, 2), (4, 5)], 1: [(2, 3)]}
+
+
+def test_falls_back_to_nfa_when_cache_thrashes():
+    pats = ["[ab]*a[ab]{5}", "b{3}", "ab*c"]
+    rs = RegexSet(pats, dfa_cache_bytes=3000)
+    for text in ["".join(t) for t in itertools.product("abc", repeat=8)][::97]:
+        expected = [i for i, p in enumerate(pats) if Pattern(p).spans(text)]
+        assert rs.matches(text) == expected, text
+
+
+def test_syntax_error_names_the_pattern():
+    with pytest.raises(RegexSyntaxError) as info:
+        RegexSet(["ok", "(bad"])
+    assert info.value.pattern_index == 1
+
+
+def test_empty_set():
+    rs = RegexSet([])
+    assert len(rs) == 0
+    assert rs.matches("anything") == []
@@ -0,0 +1,79 @@
+import itertools
+
+import pytest
+from regex_lite import matcher
+from regex_lite.pattern import Pattern
+
+PATTERNS = ["x*y", "ab|bcde", "abcd|c", "a|ab|abc", "^b|a$", "(a|b)*c", "b*", "$"]
+TEXTS = ["", "abcde", "abcd", "xxxy", "bab\nab", "aabbcc", "cab"]
+
+
+def _brute_force(pattern, text, flags):
+    # Reference: longest match tried at every start offset.
+    p = Pattern(pattern, flags, engine="dfa")
+    for i in range(len(text) + 1):
+        end = p.dfa.longest_at(text, i)
+        if end is not None:
+            return (i, end)
+    return None
+
+
+@pytest.mark.parametrize("flags", ["", "m"])
+def test_single_pass_search_is_leftmost_longest(flags):
+    for pat, text in itertools.product(PATTERNS, TEXTS):
+        expected = _brute_force(pat, text, flags)
+        nfa = Pattern(pat, flags, engine="nfa")
+        dfa = Pattern(pat, flags, engine="dfa")
+        assert matcher._search(nfa.prog, text) == expected, (pat, text)
+        assert dfa.dfa.search(text) == expected, (pat, text)
+
+
+def test_leftmost_start_wins_over_earlier_end():
+    assert Pattern("abcd|c", engine="nfa").spans("abcd") == [(0, 4)]
+    assert Pattern("ab|bcde", engine="nfa").spans("abcde") == [(0, 2)]
+
+
+def test_non_matching_text_is_scanned_once():
+    calls = 0
+    p = Pattern("[x]*y", engine="nfa")
+    (test,) = p.prog.tests
+
+    def counting(ch):
+        nonlocal calls
+        calls += 1
+        return test(ch)
+
+    p.prog.tests[0] = counting
+    text = "x" * 2000
+    assert p.spans(text) == []
+    # One pass: a handful of edge tests per character, not one per start.
+    assert calls < 10 * len(text)
+
+
+def test_dfa_rejects_without_anchored_runs(monkeypatch):
+    p = Pattern("x*y", engine="dfa")
+    monkeypatch.setattr(
+        p.dfa, "longest_at", lambda *a: pytest.fail("anchored run attempted")
+    )
+    assert p.spans("x" * 2000) == []
+
+
+@pytest.mark.parametrize("engine", ["auto", "dfa", "nfa"])
+@pytest.mark.parametrize(
+    "pattern", ["a+b", "foo", "x*", "^b", "(ab|a)c$", "\\w+@\\w+\\.com", "[0-9]{2}"]
+)
+def test_is_match_and_count_agree_with_spans(pattern, engine):
+    p = Pattern(pattern, "m", engine=engine)
+    for text in ["", "aab foo", "b\nab ac", "me@x.com 12 345", "zzz"]:
+        spans = p.spans(text)
+        assert p.is_match(text) == bool(spans), (pattern, text)
+        assert p.count(text) == len(spans), (pattern, text)
+        assert p.is_match(text, 3) == (p.search(text, 3) is not None)
+
+
+def test_is_match_stops_at_the_first_accepting_position():
+    prog = Pattern("a+").prog
+    assert matcher._search(prog, "xaaaa", earliest=True) == (1, 2)
+    assert matcher._search(prog, "xaaaa") == (1, 5)
+    p = Pattern("a+", engine="nfa")
+    assert p.is_match("xaaaa") and not p.is_match("xaaaa", 5)
@@ -0,0 +1,91 @@
+import os
+import pickle
+
+import pytest
+import regex_lite
+from regex_lite.binary import BytesPattern
+from regex_lite.pattern import Pattern
+from regex_lite.serialize import FORMAT_VERSION, MAGIC, DiskCache, loads
+
+
+def test_round_trip():
+    p = Pattern("(\\w+)@(\\w+)\\.com", "i")
+    q = regex_lite.loads(p.dumps())
+    text = "a@b.COM x@y.org Me@Host.com"
+    assert (q.pattern, q.flags, q.groups) == (p.pattern, p.flags, 2)
+    assert list(q.finditer(text)) == list(p.finditer(text))
+    assert q.dfa is not None and q.prog.closures == p.prog.closures
+    assert q.full_dfa is None
+
+
+def test_full_dfa_and_bytes_patterns_are_kept():
+    p = Pattern("[a-z]+\\d")
+    p.to_dfa()
+    q = loads(p.dumps())
+    assert q.full_dfa is not None and q.spans("ab1 c2") == [(0, 3), (4, 6)]
+    b = loads(BytesPattern("é\\w", utf8=True).dumps())
+    assert isinstance(b, BytesPattern) and b.spans("é1".encode()) == [(0, 3)]
+
+
+def test_only_matching_state_is_stored():
+    p = Pattern("[a-z]{1,200}(\\d)")
+    q = loads(p.dumps())
+    assert "tree" not in vars(q) and q.prog.origin is None
+    assert q.to_dfa() is not None and q.spans("ab1 c") == p.spans("ab1 c")
+    assert vars(q)["tree"] == p.tree
+    b = loads(BytesPattern("é+", "i", utf8=True).dumps())
+    assert b.to_dfa() is not None and b.spans("xÉé".encode()) == [(1, 5)]
+
+
+def test_rejects_foreign_and_stale_data():
+    data = Pattern("a").dumps()
+    assert data.startswith(MAGIC)
+    with pytest.raises(ValueError, match="not a serialized"):
+        loads(b"nope")
+    stale = MAGIC + (FORMAT_VERSION + 1).to_bytes(2, "big") + data[6:]
+    with pytest.raises(ValueError, match="format version"):
+        loads(stale)
+
+
+def test_disk_cache(tmp_path):
+    cache = DiskCache(tmp_path / "patterns")
+    p = cache.get("a+b", "mi")
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert os.path.exists(cache.path("a+b", "im"))
+
+    other = DiskCache(tmp_path / "patterns")
+    q = other.get("a+b", "im")
+    assert (other.hits, other.misses) == (1, 0)
+    assert q is not p and q.spans("AAB ab") == p.spans("AAB ab")
+    assert cache.path("a+b") != cache.path("a+b", engine="nfa")
+
+
+def test_disk_cache_replaces_corrupt_files(tmp_path):
+    cache = DiskCache(tmp_path)
+    with open(cache.path("x"), "wb") as f:
+        f.write(b"garbage")
+    assert cache.get("x").spans("xx") == [(0, 1), (1, 2)]
+    assert cache.misses == 1 and DiskCache(tmp_path).get("x").pattern == "x"
+    with pytest.raises(TypeError):
+        cache.put(BytesPattern("x"))
+
+
+def test_disk_cache_stores_full_dfa(tmp_path):
+    cache = DiskCache(tmp_path)
+    p = Pattern("\\d+")
+    p.to_dfa()
+    cache.put(p)
+    assert cache.get("\\d+").full_dfa is not None
+
+
+@pytest.mark.parametrize("pattern", [r"\D+", r"\W", r"\S+", r"[\D\s]x", r"[^\W_]+"])
+def test_negated_shorthands_round_trip(pattern, tmp_path):
+    p = Pattern(pattern)
+    text = "ab_1 22\tc-3 é"
+    assert loads(p.dumps()).spans(text) == p.spans(text)
+    assert pickle.loads(pickle.dumps(p)).spans(text) == p.spans(text)
+    b = BytesPattern(pattern, utf8=True)
+    assert loads(b.dumps()).spans(text.encode()) == b.spans(text.encode())
+    cache = DiskCache(tmp_path)
+    cache.get(pattern)
+    assert DiskCache(tmp_path).get(pattern).spans(text) == p.spans(text)
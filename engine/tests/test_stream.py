@@ -0,0 +1,98 @@
+import io
+
+import pytest
+from regex_lite.pattern import Match, Pattern
+from regex_lite.stream import StreamMatcher
+
+CASES = [
+    ("abc", ""),
+    (r"\d+", ""),
+    (r"(\w+)@(\w+)", ""),
+    ("a*", ""),
+    ("x|xyz", ""),
+    ("^ab", "m"),
+    ("ab$", "m"),
+    ("^$", "m"),
+    ("^a.*$", "m"),
+    ("a.c", "s"),
+    ("AB+", "i"),
+    ("(a|b)?c", ""),
+    (r"b+|\w*c", ""),
+]
+TEXT = "abc 123 foo@bar\nab xyz xy\n\nabbb ac a\ncAbBB x@y 9 xbc"
+
+
+def chunked(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("engine", ["dfa", "nfa"])
+@pytest.mark.parametrize("pattern,flags", CASES)
+def test_stream_agrees_with_finditer(pattern, flags, engine):
+    p = Pattern(pattern, flags, engine=engine)
+    expected = [(m.describe(), m.groups(), m.group()) for m in p.finditer(TEXT)]
+    for size in (1, 2, 3, 7, len(TEXT)):
+        got = [
+            (m.describe(), m.groups(), m.group())
+            for m in p.finditer_stream(chunked(TEXT, size))
+        ]
+        assert got == expected, (pattern, flags, size)
+
+
+def test_streamed_match_keeps_only_its_text():
+    (m,) = Pattern(r"(\w+)@(\w+)").finditer_stream(["say a@b", "c now"])
+    assert isinstance(m, Match)
+    assert (m.string, m.pos) == ("a@bc", 4)
+    assert m.span() == (4, 8) and m.span(2) == (6, 8)
+    assert m.group() == "a@bc" and m.groups() == ("a", "bc")
+
+
+def test_scan_file_reads_in_chunks():
+    p = Pattern(r"\d+")
+    fp = io.StringIO("a1 22\n" * 50)
+    spans = [m.span() for m in p.scan_file(fp, chunk_size=4)]
+    assert spans == [
+        (6 * i + k, 6 * i + e) for i in range(50) for k, e in ((1, 2), (3, 5))
+    ]
+
+
+def test_buffer_stays_bounded_without_matches():
+    sm = StreamMatcher(Pattern("needle"))
+    for _ in range(1000):
+        assert sm.feed("haystack") == []
+        assert sm.buffered <= len("haystack") + 1
+    assert sm.offset > 7000
+    assert sm.close() == []
+
+
+def test_pending_match_is_kept_until_decided():
+    sm = StreamMatcher(Pattern("a+"))
+    assert sm.feed("xxaa") == []
+    assert sm.feed("aa") == []
+    assert sm.feed("b") == [Match("aaaa", (2, 6), [], 2)]
+    assert sm.close() == []
+
+
+def test_end_anchor_waits_for_next_chunk():
+    sm = StreamMatcher(Pattern("b$", "m"))
+    assert sm.feed("ab") == []
+    assert sm.feed("c ab") == []
+    assert sm.feed("\n") == [Match("b", (5, 6), [], 5)]
+
+
+def test_feed_after_close_raises():
+    sm = StreamMatcher(Pattern("a"))
+    sm.close()
+    with pytest.raises(ValueError):
+        sm.feed("a")
+
+
+@pytest.mark.parametrize("pattern", [r"x[^z]*z", r"x[^z]*", r"[ab]*c|b"])
+def test_pending_match_reads_each_chunk_once(pattern):
+    # The DFA state is carried from one chunk to the next instead of
+    # rescanning the held text from the pending start on every feed.
+    text = "x" + "a" * 20000 + "z b"
+    p = Pattern(pattern, engine="dfa")
+    got = [m.span() for m in p.finditer_stream(chunked(text, 256))]
+    assert got == Pattern(pattern, engine="nfa").spans(text)
+    assert p.dfa._scanned <= 3 * len(text)